@@ -6,18 +6,33 @@ import typing
 from io import BytesIO
 
 from kivy.app import App
+from kivy.clock import Clock
 from kivy.core.image import Image as CoreImage
-from kivy.core.window import Window
+from kivy.core.window import Keyboard, Window
+from kivy.graphics import Color, Line
+from kivy.graphics.texture import Texture
 from kivy.input.providers.mouse import MouseMotionEvent
 from kivy.uix.button import Button
 from kivy.uix.colorpicker import ColorPicker
+from kivy.properties import NumericProperty, StringProperty
 from kivy.uix.dropdown import DropDown
+from kivy.uix.filechooser import FileChooserIconView
 from kivy.uix.image import Image as UixImage
 from kivy.uix.popup import Popup
 from kivy.uix.widget import Widget
 from PIL import Image
 
 from ImageManip import *
+from PythoShopDecoders import DecodedImage, decode_image
+from PythoShopFill import paint_bucket
+from PythoShopNeighborhood import blur, edge_detect, sharpen
+from PythoShopPixels import PixelBuffer, read_bmp_header
+from PythoShopRaster import marker
+from PythoShopStats import ImageStats, get_stats, update_stats, wants_stats
+from PythoShopThumbnails import ThumbnailCache
+from PythoShopTiles import TileRunner
+from PythoShopTiming import OperationTiming, dump_json, last_operation, start_operation
+from PythoShopWriter import SAVE_FORMATS, ImageWriter
 from tests.config import DEFAULT_STARTING_PRIMARY_IMAGE_PATH, DEFAULT_STARTING_SECONDARY_IMAGE_PATH
 
 
@@ -25,18 +40,74 @@ class NoImageError(Exception):
     pass
 
 
+BUILT_IN_TOOLS = [("Paint bucket", paint_bucket), ("Marker", marker)]
+BUILT_IN_FILTERS = [
+    ("Blur", blur),
+    ("Sharpen", sharpen),
+    ("Edge detect", edge_detect),
+]
+# the engines that do parts of the assignments aren't copied to students (see admin/updateStudentsFiles.py)
+INSTRUCTOR_FILTERS = [
+    ("PythoShopResample", [("Half size", "half_size"), ("Double size", "double_size")]),
+    ("PythoShopTransform", [("Flip left to right", "flip_left_right"), ("Rotate clockwise", "rotate_clockwise")]),
+    ("PythoShopBlend", [("Mix with other image", "mix_other"), ("Fade to color", "fade_to_color")]),
+    ("PythoShopChroma", [("Green screen", "green_screen")]),
+]
+
+
+def _instructor_filters() -> list[tuple[str, typing.Callable]]:
+    """The built-in filters of the instructor's engines that are here"""
+    filters = []
+    for module_name, names in INSTRUCTOR_FILTERS:
+        try:
+            module = importlib.import_module(module_name)
+        except ModuleNotFoundError as e:
+            if e.name != module_name:
+                raise
+            continue
+        filters += [(text, getattr(module, name)) for text, name in names]
+    return filters
+
+
+BUILT_IN_FILTERS += _instructor_filters()
+
+
 class ImageDisplay:
     def __init__(self, *, is_primary: bool) -> None:
         self.is_primary = is_primary
         self.uix_image: typing.Optional[UixImage] = None
         self.bytes: typing.Optional[BytesIO] = None
+        self.pixels: typing.Optional[PixelBuffer] = None
+        self.ext = "png"
+        self.decoded: typing.Optional[DecodedImage] = None
+        self.stats: typing.Optional[ImageStats] = None
 
     def is_image_loaded(self) -> bool:
         return bool(self.uix_image)
 
-    def load_image(self, uix_image: UixImage, bytes_: BytesIO) -> None:
+    def load_image(self, uix_image: UixImage, bytes_: BytesIO, pixels: typing.Optional[PixelBuffer] = None, ext: str = "png") -> None:
         self.uix_image = uix_image
         self.bytes = bytes_
+        self.pixels = pixels
+        self.ext = ext
+        self.stats = None
+
+    def load_decoded(self, uix_image: UixImage, decoded: DecodedImage) -> None:
+        self.load_image(uix_image, decoded.encoded, decoded.pixels, decoded.format)
+        self.decoded = decoded
+
+    def get_stats(self) -> typing.Optional[ImageStats]:
+        """
+        Histograms and statistics of the loaded image (counted the first time they are needed)
+
+        :returns: The statistics (or None if there is no image)
+        """
+        if self.stats is None and self.bytes:
+            if self.pixels is None:
+                self.bytes.seek(0)
+                self.pixels = PixelBuffer.from_image(Image.open(self.bytes))
+            self.stats = get_stats(self.pixels)
+        return self.stats
 
     def get_scatter(self) -> typing.Any:
         if self.is_primary:
@@ -44,13 +115,32 @@ class ImageDisplay:
         else:
             return PythoShopApp._root.image2
 
-    def do_binds(self) -> None:
+    def do_binds(self, timing: typing.Optional[OperationTiming] = None) -> None:
         assert self.uix_image
 
-        self.uix_image.texture = CoreImage(self.bytes, ext="png").texture
+        if timing is None:
+            timing = start_operation("display")
+        with timing.stage("texture"):
+            if self.pixels:
+                self.show_pixels()
+            else:
+                self.uix_image.texture = CoreImage(self.bytes, ext=self.ext).texture
+                # to avoid anti-aliassing when zoomed
+                self.uix_image.texture.mag_filter = "nearest"
+                self.uix_image.texture.min_filter = "nearest"
+        _show_timing(timing)
+        _show_histogram()
+
+    def show_pixels(self) -> None:
+        """Upload the pixels into a new texture (whose rows line up with theirs)"""
+        assert self.uix_image and self.pixels
+        # the rows are already bottom-up like a texture so they can be uploaded as they are
+        texture = Texture.create(size=(self.pixels.width, self.pixels.height), colorfmt="rgb")
+        texture.blit_buffer(self.pixels.packed(), colorfmt="bgr", bufferfmt="ubyte")
         # to avoid anti-aliassing when zoomed
-        self.uix_image.texture.mag_filter = "nearest"
-        self.uix_image.texture.min_filter = "nearest"
+        texture.mag_filter = "nearest"
+        texture.min_filter = "nearest"
+        self.uix_image.texture = texture
 
     def do_resize(self) -> None:
         assert self.uix_image
@@ -143,22 +233,89 @@ def _select_color(x: int, y: int) -> None:  # sourcery skip: merge-else-if-into-
         PythoShopApp._color_picker.color = (r / 255, g / 255, b / 255, 1)
 
 
-def _get_image_bytes(file_name: str) -> BytesIO:
-    if os.path.splitext(file_name)[-1].lower() == ".bmp":
-        # Load it directly rather than going through Pillow where we might loose some fidelity (e.g. paddding bytes)
-        current_bytes = BytesIO()
-        current_bytes.write(open(file_name, "rb").read())
+def _load_image_file(file_name: str, timing: typing.Optional[OperationTiming] = None) -> DecodedImage:
+    """
+    Decode an image file with the decoder registered for its type
+
+    :param file_name: The image file to load
+    :param timing: Where to record how long each stage of decoding took
+    :returns: The decoded image (its bytes positioned at the start)
+    """
+    decoded = decode_image(file_name)
+    decoded.encoded.seek(0)
+    if timing:
+        for stage, seconds in decoded.timings.items():
+            timing.add(stage, seconds)
+        if decoded.pixels:
+            timing.pixels = decoded.pixels.width * decoded.pixels.height
+    return decoded
+
+
+def _show_timing(timing: OperationTiming) -> None:
+    """
+    Put the stage timings of an operation in the performance display (if it is turned on)
+
+    :param timing: The operation to show
+    :returns: None
+    """
+    if PythoShopApp._root and PythoShopApp._show_timings:
+        PythoShopApp._root.timing_label.text = timing.summary()
+
+
+def _toggle_timings() -> None:
+    """
+    Show or hide the performance display under the images
+
+    :returns: None
+    """
+    PythoShopApp._show_timings = not PythoShopApp._show_timings
+    label = PythoShopApp._root.timing_label
+    if PythoShopApp._show_timings:
+        label.height = 30
+        label.opacity = 1
+        timing = last_operation()
+        label.text = timing.summary() if timing else "No operations timed yet"
+    else:
+        label.height = 0
+        label.opacity = 0
+
+
+def _show_histogram() -> None:
+    """
+    Put the histograms of the current image in the histogram panel (if it is turned on)
+
+    :returns: None
+    """
+    if PythoShopApp._root and PythoShopApp._show_histogram:
+        PythoShopApp._root.histogram_panel.show(_get_current_image().get_stats())
+
+
+def _toggle_histogram() -> None:
+    """
+    Show or hide the histogram panel under the images
+
+    :returns: None
+    """
+    PythoShopApp._show_histogram = not PythoShopApp._show_histogram
+    panel = PythoShopApp._root.histogram_panel
+    if PythoShopApp._show_histogram:
+        panel.height = 120
+        panel.opacity = 1
+        _show_histogram()
     else:
-        current_bytes = BytesIO()
-        img = Image.open(file_name)
-        # handle images that have transparency
-        if img.mode in ("RGBA", "LA") or (img.mode == "P" and "transparency" in img.info):
-            background = Image.new("RGBA", img.size, (255, 255, 255))
-            img = Image.alpha_composite(background, img).convert("RGB")
-        img.save(current_bytes, format="png")
-        img.close()
+        panel.height = 0
+        panel.opacity = 0
+
 
-    return current_bytes
+def _dump_timings() -> None:
+    """
+    Write the timing history to a JSON file on the desktop
+
+    :returns: None
+    """
+    file_name = os.path.join(os.path.expanduser("~"), "Desktop", "PythoShop timings " + time.strftime("%Y-%m-%d at %H.%M.%S") + ".json")
+    dump_json(file_name)
+    print("Timings written to", file_name)
 
 
 def _get_chosen_color() -> tuple[int, int, int]:
@@ -214,22 +371,36 @@ def _handle_touch_in_image(cimage: UixImage, event: MouseMotionEvent, cscatter)
     # Note: can't call your manip functions "_select_"
     if PythoShopApp._tool_function.__name__[:8] == "_select_":
         PythoShopApp._tool_function(actual_x, actual_y)
+    elif hasattr(PythoShopApp._tool_function, "draw_live"):
+        _draw_live(PythoShopApp._tool_function, (actual_x, actual_y))
     else:
         run_manip_function(PythoShopApp._tool_function, clicked_coordinate=(actual_x, actual_y))
 
 
-def _write_image_to_file_system(bytes: BytesIO) -> None:
+def _write_image_to_file_system(bytes: BytesIO, format: str = "png", level: typing.Optional[int] = None) -> None:
     """
-    Writes given bytes to the file system as a bitmap
+    Writes given bytes to the file system (in the background) in the chosen format
 
-    :param bytes: Bytes of bitmap to write to the filesystem
+    :param bytes: Bytes of the image to write to the filesystem
+    :param format: One of the formats in PythoShopWriter.SAVE_FORMATS
+    :param level: Compression level (PNG) or quality (JPEG/WebP)
     :returns: None
     """
-    bytes.seek(0)
-    new_image_file_name = os.path.join(os.path.expanduser("~"), "Desktop", "PythoShop " + time.strftime("%Y-%m-%d at %H.%M.%S") + ".png")
-    new_image_file = open(new_image_file_name, "wb")
-    new_image_file.write(bytes.read())
-    new_image_file.close()
+    PythoShopApp._root.save_button.text = "Saving..."
+
+    def report(file_name: str, error: typing.Optional[BaseException]) -> None:
+        # called from the writer thread so hop back onto the UI thread before touching widgets
+        def show(dt):
+            if error:
+                print("Error: couldn't save", file_name, "-", error)
+                PythoShopApp._root.save_button.text = "Save failed"
+            else:
+                PythoShopApp._root.save_button.text = "Saved"
+            Clock.schedule_once(lambda dt: setattr(PythoShopApp._root.save_button, "text", "Save"), 2)
+
+        Clock.schedule_once(show)
+
+    PythoShopApp._image_writer.save(bytes, format=format, level=level, callback=report)
 
 
 def _check_bmp_integrity(image: BytesIO) -> None:
@@ -241,38 +412,30 @@ def _check_bmp_integrity(image: BytesIO) -> None:
     """
     image.seek(0)
     assert image.read(2) == b"\x42\x4D", "header field was invalid"
-    file_byte_size = int.from_bytes(image.read(4), "little")
-
-    image.seek(10)
-    first_pixel_offset = int.from_bytes(image.read(4), "little")
-    header_size = int.from_bytes(image.read(4), "little")  # should be fpp - 14
-    pixel_width = int.from_bytes(image.read(4), "little")
-    pixel_height = int.from_bytes(image.read(4), "little")
-    color_planes = int.from_bytes(image.read(2), "little")
-    assert color_planes == 1, "color planes should be 1"
-    bits_per_pixel = int.from_bytes(image.read(2), "little")
+    header = read_bmp_header(image)
+    assert header.color_planes == 1, "color planes should be 1"
 
     bits_per_pixel_possibilities = [1, 4, 8, 16, 24, 32]
-    assert bits_per_pixel in bits_per_pixel_possibilities, (
-        "bits per pixel is set to " + str(bits_per_pixel) + " which is not one of the allowed options: " + ", ".join(bits_per_pixel_possibilities)
+    assert header.bits_per_pixel in bits_per_pixel_possibilities, (
+        "bits per pixel is set to "
+        + str(header.bits_per_pixel)
+        + " which is not one of the allowed options: "
+        + ", ".join(str(bpp) for bpp in bits_per_pixel_possibilities)
     )
-    bits_per_row = pixel_width * bits_per_pixel
-    bytes_per_row = math.ceil(bits_per_row / 8)
-    padding_bytes = 0
-    if bytes_per_row % 4 != 0:
-        padding_bytes = 4 - bytes_per_row % 4
-    row_byte_size = bytes_per_row + padding_bytes
-    theoretical_file_size = first_pixel_offset + row_byte_size * pixel_height
-    assert file_byte_size == theoretical_file_size, "file size is incorrect"
-
-    compression = int.from_bytes(image.read(4), "little")
-    assert compression == 0, "PythoShop doesn't support images with compression"
-    pixel_data_byte_size = int.from_bytes(image.read(4), "little")
-    assert pixel_data_byte_size == 0 or pixel_data_byte_size == row_byte_size * pixel_height, "pixel data size can either be 0 or the actual size"
+    theoretical_file_size = header.first_pixel_offset + header.row_size * header.height
+    assert header.file_byte_size == theoretical_file_size, "file size is incorrect"
+
+    assert header.compression == 0, "PythoShop doesn't support images with compression"
+    assert header.pixel_data_byte_size == 0 or header.pixel_data_byte_size == header.row_size * header.height, "pixel data size can either be 0 or the actual size"
     # only validates the header up to position 38
     image.seek(0)
 
 
+def _decode_pixels(bytes_: BytesIO) -> PixelBuffer:
+    bytes_.seek(0)
+    return PixelBuffer.from_image(Image.open(bytes_))
+
+
 def run_manip_function(func: typing.Callable, **kwargs) -> None:
     if _is_primary_tab_selected():
         image1 = PythoShopApp._image1
@@ -290,30 +453,145 @@ def run_manip_function(func: typing.Callable, **kwargs) -> None:
         kwargs["color"] = _get_chosen_color()
         kwargs["extra"] = _get_extra_text()
 
-        image1.bytes.seek(0)
-        img1 = Image.open(image1.bytes)
-        if image2.bytes:
-            image2.bytes.seek(0)
-            img2 = Image.open(image2.bytes)
-            kwargs["other_image"] = img2
-
-        result = func(img1, **kwargs)
-        if result != None:  # Something was returned, make sure it was an image file
-            if result.__class__ != Image.Image:
-                raise Exception("Function", func.__name__, "should have returned an image but instead returned something else")
-            verified_result = result
-        else:  # No return: assume that the change has been made to the image itself (img1)
-            verified_result = img1
+        timing = start_operation(func.__name__)
+        if wants_stats(func):
+            with timing.stage("stats"):
+                kwargs["stats"] = image1.get_stats()
+        previous_pixels, previous_stats = image1.pixels, image1.stats
+        if getattr(func, "__array_filter__", False):
+            # array filters work on (a copy of) the pixels the display already has so nothing needs decoding
+            with timing.stage("decode"):
+                pixels = (image1.pixels or _decode_pixels(image1.bytes)).copy()
+                if image2.bytes:
+                    kwargs["other_image"] = image2.pixels or _decode_pixels(image2.bytes)
+            timing.pixels = pixels.width * pixels.height
+            with timing.stage("function"):
+                if PythoShopApp._tile_runner.should_tile(func, pixels):
+                    result = PythoShopApp._tile_runner.run(func, pixels, **kwargs)
+                else:
+                    result = func(pixels, **kwargs)
+            if result is not None:
+                pixels = result
+            with timing.stage("encode"):
+                verified_result = pixels.to_image()
+                verified_bytes = BytesIO()
+                verified_result.save(verified_bytes, format="png")
+                verified_bytes.seek(0)
+        else:
+            with timing.stage("decode"):
+                image1.bytes.seek(0)
+                img1 = Image.open(image1.bytes)
+                img1.load()  # Pillow opens lazily so make sure the decode is counted here rather than in the function
+                if image2.bytes:
+                    image2.bytes.seek(0)
+                    img2 = Image.open(image2.bytes)
+                    img2.load()
+                    kwargs["other_image"] = img2
+            timing.pixels = img1.width * img1.height
+
+            with timing.stage("function"):
+                if PythoShopApp._tile_runner.should_tile(func, img1):
+                    result = PythoShopApp._tile_runner.run(func, img1, **kwargs)
+                else:
+                    result = func(img1, **kwargs)
+            if result != None:  # Something was returned, make sure it was an image file
+                if result.__class__ != Image.Image:
+                    raise Exception("Function", func.__name__, "should have returned an image but instead returned something else")
+                verified_result = result
+            else:  # No return: assume that the change has been made to the image itself (img1)
+                verified_result = img1
+
+            with timing.stage("encode"):
+                verified_bytes = BytesIO()
+                verified_result.save(verified_bytes, format="png")
+                verified_bytes.seek(0)
+                pixels = PixelBuffer.from_image(verified_result)
+
+        image1.load_image(image1.uix_image, verified_bytes, pixels)
+        if previous_pixels and previous_stats:
+            with timing.stage("stats"):
+                # tools usually only change a few rows so just recount those
+                image1.stats = update_stats(previous_stats, previous_pixels, pixels)
+        image1.do_binds(timing)
+
+    except SyntaxError:
+        print("Error: ", func.__name__, "generated an exception")
 
+
+def _draw_live(func: typing.Callable, clicked_coordinate: tuple[int, int]) -> None:
+    """
+    Use a tool that can draw while the mouse is held down (e.g. the marker) straight on the pixels and
+    texture being shown, re-uploading only the rows it changed; _finish_live_drawing does the rest of
+    run_manip_function's work (saving the image, statistics...) once the mouse is let go
+    """
+    image = _get_current_image()
+    if not image.uix_image or not image.bytes:
+        raise NoImageError("The currently selected tab doesn't have an image loaded into it")
+    if PythoShopApp._live_drawing is None:
+        timing = start_operation(func.__name__)
+        with timing.stage("decode"):
+            if image.pixels is None:
+                image.pixels = _decode_pixels(image.bytes)
+            PythoShopApp._live_drawing = (image, image.pixels.copy(), image.stats, timing)  # what it was like before the drawing
+        with timing.stage("texture"):
+            image.show_pixels()
+        timing.pixels = image.pixels.width * image.pixels.height
+    image, previous_pixels, previous_stats, timing = PythoShopApp._live_drawing
+    pixels = image.pixels
+    with timing.stage("function"):
+        top, bottom = func.draw_live(pixels, clicked_coordinate, _get_chosen_color(), _get_extra_text())
+    if top < bottom:
+        with timing.stage("texture"):
+            # the texture's rows are bottom-up like the pixels'
+            image.uix_image.texture.blit_buffer(
+                pixels.packed(top, bottom), size=(pixels.width, bottom - top), pos=(0, pixels.height - bottom), colorfmt="bgr", bufferfmt="ubyte"
+            )
+            image.uix_image.canvas.ask_update()
+
+
+def _finish_live_drawing() -> None:
+    """Save what was drawn with _draw_live into the image (once, when the mouse is let go)"""
+    if PythoShopApp._live_drawing is None:
+        return
+    image, previous_pixels, previous_stats, timing = PythoShopApp._live_drawing
+    PythoShopApp._live_drawing = None
+    pixels = image.pixels
+    with timing.stage("encode"):
         verified_bytes = BytesIO()
-        verified_result.save(verified_bytes, format="png")
+        pixels.to_image().save(verified_bytes, format="png")
         verified_bytes.seek(0)
+    image.load_image(image.uix_image, verified_bytes, pixels)
+    if previous_stats:
+        with timing.stage("stats"):
+            image.stats = update_stats(previous_stats, previous_pixels, pixels)
+    image.do_binds(timing)
 
-        image1.load_image(image1.uix_image, verified_bytes)
-        image1.do_binds()
 
-    except SyntaxError:
-        print("Error: ", func.__name__, "generated an exception")
+class ThumbnailChooserView(FileChooserIconView):
+    """
+    The standard icon view, but each image shows a preview of itself once
+    the thumbnail cache has one (and the generic file icon until then)
+    """
+
+    def on_path(self, instance, value: str) -> None:
+        PythoShopApp._thumbnail_cache.scan(value)
+
+    def on_entry_added(self, entry, parent=None) -> None:
+        super().on_entry_added(entry, parent)
+        if self.file_system.is_dir(entry.path):
+            return
+        icon = next((child for child in entry.children if isinstance(child, UixImage)), None)
+        if icon is None:
+            return
+        icon.fit_mode = "contain"
+
+        def on_thumbnail_ready(path: str, thumbnail: str) -> None:
+            # called from a worker thread so hop back onto the UI thread before touching the widget
+            Clock.schedule_once(lambda dt: setattr(icon, "source", thumbnail))
+
+        thumbnail = PythoShopApp._thumbnail_cache.request(entry.path, on_thumbnail_ready)
+        if thumbnail:
+            icon.source = thumbnail
 
 
 class FileChooserDialog(Widget):
@@ -322,6 +600,16 @@ class FileChooserDialog(Widget):
         if "rootpath" in kwargs:
             self.file_chooser.rootpath = kwargs["rootpath"]
 
+    def refresh(self) -> None:
+        """
+        Re-read the current folder so files created since the last time the
+        chooser was open show up (thumbnails for unchanged files come from the cache)
+
+        :returns: None
+        """
+        file_chooser = self.file_chooser.__self__  # the widget rather than the weak proxy kv gives ids
+        file_chooser.property("path").dispatch(file_chooser)  # as if the folder had been opened again (which scans it too)
+
     def open(self, file_name: list[str]) -> None:
         if len(file_name) != 1:
             return
@@ -334,17 +622,83 @@ class FileChooserDialog(Widget):
 
         PhotoShopWidget._file_chooser_popup.dismiss()
 
-        current_bytes = _get_image_bytes(file_name[0])
-        current_bytes.seek(0)
+        timing = start_operation("load " + os.path.basename(file_name[0]))
+        decoded = _load_image_file(file_name[0], timing)
 
         uix_image = UixImage(fit_mode="contain")
-        image.load_image(uix_image, current_bytes)
-        image.do_binds()
+        image.load_decoded(uix_image, decoded)
+        image.do_binds(timing)
         image.do_resize()
 
 
+class SaveDialog(Widget):
+    format = StringProperty("png")
+    level = NumericProperty(SAVE_FORMATS["png"][3])
+    level_text = StringProperty("")
+
+    def __init__(self, **kwargs) -> None:
+        super().__init__(**kwargs)
+        self._update_level_text()
+
+    def on_format(self, instance, value: str) -> None:
+        extension, lowest, highest, default = SAVE_FORMATS[value]
+        self.level_slider.disabled = lowest == highest
+        self.level_slider.min = lowest
+        self.level_slider.max = max(highest, lowest + 1)
+        self.level_slider.value = default
+        self._update_level_text()
+
+    def on_level(self, instance, value: float) -> None:
+        self._update_level_text()
+
+    def _update_level_text(self) -> None:
+        if self.format == "png":
+            self.level_text = "Compression level: " + str(int(self.level)) + " (higher is smaller but slower)"
+        elif self.format in ("jpeg", "webp"):
+            self.level_text = "Quality: " + str(int(self.level))
+        else:
+            self.level_text = "No compression"
+
+    def save(self) -> None:
+        PhotoShopWidget._save_popup.dismiss()
+        image = _get_current_image()
+        if image.bytes:
+            _write_image_to_file_system(image.bytes, self.format, int(self.level))
+
+
+class HistogramPanel(Widget):
+    """
+    Red, green, blue and luma (white) histograms of an image drawn on top of each other
+    """
+
+    CHANNEL_COLORS = {"red": (1, 0, 0), "green": (0, 0.8, 0), "blue": (0, 0, 1), "luma": (1, 1, 1)}
+
+    def __init__(self, **kwargs) -> None:
+        super().__init__(**kwargs)
+        self.stats: typing.Optional[ImageStats] = None
+        self.bind(pos=self._redraw, size=self._redraw)
+
+    def show(self, stats: typing.Optional[ImageStats]) -> None:
+        self.stats = stats
+        self._redraw()
+
+    def _redraw(self, *args) -> None:
+        self.canvas.after.clear()
+        if self.stats is None or self.height < 2:
+            return
+        tallest = max(max(histogram) for histogram in self.stats.histograms.values()) or 1
+        with self.canvas.after:
+            for channel, histogram in self.stats.histograms.items():
+                Color(*self.CHANNEL_COLORS[channel])
+                points = []
+                for value, count in enumerate(histogram):
+                    points += [self.x + value * self.width / 255, self.y + count * self.height / tallest]
+                Line(points=points, width=1)
+
+
 class PhotoShopWidget(Widget):
     _file_chooser_popup = None
+    _save_popup = None
 
     def toggle_color(self) -> None:
         if PythoShopApp._color_picker.is_visible:
@@ -359,12 +713,17 @@ class PhotoShopWidget(Widget):
     def load_image(self) -> None:
         if not PhotoShopWidget._file_chooser_popup:
             PhotoShopWidget._file_chooser_popup = Popup(title="Choose an image", content=FileChooserDialog(rootpath=os.path.expanduser("~")))
+        else:
+            PhotoShopWidget._file_chooser_popup.content.refresh()
         PhotoShopWidget._file_chooser_popup.open()
 
     def save_image(self) -> None:
         image = _get_current_image()
-        if image.bytes:
-            _write_image_to_file_system(image.bytes)
+        if not image.bytes:
+            return
+        if not PhotoShopWidget._save_popup:
+            PhotoShopWidget._save_popup = Popup(title="Save image", content=SaveDialog(), size_hint=(None, None), size=(500, 260))
+        PhotoShopWidget._save_popup.open()
 
     def apply_tool(self, event: MouseMotionEvent, callback: typing.Callable) -> bool:
         image = _get_current_image()
@@ -378,11 +737,17 @@ class PhotoShopWidget(Widget):
             return callback(event)
 
     def on_touch_down(self, touch: MouseMotionEvent) -> None:
+        if hasattr(PythoShopApp._tool_function, "start_stroke"):  # e.g. the marker shouldn't join this stroke to the last one
+            PythoShopApp._tool_function.start_stroke()
         self.apply_tool(touch, super().on_touch_down)
 
     def on_touch_move(self, movement: MouseMotionEvent) -> None:
         self.apply_tool(movement, super().on_touch_move)
 
+    def on_touch_up(self, touch: MouseMotionEvent) -> None:
+        _finish_live_drawing()
+        super().on_touch_up(touch)
+
 
 class PythoShopApp(App):
     _image1: ImageDisplay = ImageDisplay(is_primary=True)
@@ -391,6 +756,12 @@ class PythoShopApp(App):
     _tool_function: typing.Any = None
     _color_picker: typing.Optional[ColorPicker] = None
     _first_color = True
+    _show_timings = False
+    _show_histogram = False
+    _thumbnail_cache: ThumbnailCache = ThumbnailCache()
+    _image_writer: ImageWriter = ImageWriter()
+    _live_drawing: typing.Optional[tuple[ImageDisplay, PixelBuffer, typing.Optional[ImageStats], OperationTiming]] = None  # see _draw_live
+    _tile_runner: TileRunner = TileRunner()  # its workers are separate `python -m PythoShopTiles` processes that don't import this app
 
     def on_color(self, value: list[int]) -> None:
         """
@@ -413,11 +784,29 @@ class PythoShopApp(App):
         else:
             PythoShopApp._first_color = False
 
+    def on_stop(self) -> None:
+        PythoShopApp._thumbnail_cache.shutdown()
+        PythoShopApp._image_writer.shutdown()
+        PythoShopApp._tile_runner.shutdown()
+
     def _on_file_drop(self, window, file_path: str) -> None:
         PythoShopApp._root.extra_input.text = file_path
 
+    def _on_key_down(self, window, key: int, scancode: int, codepoint: str, modifiers: list[str]) -> bool:
+        if key == Keyboard.keycodes["f2"]:  # F2 shows/hides the histograms of the current image
+            _toggle_histogram()
+            return True
+        elif key == Keyboard.keycodes["f3"]:  # F3 shows/hides how long the last operation took
+            _toggle_timings()
+            return True
+        elif key == Keyboard.keycodes["f4"]:  # F4 saves the timing history for offline analysis
+            _dump_timings()
+            return True
+        return False
+
     def build(self) -> None:
         Window.bind(on_dropfile=self._on_file_drop)
+        Window.bind(on_key_down=self._on_key_down)
         PythoShopApp._root = PhotoShopWidget()
         # Find the functions that can be run
         try:
@@ -439,6 +828,20 @@ class PythoShopApp(App):
             select_color_button.bind(on_release=lambda btn: PythoShopApp._tool_dropdown.select(btn))
             PythoShopApp._tool_dropdown.add_widget(select_color_button)
 
+            # Then the tools that come with PythoShop
+            for text, func in BUILT_IN_TOOLS:
+                btn = Button(text=text, size_hint_y=None, height=44)
+                btn.func = func
+                btn.bind(on_release=lambda btn: PythoShopApp._tool_dropdown.select(btn))
+                PythoShopApp._tool_dropdown.add_widget(btn)
+
+            # The filters that come with PythoShop come before the ones in ImageManip.py
+            for text, func in BUILT_IN_FILTERS:
+                btn = Button(text=text, size_hint_y=None, height=44)
+                btn.func = func
+                btn.bind(on_release=lambda btn: PythoShopApp._filter_dropdown.select(btn))
+                PythoShopApp._filter_dropdown.add_widget(btn)
+
             spec = importlib.util.spec_from_file_location("ImageManip", os.getcwd() + "/ImageManip.py")
             manip_module = importlib.util.module_from_spec(spec)
             spec.loader.exec_module(manip_module)  # try to load it to see if we have a syntax error
@@ -473,27 +876,28 @@ class PythoShopApp(App):
                 PythoShopApp._tool_function = btn.func
 
             PythoShopApp._tool_dropdown.bind(on_select=select_tool)
+            PythoShopApp._root.images_panel.bind(current_tab=lambda panel, tab: _show_histogram())
         except SyntaxError:
             print("Error: ImageManip.py has a syntax error and can't be executed")
 
         if os.path.exists(DEFAULT_STARTING_PRIMARY_IMAGE_PATH):
-            current_bytes = _get_image_bytes(DEFAULT_STARTING_PRIMARY_IMAGE_PATH)
-            current_bytes.seek(0)
+            timing = start_operation("load " + os.path.basename(DEFAULT_STARTING_PRIMARY_IMAGE_PATH))
+            decoded = _load_image_file(DEFAULT_STARTING_PRIMARY_IMAGE_PATH, timing)
 
             # Create a Kivy Image widget for the loaded image
             uix_image = UixImage(fit_mode="contain")
-            PythoShopApp._image1.load_image(uix_image, current_bytes)
-            PythoShopApp._image1.do_binds()
+            PythoShopApp._image1.load_decoded(uix_image, decoded)
+            PythoShopApp._image1.do_binds(timing)
             PythoShopApp._image1.do_resize()
 
         if os.path.exists(DEFAULT_STARTING_SECONDARY_IMAGE_PATH):
-            current_bytes = _get_image_bytes(DEFAULT_STARTING_SECONDARY_IMAGE_PATH)
-            current_bytes.seek(0)
+            timing = start_operation("load " + os.path.basename(DEFAULT_STARTING_SECONDARY_IMAGE_PATH))
+            decoded = _load_image_file(DEFAULT_STARTING_SECONDARY_IMAGE_PATH, timing)
 
             # Create a Kivy Image widget for the loaded image
             uix_image = UixImage(fit_mode="contain")
-            PythoShopApp._image2.load_image(uix_image, current_bytes)
-            PythoShopApp._image2.do_binds()
+            PythoShopApp._image2.load_decoded(uix_image, decoded)
+            PythoShopApp._image2.do_binds(timing)
             PythoShopApp._image2.do_resize()
 
         return PythoShopApp._root
@@ -0,0 +1,178 @@
+"""PythoShop Blend
+
+Engine for weighted averages of two images (or an image and a color):
+blends, gradual blends and fades. Weights are integers in fixed point
+(ONE means "all of the other image") worked out once per row or column,
+and every row is blended in bulk. Results are rounded to the nearest
+value, which matches floating point solutions to within 1.
+"""
+
+import functools
+import typing
+
+from PythoShopExports import export_filter
+from PythoShopPixels import PixelBuffer
+
+FRACTION_BITS = 16
+ONE = 1 << FRACTION_BITS
+HALF = ONE >> 1
+DIRECTIONS = ("horizontal", "vertical")
+
+
+def to_fixed(amount: float) -> int:
+    """Convert a weight between 0 and 1 into fixed point"""
+    return max(0, min(ONE, round(amount * ONE)))
+
+
+def weight_table(length: int, start: float = 0.0, stop: float = 1.0) -> list[int]:
+    """
+    Weights going evenly from start (first row/column) to stop (last row/column)
+
+    :param length: How many rows or columns there are
+    :param start: Weight of the other image at the first one (0 to 1)
+    :param stop: Weight of the other image at the last one (0 to 1)
+    :returns: The fixed point weights
+    """
+    if length == 1:
+        return [to_fixed(start)]
+    return [to_fixed(start + (stop - start) * i / (length - 1)) for i in range(length)]
+
+
+@functools.lru_cache(maxsize=1024)
+def _share_tables(weight: int) -> tuple[list[int], list[int]]:
+    """Two 256 entry tables that turn each byte into its share of the result so blending is just lookups and a shift"""
+    return [value * (ONE - weight) for value in range(256)], [value * weight + HALF for value in range(256)]
+
+
+def blend_row(row: bytes, other_row: bytes, weight: int) -> bytes:
+    """
+    Blend two rows using the same weight for every byte
+
+    :param weight: Fixed point weight of other_row
+    :returns: The blended bytes (as long as the shorter row)
+    """
+    if weight == 0:
+        return bytes(row[: len(other_row)])
+    if weight == ONE:
+        return bytes(other_row[: len(row)])
+    share, other_share = _share_tables(weight)
+    return bytes((share[a] + other_share[b]) >> FRACTION_BITS for a, b in zip(row, other_row))
+
+
+def blend_row_by_column(row: bytes, other_row: bytes, byte_weights: list[int]) -> bytes:
+    """
+    Blend two rows with a different weight for every byte
+
+    :param byte_weights: Fixed point weight of other_row for each byte (i.e. each column's weight 3 times)
+    :returns: The blended bytes
+    """
+    return bytes((a * (ONE - w) + b * w + HALF) >> FRACTION_BITS for a, b, w in zip(row, other_row, byte_weights))
+
+
+def parse_amount(extra: str, default: float = 0.5) -> float:
+    """
+    Read how much of the other image to use from the extra parameters
+
+    :param extra: The text in the extra parameters box as a percentage, e.g. "25"
+    :param default: The amount to use if the text isn't a number
+    :returns: The amount between 0.0 and 1.0
+    """
+    try:
+        return max(0.0, min(1.0, float(extra.strip().rstrip("%")) / 100))
+    except ValueError:
+        return default
+
+
+def _open(image: typing.Any) -> PixelBuffer:
+    return image if isinstance(image, PixelBuffer) else PixelBuffer.open(image)
+
+
+def _finish(pixels: PixelBuffer, image: typing.Any) -> None:
+    if pixels is not image:
+        pixels.store(image)
+
+
+def _blend_overlap(
+    pixels: PixelBuffer, other_row: typing.Callable[[int], bytes], width: int, height: int, direction: typing.Optional[str], weights: typing.Any
+) -> None:
+    """Blend the top-left width x height pixels of pixels with the rows given by other_row"""
+    if direction == "horizontal":
+        byte_weights = [weight for weight in weights[:width] for channel in range(3)]
+    for y in range(height):
+        row = pixels.row(y)
+        if direction == "horizontal":
+            row[: 3 * width] = blend_row_by_column(row[: 3 * width], other_row(y), byte_weights)
+        else:
+            weight = weights[y] if direction == "vertical" else weights
+            row[: 3 * width] = blend_row(row[: 3 * width], other_row(y), weight)
+
+
+def blend(image: typing.Any, other_image: typing.Any, amount: float = 0.5) -> None:
+    """
+    Mix other_image into image (in place). If the images are different sizes,
+    only the part where they overlap (lined up at their top-left corners) changes.
+
+    :param image: A Pillow image (GUI), an open BMP file (tests) or a PixelBuffer
+    :param other_image: The image to mix in (same kinds as image)
+    :param amount: How much of other_image to use, e.g. 0.25 for 25%
+    :returns: None
+    """
+    pixels, other = _open(image), _open(other_image)
+    width, height = min(pixels.width, other.width), min(pixels.height, other.height)
+    _blend_overlap(pixels, lambda y: other.row(y)[: 3 * width], width, height, None, to_fixed(amount))
+    _finish(pixels, image)
+
+
+def blend_gradual(image: typing.Any, other_image: typing.Any, direction: str = "horizontal", start: float = 0.0, stop: float = 1.0) -> None:
+    """
+    Mix other_image into image (in place) with an amount that changes evenly
+    from the left to the right (horizontal) or the top to the bottom (vertical)
+
+    :param start: How much of other_image to use at the left/top
+    :param stop: How much of other_image to use at the right/bottom
+    :returns: None
+    """
+    if direction not in DIRECTIONS:
+        raise ValueError("direction should be one of: " + ", ".join(DIRECTIONS))
+    pixels, other = _open(image), _open(other_image)
+    width, height = min(pixels.width, other.width), min(pixels.height, other.height)
+    weights = weight_table(width if direction == "horizontal" else height, start, stop)
+    _blend_overlap(pixels, lambda y: other.row(y)[: 3 * width], width, height, direction, weights)
+    _finish(pixels, image)
+
+
+def fade(image: typing.Any, color: tuple[int, int, int], direction: str = "horizontal", fade_in: bool = True) -> None:
+    """
+    Fade an image (in place) from a color to the image (fade in) or from the
+    image to a color (fade out), left to right or top to bottom
+
+    :param color: The (r, g, b) color to fade from/to
+    :param direction: "horizontal" or "vertical"
+    :param fade_in: True to start with the color, False to end with it
+    :returns: None
+    """
+    if direction not in DIRECTIONS:
+        raise ValueError("direction should be one of: " + ", ".join(DIRECTIONS))
+    pixels = _open(image)
+    color_row = bytes((color[2], color[1], color[0])) * pixels.width
+    length = pixels.width if direction == "horizontal" else pixels.height
+    weights = weight_table(length, 1.0, 0.0) if fade_in else weight_table(length, 0.0, 1.0)
+    _blend_overlap(pixels, lambda y: color_row, pixels.width, pixels.height, direction, weights)
+    _finish(pixels, image)
+
+
+@export_filter
+def mix_other(image: typing.Any, other_image: typing.Any = None, extra: str = "", **kwargs) -> None:
+    """
+    Mix the other image into this one (where they overlap).
+    Type a percentage into the extra parameters to choose how much of the other image to use (50 if not).
+    """
+    if other_image is None:
+        return  # PythoShop only passes other_image when the other tab has an image
+    blend(image, other_image, parse_amount(extra))
+
+
+@export_filter
+def fade_to_color(image: typing.Any, color: tuple[int, int, int] = (0, 0, 0), **kwargs) -> None:
+    """Fade the image into the chosen color from left to right"""
+    fade(image, color, "horizontal", fade_in=False)
@@ -0,0 +1,134 @@
+"""PythoShop Chroma
+
+Engine for chroma keying ("green screen") an image onto another. Which
+pixels of the foreground are *not* the key color is worked out once per
+(image contents, key color, tolerance) as a packed bitmask plus the runs
+("spans") of opaque pixels in every row. The result is cached so that
+stamping the same foreground again and again only has to copy the spans.
+"""
+
+import collections
+import re
+import typing
+
+from PythoShopExports import export_filter
+from PythoShopPixels import PixelBuffer, key_tables, parse_tolerance, set_bits
+
+MASK_CACHE_SIZE = 16
+_mask_cache: collections.OrderedDict = collections.OrderedDict()
+_OPAQUE_RUN = re.compile(b"\x00+")
+
+
+class ChromaMask:
+    def __init__(self, width: int, height: int, spans: list[list[tuple[int, int]]]) -> None:
+        """
+        :param spans: For each row (from the top), the (start, stop) columns of each run of opaque pixels
+        """
+        self.width = width
+        self.height = height
+        self.spans = spans
+        self.row_bytes = -(-width // 8)
+        # one bit per pixel, most significant bit first, set where the pixel is opaque (not the key color)
+        self.bits = bytearray(self.row_bytes * height)
+        for y, row_spans in enumerate(spans):
+            base = y * self.row_bytes
+            for start, stop in row_spans:
+                set_bits(self.bits, base, start, stop)
+
+    def is_opaque(self, x: int, y: int) -> bool:
+        return bool(self.bits[y * self.row_bytes + (x >> 3)] & (0x80 >> (x & 7)))
+
+    def opaque_count(self) -> int:
+        return sum(stop - start for row_spans in self.spans for start, stop in row_spans)
+
+
+def compute_mask(pixels: PixelBuffer, color: tuple[int, int, int], tolerance: int = 0) -> ChromaMask:
+    """
+    Find the pixels that aren't the key color (without using the cache)
+
+    :param pixels: The foreground
+    :param color: The (r, g, b) key color
+    :param tolerance: How far each of r, g and b may be from the key color for the pixel to still count as the key
+    :returns: The mask
+    """
+    tables = key_tables(color, tolerance)
+    spans = []
+    for y in range(pixels.height):
+        row = bytes(pixels.row(y))
+        # 1 byte per pixel for each channel, combined so a pixel is 1 only if all three channels match the key
+        matches = [row[channel::3].translate(tables[channel]) for channel in range(3)]
+        combined = int.from_bytes(matches[0], "big") & int.from_bytes(matches[1], "big") & int.from_bytes(matches[2], "big")
+        key_bytes = combined.to_bytes(pixels.width, "big")
+        spans.append([match.span() for match in _OPAQUE_RUN.finditer(key_bytes)])
+    return ChromaMask(pixels.width, pixels.height, spans)
+
+
+def get_mask(pixels: PixelBuffer, color: tuple[int, int, int], tolerance: int = 0) -> ChromaMask:
+    """
+    Like compute_mask but remembers the most recently used masks
+
+    :returns: The (shared, so don't change it) mask
+    """
+    key = (pixels.content_hash(), tuple(color), tolerance)
+    mask = _mask_cache.get(key)
+    if mask is None:
+        mask = compute_mask(pixels, color, tolerance)
+        _mask_cache[key] = mask
+        if len(_mask_cache) > MASK_CACHE_SIZE:
+            _mask_cache.popitem(last=False)
+    else:
+        _mask_cache.move_to_end(key)
+    return mask
+
+
+def composite(target: PixelBuffer, foreground: PixelBuffer, mask: ChromaMask, position: tuple[int, int] = (0, 0)) -> None:
+    """
+    Copy the opaque pixels of the foreground onto the target (only where they overlap)
+
+    :param target: The image being drawn onto
+    :param foreground: The image being drawn
+    :param mask: The mask of the foreground
+    :param position: Where the top-left corner of the foreground goes on the target (may be outside it)
+    :returns: None
+    """
+    left, top = position
+    for y in range(max(0, -top), min(foreground.height, target.height - top)):
+        row_spans = mask.spans[y]
+        if not row_spans:
+            continue
+        source = foreground.row(y)
+        destination = target.row(y + top)
+        for start, stop in row_spans:
+            start = max(start, -left)
+            stop = min(stop, target.width - left)
+            if start < stop:
+                destination[3 * (start + left) : 3 * (stop + left)] = source[3 * start : 3 * stop]
+
+
+def chroma_overlay(image: typing.Any, other_image: typing.Any, color: tuple[int, int, int], tolerance: int = 0, position: tuple[int, int] = (0, 0)) -> None:
+    """
+    Put the parts of other_image that aren't the key color on top of image (changing image in place)
+
+    :param image: The background: a Pillow image (GUI), an open BMP file (tests) or a PixelBuffer
+    :param other_image: The foreground (same kinds as image)
+    :param color: The (r, g, b) key color
+    :param tolerance: How far each of r, g and b may be from the key color for the pixel to still count as the key
+    :param position: Where the top-left corner of other_image goes on image
+    :returns: None
+    """
+    target = image if isinstance(image, PixelBuffer) else PixelBuffer.open(image)
+    foreground = other_image if isinstance(other_image, PixelBuffer) else PixelBuffer.open(other_image)
+    composite(target, foreground, get_mask(foreground, color, tolerance), position)
+    if target is not image:
+        target.store(image)
+
+
+@export_filter
+def green_screen(image: typing.Any, other_image: typing.Any = None, color: tuple[int, int, int] = (0, 255, 0), extra: str = "", **kwargs) -> None:
+    """
+    Put the other image on top of this one, except where it is the chosen color.
+    Type a number into the extra parameters to also leave out colors that are that close to it.
+    """
+    if other_image is None:
+        return  # PythoShop only passes other_image when the other tab has an image
+    chroma_overlay(image, other_image, color, parse_tolerance(extra))
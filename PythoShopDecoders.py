@@ -0,0 +1,97 @@
+"""PythoShop Decoders
+
+Turns image files into something the GUI can both display and hand to
+the manipulation functions. Decoders are registered per file extension;
+uncompressed 24-bit BMP files are parsed directly into a pixel buffer and
+everything else is decoded (once) by Pillow.
+"""
+
+import collections
+import os
+import time
+import typing
+from io import BytesIO
+
+from PIL import Image
+
+from PythoShopPixels import PixelBuffer
+
+DECODERS: dict[str, typing.Callable[[str], "DecodedImage"]] = {}
+DECODE_HISTORY: collections.deque = collections.deque(maxlen=50)  # most recent DecodedImages, for diagnostics
+
+
+class DecodedImage:
+    def __init__(self, file_name: str, format: str, encoded: BytesIO, pixels: typing.Optional[PixelBuffer], timings: dict[str, float]) -> None:
+        self.file_name = file_name
+        self.format = format  # what the file actually contained (e.g. "bmp", "jpeg")
+        self.encoded = encoded  # a file Pillow can open, given to the manipulation functions
+        self.pixels = pixels  # ready to upload into a texture
+        self.timings = timings  # stage name -> seconds
+
+    def __repr__(self) -> str:
+        stages = ", ".join(stage + "=" + str(round(seconds * 1000, 1)) + "ms" for stage, seconds in self.timings.items())
+        return "DecodedImage(" + repr(self.file_name) + ", " + self.format + ", " + stages + ")"
+
+
+def register_decoder(*extensions: str) -> typing.Callable:
+    """Decorator
+    registers a function that decodes files with the given extensions
+    """
+
+    def register(func):
+        for extension in extensions:
+            DECODERS[extension.lower()] = func
+        return func
+
+    return register
+
+
+@register_decoder(".bmp")
+def decode_bmp(file_name: str) -> DecodedImage:
+    start = time.perf_counter()
+    with open(file_name, "rb") as bmp_file:
+        # Load it directly rather than going through Pillow where we might loose some fidelity (e.g. paddding bytes)
+        encoded = BytesIO(bmp_file.read())
+    read = time.perf_counter()
+    try:
+        pixels = PixelBuffer.from_bmp(encoded)
+    except ValueError:
+        # e.g. a palette or compressed bitmap, which Pillow knows how to deal with
+        return decode_with_pillow(file_name)
+    encoded.seek(0)
+    parsed = time.perf_counter()
+    return DecodedImage(file_name, "bmp", encoded, pixels, {"read": read - start, "parse": parsed - read})
+
+
+@register_decoder(".png", ".jpg", ".jpeg", ".tiff", ".webp")
+def decode_with_pillow(file_name: str) -> DecodedImage:
+    start = time.perf_counter()
+    img = Image.open(file_name)
+    format = (img.format or "unknown").lower()
+    img.load()
+    decoded = time.perf_counter()
+    # handle images that have transparency
+    if img.mode in ("RGBA", "LA") or (img.mode == "P" and "transparency" in img.info):
+        background = Image.new("RGBA", img.size, (255, 255, 255))
+        img = Image.alpha_composite(background, img.convert("RGBA")).convert("RGB")
+    pixels = PixelBuffer.from_image(img)
+    img.close()
+    converted = time.perf_counter()
+    # an uncompressed bitmap of the pixels is cheap to build and for Pillow to open again
+    encoded = pixels.to_bmp()
+    wrapped = time.perf_counter()
+    return DecodedImage(file_name, format, encoded, pixels, {"decode": decoded - start, "convert": converted - decoded, "wrap": wrapped - converted})
+
+
+def decode_image(file_name: str) -> DecodedImage:
+    """
+    Decode an image file with the decoder registered for its extension
+
+    :param file_name: The image file
+    :returns: The decoded image
+    """
+    extension = os.path.splitext(file_name)[-1].lower()
+    decoder = DECODERS.get(extension, decode_with_pillow)
+    decoded = decoder(file_name)
+    DECODE_HISTORY.append(decoded)
+    return decoded
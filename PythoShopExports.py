@@ -6,19 +6,75 @@ from ImageManip.py into the PythoShop GUI application.
 
 import functools
 from PIL import Image
+from PythoShopPixels import PixelBuffer
 
-def export_filter(func):
+def export_filter(func=None, *, tile_safe=False):
     """Decorator
     describes a function that will be called on an image 
     *as a whole* immediately when the user selects it.
+
+    Use @export_filter(tile_safe=True) when every pixel of the result
+    only depends on the same pixel of the image (no neighbors, image size
+    or random numbers) so PythoShop can run it on bands of a big image
+    on several cores at once.
     """
+    if func is None:
+        return lambda func: export_filter(func, tile_safe=tile_safe)
     func.__type__ = "filter"
     func.__return_type__ = None
+    func.__tile_safe__ = tile_safe
     @functools.wraps(func)
     def wrapper(image, *args, **kwargs):
         return func(image, *args, **kwargs)
     return wrapper
 
+def export_array_filter(func=None, *, tile_safe=False):
+    """Decorator
+    describes a filter written with numpy (which has to be installed).
+    Instead of the image it gets a writable height × width × 3 array of
+    its (red, green, blue) values with row 0 at the top: changing the
+    array changes the image. color is an array of 3 and other_image
+    (if there is one) another array, which is read-only. Either change
+    the array in place or return a new one (which can be a different size).
+
+    tile_safe means the same as for export_filter: big images are split
+    into bands and each band gets its own array.
+    """
+    if func is None:
+        return lambda func: export_array_filter(func, tile_safe=tile_safe)
+    func.__type__ = "filter"
+    func.__return_type__ = None
+    func.__tile_safe__ = tile_safe
+    func.__array_filter__ = True
+    @functools.wraps(func)
+    def wrapper(image, *args, **kwargs):
+        import numpy  # optional: only array filters need it
+        # only a PixelBuffer (what the GUI and the tile runner pass) is viewed without copying: the pixels
+        # of a BMP file (the tests) are read into one and written back, and a Pillow image is converted both ways
+        pixels = image if isinstance(image, PixelBuffer) else PixelBuffer.open(image)
+        other_image = kwargs.get("other_image")
+        if other_image is not None:
+            other_array = (other_image if isinstance(other_image, PixelBuffer) else PixelBuffer.open(other_image)).array()
+            other_array.flags.writeable = False  # it can be the pixels of the other tab
+            kwargs["other_image"] = other_array
+        if kwargs.get("color") is not None:
+            kwargs["color"] = numpy.array(kwargs["color"], dtype=numpy.uint8)
+        result = func(pixels.array(), *args, **kwargs)
+        if result is not None:
+            pixels = PixelBuffer.from_array(result)
+        elif pixels is image:
+            return None
+        elif not isinstance(image, Image.Image) or image.mode == "RGB":
+            pixels.store(image)
+            return None
+        # give back a new image of the same kind as the one that was passed in
+        if isinstance(image, PixelBuffer):
+            return pixels
+        if isinstance(image, Image.Image):
+            return pixels.to_image()
+        return pixels.to_bmp()
+    return wrapper
+
 def export_tool(func):
     """Decorator 
     describes a function that will get selected and then called 
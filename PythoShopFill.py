@@ -0,0 +1,133 @@
+"""PythoShop Fill
+
+Engine for the paint bucket: an iterative scanline flood fill. Instead of
+recursing pixel by pixel (which overflows the stack on real photos), it
+works with runs of matching pixels in a row: each run is filled with one
+slice assignment and the rows above and below are searched for runs that
+touch it. Filled pixels are remembered in a packed bitmap (1 bit per
+pixel) and only the runs still to be searched are kept in a list, so the
+memory used is small and depends only on the image size.
+"""
+
+import typing
+
+from PythoShopExports import export_tool
+from PythoShopPixels import PixelBuffer, key_tables, parse_tolerance, set_bits
+
+# each byte of the visited bitmap turned into 8 bytes of 1 (not visited yet) or 0 (visited)
+_UNVISITED = [bytes(0 if bits & (0x80 >> i) else 1 for i in range(8)) for bits in range(256)]
+_FIRST_CHUNK = 64  # how many pixels past the searched columns to look at first for the end of a run
+
+
+class _FillRegion:
+    """The pixels of one image that are close enough to a color and haven't been filled yet"""
+
+    def __init__(self, pixels: PixelBuffer, color: tuple[int, int, int], tolerance: int) -> None:
+        self.pixels = pixels
+        self.tables = key_tables(color, tolerance)
+        self.row_bytes = -(-pixels.width // 8)
+        self.visited = bytearray(self.row_bytes * pixels.height)
+
+    def fillable(self, y: int, start: int, stop: int) -> bytes:
+        """1 byte per pixel of columns start up to (not including) stop of row y: 1 if it still needs filling, 0 if not"""
+        count = stop - start
+        if count <= 0:
+            return b""
+        row = bytes(self.pixels.row(y)[3 * start : 3 * stop])
+        base = y * self.row_bytes
+        unvisited = b"".join(map(_UNVISITED.__getitem__, self.visited[base + (start >> 3) : base + ((stop - 1) >> 3) + 1]))
+        combined = int.from_bytes(unvisited[start & 7 : (start & 7) + count], "big")
+        for channel in range(3):
+            combined &= int.from_bytes(row[channel::3].translate(self.tables[channel]), "big")
+        return combined.to_bytes(count, "big")
+
+    def run_start(self, y: int, x: int) -> int:
+        """Where the run of fillable pixels that ends just before column x of row y starts"""
+        chunk = _FIRST_CHUNK
+        while x > 0:
+            # look further each time so a long run takes a few big steps rather than many small ones
+            chunk_start = max(0, x - chunk)
+            edge = self.fillable(y, chunk_start, x).rfind(b"\x00")
+            if edge != -1:
+                return chunk_start + edge + 1
+            x = chunk_start
+            chunk *= 2
+        return 0
+
+    def run_stop(self, y: int, x: int) -> int:
+        """Where the run of fillable pixels that starts at column x of row y stops"""
+        width = self.pixels.width
+        chunk = _FIRST_CHUNK
+        while x < width:
+            chunk_stop = min(width, x + chunk)
+            edge = self.fillable(y, x, chunk_stop).find(b"\x00")
+            if edge != -1:
+                return x + edge
+            x = chunk_stop
+            chunk *= 2
+        return width
+
+    def mark(self, y: int, start: int, stop: int) -> None:
+        set_bits(self.visited, y * self.row_bytes, start, stop)
+
+
+def flood_fill(image: typing.Any, start: tuple[int, int], color: tuple[int, int, int], tolerance: int = 0) -> int:
+    """
+    Fill the area around start that is (close to) the same color as start (in place)
+
+    :param image: A Pillow image (GUI), an open BMP file (tests) or a PixelBuffer
+    :param start: The (x, y) pixel to start from (measured from the top-left)
+    :param color: The (r, g, b) color to fill with
+    :param tolerance: How far each of r, g and b may be from the start pixel's color and still get filled
+    :returns: The number of pixels filled
+    """
+    pixels = image if isinstance(image, PixelBuffer) else PixelBuffer.open(image)
+    x, y = start
+    if not (0 <= x < pixels.width and 0 <= y < pixels.height):
+        return 0
+    region = _FillRegion(pixels, pixels.get_pixel(x, y), tolerance)
+    fill_run = bytes((color[2], color[1], color[0]))
+    filled = 0
+    # (row, leftmost column, rightmost column, direction) of parts of rows that still need searching: the run
+    # they touch is in the row before them in that direction (0 for the start, which has nothing before it)
+    pending = [(y, x, x, 0)]
+    while pending:
+        y, left, right, direction = pending.pop()
+        if not 0 <= y < pixels.height:
+            continue
+        # only the columns being searched (and the one either side of them) are looked at, plus the ends of
+        # runs that stick out further, so the work done for a run doesn't depend on how wide the image is
+        low, high = max(0, left - 1), min(pixels.width, right + 2)
+        fillable = region.fillable(y, low, high)
+        found = fillable.find(b"\x01", left - low, right - low + 1)
+        while found != -1:
+            edge = fillable.rfind(b"\x00", 0, found)
+            run_start = low + edge + 1 if edge != -1 else region.run_start(y, low)
+            edge = fillable.find(b"\x00", found)
+            run_stop = low + edge if edge != -1 else region.run_stop(y, high)
+            pixels.row(y)[3 * run_start : 3 * run_stop] = fill_run * (run_stop - run_start)
+            region.mark(y, run_start, run_stop)
+            filled += run_stop - run_start
+            if direction:
+                pending.append((y + direction, run_start, run_stop - 1, direction))
+                # the row it came from was filled from left to right, so only the parts sticking out past that need searching
+                if run_start < left:
+                    pending.append((y - direction, run_start, left - 1, -direction))
+                if run_stop - 1 > right:
+                    pending.append((y - direction, right + 1, run_stop - 1, -direction))
+            else:
+                pending.append((y - 1, run_start, run_stop - 1, -1))
+                pending.append((y + 1, run_start, run_stop - 1, 1))
+            found = fillable.find(b"\x01", edge, right - low + 1) if edge != -1 else -1
+    if pixels is not image:
+        pixels.store(image)
+    return filled
+
+
+@export_tool
+def paint_bucket(image: typing.Any, clicked_coordinate: tuple[int, int], color: tuple[int, int, int] = (0, 0, 0), extra: str = "", **kwargs) -> None:
+    """
+    Fill the area around the clicked pixel that is the same color as it with the chosen color.
+    Type a number into the extra parameters to also fill colors that are that close to it.
+    """
+    flood_fill(image, clicked_coordinate, color, parse_tolerance(extra))
@@ -0,0 +1,428 @@
+"""PythoShop Neighborhood
+
+Engine for filters where each output pixel depends on the pixels around
+it (blurs, edge detection, line drawings, ...). Rather than seeking to
+every neighbor of every pixel, rows are read once each and kept in a
+sliding window that only holds the rows the current output row needs.
+Large in-memory images can also be split into horizontal bands that are
+processed on several cores.
+"""
+
+import abc
+import collections
+import concurrent.futures
+import os
+import typing
+
+from PIL import Image
+
+from PythoShopExports import export_filter
+from PythoShopPixels import PixelBuffer, read_bmp_header
+
+EDGE_MODES = ("clamp", "wrap", "skip")
+
+# some commonly used kernels
+BOX_BLUR = [[1, 1, 1], [1, 1, 1], [1, 1, 1]]
+GAUSSIAN_BLUR = [1, 2, 1]  # separable: use for both directions
+SHARPEN = [[0, -1, 0], [-1, 5, -1], [0, -1, 0]]
+EDGE_DETECT = [[-1, -1, -1], [-1, 8, -1], [-1, -1, -1]]
+
+
+def edge_index(i: int, n: int, edge: str) -> typing.Optional[int]:
+    """
+    Map a (possibly out of bounds) row or column index back into the image
+
+    :param i: The index
+    :param n: The number of rows/columns in the image
+    :param edge: "clamp" repeats the edge pixels, "wrap" continues from the other side, "skip" gives None
+    :returns: The index to use instead, or None if the pixel should be skipped
+    """
+    if 0 <= i < n:
+        return i
+    if edge == "clamp":
+        return 0 if i < 0 else n - 1
+    if edge == "wrap":
+        return i % n
+    return None
+
+
+class FileRows:
+    """Rows of an open BMP file, read (and written) a whole row at a time"""
+
+    def __init__(self, image: typing.BinaryIO) -> None:
+        header = read_bmp_header(image)
+        if header.bits_per_pixel != 24 or header.compression != 0:
+            raise ValueError("only uncompressed 24-bit BMP files are supported")
+        self.image = image
+        self.first_pixel_offset = header.first_pixel_offset
+        self.width = header.width
+        self.height = header.height
+        self.row_size = header.row_size
+
+    def get(self, y: int) -> bytes:
+        self.image.seek(self.first_pixel_offset + (self.height - 1 - y) * self.row_size)
+        return self.image.read(3 * self.width)
+
+    def put(self, y: int, row: bytes) -> None:
+        self.image.seek(self.first_pixel_offset + (self.height - 1 - y) * self.row_size)
+        self.image.write(row)
+
+
+class BufferRows:
+    """Rows of a PixelBuffer"""
+
+    def __init__(self, pixels: PixelBuffer) -> None:
+        self.pixels = pixels
+        self.width = pixels.width
+        self.height = pixels.height
+
+    def get(self, y: int) -> bytes:
+        return bytes(self.pixels.row(y))
+
+    def put(self, y: int, row: bytes) -> None:
+        self.pixels.row(y)[:] = row
+
+
+class RowWindow:
+    """
+    Sliding window over the rows of an image. Asking for the rows around
+    row y reads any that aren't resident yet and forgets those that no
+    later row can need (assuming rows are visited top to bottom).
+    """
+
+    def __init__(self, rows: typing.Union[FileRows, BufferRows], radius: int, edge: str = "clamp") -> None:
+        if edge not in EDGE_MODES:
+            raise ValueError("edge should be one of: " + ", ".join(EDGE_MODES))
+        self.rows = rows
+        self.radius = radius
+        self.edge = edge
+        self._resident: collections.OrderedDict[int, bytes] = collections.OrderedDict()
+        # the last rows wrap around to need the first ones, so those are kept (as they were read) for the whole pass
+        self._pinned = set()
+        if edge == "wrap":
+            self._pinned = set(range(min(radius, rows.height)))
+
+    def _get(self, y: int) -> bytes:
+        row = self._resident.get(y)
+        if row is None:
+            row = self.rows.get(y)
+            self._resident[y] = row
+        return row
+
+    def around(self, y: int) -> tuple[list[typing.Optional[bytes]], list[typing.Optional[int]]]:
+        """
+        The rows from y - radius to y + radius
+
+        :param y: The row in the middle (measured from the top)
+        :returns: Tuple of (rows, which source row each one came from), both None for skipped rows
+        """
+        source_ys = [edge_index(y + dy, self.rows.height, self.edge) for dy in range(-self.radius, self.radius + 1)]
+        window = [None if sy is None else self._get(sy) for sy in source_ys]
+        for resident_y in list(self._resident):
+            if resident_y < y - self.radius and resident_y not in self._pinned:
+                del self._resident[resident_y]
+        return window, source_ys
+
+
+class Operation(abc.ABC):
+    """
+    Something computed for every pixel from the rows around it. Subclasses
+    implement compute() and must be picklable so they can run on other cores.
+    """
+
+    radius = 1
+    edge = "clamp"
+
+    def setup(self, width: int, height: int) -> None:
+        """Called once before any rows are computed"""
+        self.width = width
+        self.height = height
+        # for each horizontal offset, the byte index of each column's neighbor
+        self.column_maps = []
+        for dx in range(-self.radius, self.radius + 1):
+            columns = [edge_index(x + dx, width, "clamp" if self.edge == "skip" else self.edge) for x in range(width)]
+            self.column_maps.append([3 * column for column in columns])
+
+    @abc.abstractmethod
+    def compute(self, rows: list, source_ys: list, y: int) -> bytes:
+        """
+        Work out output row y
+
+        :param rows: The rows from y - radius to y + radius (bytes without padding)
+        :param source_ys: Which row of the image each of rows is
+        :param y: The row being computed
+        :returns: The bytes of the new row (without padding)
+        """
+
+    def row(self, rows: list, source_ys: list, y: int) -> bytes:
+        original = rows[self.radius]
+        if self.edge == "skip" and None in source_ys:
+            return original  # too close to the top or bottom to have a full neighborhood
+        computed = self.compute(rows, source_ys, y)
+        if self.edge == "skip" and self.radius > 0:
+            # too close to the left or right edge to have a full neighborhood
+            computed = bytearray(computed)
+            edge_bytes = 3 * min(self.radius, self.width)
+            computed[:edge_bytes] = original[:edge_bytes]
+            computed[-edge_bytes:] = original[-edge_bytes:]
+        return bytes(computed)
+
+
+def _clamp_channel(totals: list, divisor: int, offset: int) -> list:
+    if divisor == 1:
+        return [0 if t + offset < 0 else 255 if t + offset > 255 else t + offset for t in totals]
+    half = divisor // 2
+    values = [(t + half) // divisor + offset for t in totals]
+    return [0 if v < 0 else 255 if v > 255 else v for v in values]
+
+
+class Convolution(Operation):
+    def __init__(self, kernel: list[list[int]], divisor: typing.Optional[int] = None, offset: int = 0, edge: str = "clamp") -> None:
+        """
+        :param kernel: Square grid of integer weights with an odd number of rows
+        :param divisor: What the weighted sum gets divided by, the sum of the weights if None (or 1 if they sum to 0)
+        :param offset: Added after dividing
+        :param edge: How to treat neighbors that are outside the image (see EDGE_MODES)
+        """
+        self.kernel = kernel
+        self.radius = len(kernel) // 2
+        total = sum(sum(kernel_row) for kernel_row in kernel)
+        self.divisor = divisor if divisor is not None else (total if total != 0 else 1)
+        self.offset = offset
+        self.edge = edge
+        # only the non-zero weights need to be visited
+        self.taps = [(j, i, weight) for j, kernel_row in enumerate(kernel) for i, weight in enumerate(kernel_row) if weight != 0]
+
+    def compute(self, rows: list, source_ys: list, y: int) -> bytes:
+        out = bytearray(3 * self.width)
+        for channel in range(3):
+            totals = [0] * self.width
+            for j, i, weight in self.taps:
+                row = rows[j]
+                columns = self.column_maps[i]
+                totals = [total + weight * row[column + channel] for total, column in zip(totals, columns)]
+            out[channel::3] = bytes(_clamp_channel(totals, self.divisor, self.offset))
+        return out
+
+
+class SeparableConvolution(Operation):
+    def __init__(
+        self, horizontal: list[int], vertical: typing.Optional[list[int]] = None, divisor: typing.Optional[int] = None, offset: int = 0, edge: str = "clamp"
+    ) -> None:
+        """
+        A kernel that is the product of a horizontal and a vertical one (e.g.
+        a Gaussian blur) which only needs 2n rather than n² multiplications per pixel
+
+        :param horizontal: Weights applied across each row (odd length)
+        :param vertical: Weights applied down each column, the same as horizontal if None
+        """
+        if vertical is None:
+            vertical = horizontal
+        if len(horizontal) != len(vertical):
+            raise ValueError("the horizontal and vertical kernels should be the same length")
+        self.horizontal = horizontal
+        self.vertical = vertical
+        self.radius = len(horizontal) // 2
+        total = sum(horizontal) * sum(vertical)
+        self.divisor = divisor if divisor is not None else (total if total != 0 else 1)
+        self.offset = offset
+        self.edge = edge
+        self._passes: collections.OrderedDict = collections.OrderedDict()
+
+    def __getstate__(self) -> dict:
+        state = self.__dict__.copy()
+        state["_passes"] = collections.OrderedDict()
+        return state
+
+    def _horizontal_pass(self, row: bytes, sy: int) -> list:
+        totals = self._passes.get(sy)
+        if totals is None:
+            totals = []
+            for channel in range(3):
+                channel_totals = [0] * self.width
+                for i, weight in enumerate(self.horizontal):
+                    if weight != 0:
+                        columns = self.column_maps[i]
+                        channel_totals = [total + weight * row[column + channel] for total, column in zip(channel_totals, columns)]
+                totals.append(channel_totals)
+            self._passes[sy] = totals
+            if len(self._passes) > 2 * self.radius + 2:
+                self._passes.popitem(last=False)
+        return totals
+
+    def compute(self, rows: list, source_ys: list, y: int) -> bytes:
+        passes = [self._horizontal_pass(row, sy) for row, sy in zip(rows, source_ys)]
+        out = bytearray(3 * self.width)
+        for channel in range(3):
+            totals = [0] * self.width
+            for j, weight in enumerate(self.vertical):
+                if weight != 0:
+                    totals = [total + weight * value for total, value in zip(totals, passes[j][channel])]
+            out[channel::3] = bytes(_clamp_channel(totals, self.divisor, self.offset))
+        return out
+
+
+class Neighborhood:
+    """The pixels around one position, handed to the function of a WindowMap"""
+
+    def __init__(self, operation: "WindowMap", rows: list) -> None:
+        self._rows = rows
+        self._column_maps = operation.column_maps
+        self._radius = operation.radius
+        self.x = 0
+
+    def get(self, dx: int, dy: int) -> tuple[int, int, int]:
+        """The (r, g, b) color of the pixel dx to the right of and dy below the current one"""
+        row = self._rows[self._radius + dy]
+        i = self._column_maps[self._radius + dx][self.x]
+        return row[i + 2], row[i + 1], row[i]
+
+
+class WindowMap(Operation):
+    def __init__(self, func: typing.Callable[[Neighborhood], tuple[int, int, int]], radius: int = 1, edge: str = "clamp") -> None:
+        """
+        Compute each pixel with an arbitrary function of its neighborhood
+
+        :param func: Called as func(neighborhood) and returns the new (r, g, b); must be a module-level function to use several cores
+        :param radius: How far away the neighbors the function looks at are
+        """
+        self.func = func
+        self.radius = radius
+        self.edge = edge
+
+    def compute(self, rows: list, source_ys: list, y: int) -> bytes:
+        out = bytearray(3 * self.width)
+        neighborhood = Neighborhood(self, rows)
+        func = self.func
+        for x in range(self.width):
+            neighborhood.x = x
+            r, g, b = func(neighborhood)
+            out[3 * x] = b
+            out[3 * x + 1] = g
+            out[3 * x + 2] = r
+        return out
+
+
+def _run_rows(operation: Operation, rows: typing.Union[FileRows, BufferRows], start: int, stop: int, write_back: bool = True) -> list[bytes]:
+    operation.setup(rows.width, rows.height)
+    window = RowWindow(rows, operation.radius, operation.edge)
+    results = []
+    pending: collections.deque = collections.deque()
+    for y in range(start, stop):
+        window_rows, source_ys = window.around(y)
+        computed = operation.row(window_rows, source_ys, y)
+        if write_back:
+            # rows are written once no later row can read them (the window keeps its own copy of the rest)
+            pending.append((y, computed))
+            while pending and pending[0][0] < y - operation.radius:
+                rows.put(*pending.popleft())
+        else:
+            results.append(computed)
+    while pending:
+        rows.put(*pending.popleft())
+    return results
+
+
+class _BandRows:
+    """The rows a band of the image needs (including the ones just outside it), as sent to a worker process"""
+
+    def __init__(self, width: int, height: int, rows: dict[int, bytes]) -> None:
+        self.width = width
+        self.height = height
+        self.rows = rows
+
+    def get(self, y: int) -> bytes:
+        return self.rows[y]
+
+
+def _run_band(operation: Operation, band: _BandRows, start: int, stop: int) -> list[bytes]:
+    return _run_rows(operation, band, start, stop, write_back=False)
+
+
+def _run_bands(operation: Operation, pixels: PixelBuffer, workers: int) -> None:
+    height = pixels.height
+    band_height = -(-height // workers)
+    futures = []
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as executor:
+        for start in range(0, height, band_height):
+            stop = min(height, start + band_height)
+            needed = {edge_index(y, height, operation.edge) for y in range(start - operation.radius, stop + operation.radius)}
+            needed.discard(None)
+            band = _BandRows(pixels.width, height, {y: bytes(pixels.row(y)) for y in needed})
+            futures.append((start, executor.submit(_run_band, operation, band, start, stop)))
+        for start, future in futures:
+            for y, computed in enumerate(future.result(), start):
+                pixels.row(y)[:] = computed
+
+
+def apply(image: typing.Any, operation: Operation, workers: int = 1) -> None:
+    """
+    Run a neighborhood operation over a whole image, changing it in place
+
+    :param image: A Pillow image (GUI), an open BMP file (tests) or a PixelBuffer
+    :param operation: e.g. Convolution(BOX_BLUR)
+    :param workers: How many processes to split the image between (0 for one per core). They are started
+        for each call, so only split images that take much longer than that (and not in the GUI, where
+        new processes import all of PythoShop again on Windows and macOS)
+    :returns: None
+    """
+    if workers == 0:
+        workers = os.cpu_count() or 1
+    if isinstance(image, PixelBuffer):
+        pixels = image
+    elif isinstance(image, Image.Image) or workers > 1:
+        pixels = PixelBuffer.open(image)
+    else:
+        # stream through the file keeping only the rows in the window in memory
+        rows = FileRows(image)
+        _run_rows(operation, rows, 0, rows.height)
+        return
+    if workers > 1 and pixels.height >= 2 * workers:
+        _run_bands(operation, pixels, workers)
+    else:
+        _run_rows(operation, BufferRows(pixels), 0, pixels.height)
+    if pixels is not image:
+        pixels.store(image)
+
+
+def convolve(image: typing.Any, kernel: list[list[int]], divisor: typing.Optional[int] = None, offset: int = 0, edge: str = "clamp", workers: int = 1) -> None:
+    """Convolve an image with a square kernel in place (see Convolution and apply)"""
+    apply(image, Convolution(kernel, divisor, offset, edge), workers)
+
+
+def convolve_separable(
+    image: typing.Any,
+    horizontal: list[int],
+    vertical: typing.Optional[list[int]] = None,
+    divisor: typing.Optional[int] = None,
+    offset: int = 0,
+    edge: str = "clamp",
+    workers: int = 1,
+) -> None:
+    """Convolve an image with a separable kernel in place (see SeparableConvolution and apply)"""
+    apply(image, SeparableConvolution(horizontal, vertical, divisor, offset, edge), workers)
+
+
+def map_neighborhoods(
+    image: typing.Any, func: typing.Callable[[Neighborhood], tuple[int, int, int]], radius: int = 1, edge: str = "clamp", workers: int = 1
+) -> None:
+    """Replace every pixel with func(neighborhood) in place (see WindowMap and apply)"""
+    apply(image, WindowMap(func, radius, edge), workers)
+
+
+@export_filter
+def blur(image: typing.Any, **kwargs) -> None:
+    """Soften the image by mixing every pixel with the ones around it"""
+    convolve_separable(image, GAUSSIAN_BLUR)
+
+
+@export_filter
+def sharpen(image: typing.Any, **kwargs) -> None:
+    """Make the edges in the image stand out more"""
+    convolve(image, SHARPEN)
+
+
+@export_filter
+def edge_detect(image: typing.Any, **kwargs) -> None:
+    """Turn the image black except where the color changes suddenly"""
+    convolve(image, EDGE_DETECT)
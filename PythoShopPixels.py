@@ -0,0 +1,305 @@
+"""PythoShop Pixels
+
+A 24-bit pixel buffer laid out exactly like the pixel array of a BMP file
+so that it can be shared between BMP files (used by the tests), Pillow
+images (used by the GUI) and Kivy textures without re-encoding.
+"""
+
+import hashlib
+import math
+import typing
+from io import BytesIO
+
+from PIL import Image
+
+
+class BmpHeader:
+    def __init__(
+        self,
+        file_byte_size: int,
+        first_pixel_offset: int,
+        header_size: int,
+        width: int,
+        height: int,
+        color_planes: int,
+        bits_per_pixel: int,
+        compression: int,
+        pixel_data_byte_size: int,
+    ) -> None:
+        self.file_byte_size = file_byte_size
+        self.first_pixel_offset = first_pixel_offset
+        self.header_size = header_size
+        self.width = width
+        self.height = height
+        self.color_planes = color_planes
+        self.bits_per_pixel = bits_per_pixel
+        self.compression = compression
+        self.pixel_data_byte_size = pixel_data_byte_size
+        bytes_per_row = math.ceil(width * bits_per_pixel / 8)
+        self.row_padding = 0
+        if bytes_per_row % 4 != 0:
+            self.row_padding = 4 - bytes_per_row % 4
+        self.row_size = bytes_per_row + self.row_padding
+
+
+def read_bmp_header(image: typing.BinaryIO) -> BmpHeader:
+    """
+    Read the fields of a BMP header (up to position 38) without validating them
+
+    :param image: An open BMP file (or BytesIO)
+    :returns: The header fields
+    """
+    image.seek(0)
+    header = image.read(38)
+    if len(header) < 38 or header[:2] != b"\x42\x4D":
+        raise ValueError("not a BMP file")
+    return BmpHeader(
+        file_byte_size=int.from_bytes(header[2:6], "little"),
+        first_pixel_offset=int.from_bytes(header[10:14], "little"),
+        header_size=int.from_bytes(header[14:18], "little"),
+        width=int.from_bytes(header[18:22], "little"),
+        height=int.from_bytes(header[22:26], "little", signed=True),
+        color_planes=int.from_bytes(header[26:28], "little"),
+        bits_per_pixel=int.from_bytes(header[28:30], "little"),
+        compression=int.from_bytes(header[30:34], "little"),
+        pixel_data_byte_size=int.from_bytes(header[34:38], "little"),
+    )
+
+
+def make_bmp_header(width: int, height: int) -> bytes:
+    """
+    Build the header for an uncompressed 24-bit BMP file (BITMAPINFOHEADER version)
+
+    :param width: Width in pixels
+    :param height: Height in pixels
+    :returns: The 54 bytes that come before the pixel data
+    """
+    row_size = math.ceil(width * 3 / 4) * 4
+    header = bytearray(54)
+    header[0:2] = b"\x42\x4D"
+    header[2:6] = (54 + row_size * height).to_bytes(4, "little")
+    header[10:14] = (54).to_bytes(4, "little")
+    header[14:18] = (40).to_bytes(4, "little")
+    header[18:22] = width.to_bytes(4, "little")
+    header[22:26] = height.to_bytes(4, "little")
+    header[26:28] = (1).to_bytes(2, "little")
+    header[28:30] = (24).to_bytes(2, "little")
+    header[34:38] = (row_size * height).to_bytes(4, "little")
+    return bytes(header)
+
+
+def parse_tolerance(extra: str) -> int:
+    """
+    Read the tolerance (how far each of r, g and b may be from a color) from the extra parameters
+
+    :param extra: The text in the extra parameters box, e.g. "10"
+    :returns: The tolerance between 0 and 255 (0 if the text isn't a number)
+    """
+    try:
+        return max(0, min(255, int(extra.strip())))
+    except ValueError:
+        return 0
+
+
+def set_bits(bits: bytearray, base: int, start: int, stop: int) -> None:
+    """Set bits start up to (not including) stop in the row of bits beginning at byte `base`"""
+    first_byte, last_byte = start >> 3, (stop - 1) >> 3
+    first_mask = 0xFF >> (start & 7)
+    last_mask = (0xFF << (7 - ((stop - 1) & 7))) & 0xFF
+    if first_byte == last_byte:
+        bits[base + first_byte] |= first_mask & last_mask
+        return
+    bits[base + first_byte] |= first_mask
+    bits[base + first_byte + 1 : base + last_byte] = b"\xff" * (last_byte - first_byte - 1)
+    bits[base + last_byte] |= last_mask
+
+
+def key_tables(color: tuple[int, int, int], tolerance: int) -> list[bytes]:
+    """For the blue, green and red bytes: a translation table giving 1 if a value is close enough to the key and 0 if not"""
+    return [bytes(1 if abs(value - key) <= tolerance else 0 for value in range(256)) for key in (color[2], color[1], color[0])]
+
+
+class PixelBuffer:
+    """
+    Rows are stored bottom-up, 3 bytes per pixel in BGR order and padded to a
+    multiple of 4 bytes, just like in a BMP file. Coordinates given to the
+    methods are measured from the top-left corner like everywhere else in PythoShop.
+    """
+
+    def __init__(self, width: int, height: int, data: typing.Optional[bytearray] = None, header: typing.Optional[bytes] = None) -> None:
+        self.width = width
+        self.height = height
+        self.row_size = math.ceil(width * 3 / 4) * 4
+        self.row_padding = self.row_size - width * 3
+        if data is None:
+            data = bytearray(self.row_size * height)
+        if len(data) != self.row_size * height:
+            raise ValueError("pixel data should be " + str(self.row_size * height) + " bytes but is " + str(len(data)))
+        self.data = data
+        self.header = header  # the original BMP header (kept so it can be written back untouched)
+
+    @classmethod
+    def from_bmp(cls, image: typing.BinaryIO) -> "PixelBuffer":
+        """
+        Read the pixels of an uncompressed 24-bit BMP file with a single read
+
+        :param image: An open BMP file (or BytesIO)
+        :returns: The pixel buffer
+        """
+        header = read_bmp_header(image)
+        if header.bits_per_pixel != 24 or header.compression != 0 or header.height <= 0:
+            raise ValueError("only uncompressed, bottom-up, 24-bit BMP files are supported")
+        image.seek(0)
+        header_bytes = image.read(header.first_pixel_offset)
+        data = bytearray(header.row_size * header.height)
+        if image.readinto(data) != len(data):
+            raise ValueError("the BMP file is shorter than its header says")
+        return cls(header.width, header.height, data, header_bytes)
+
+    @classmethod
+    def from_image(cls, img: Image.Image) -> "PixelBuffer":
+        """
+        Copy the pixels of a Pillow image (Pillow does the BGR conversion and padding in C)
+
+        :param img: The image
+        :returns: The pixel buffer
+        """
+        if img.mode != "RGB":
+            img = img.convert("RGB")
+        row_size = math.ceil(img.width * 3 / 4) * 4
+        return cls(img.width, img.height, bytearray(img.tobytes("raw", "BGR", row_size, -1)))
+
+    @classmethod
+    def from_array(cls, array: typing.Any) -> "PixelBuffer":
+        """
+        Copy the pixels of a height × width × 3 (red, green, blue) array, e.g. one returned by an array filter.
+        Values are clipped to 0-255 and a height × width array is treated as gray.
+
+        :param array: A numpy array (or anything numpy can turn into one)
+        :returns: The pixel buffer
+        """
+        import numpy  # optional: only array filters need it
+
+        array = numpy.asarray(array)
+        if array.ndim == 2:
+            array = array[:, :, numpy.newaxis]
+        if array.ndim != 3 or array.shape[2] not in (1, 3):
+            raise ValueError("an image array should be height × width × 3 but is " + " × ".join(str(size) for size in array.shape))
+        pixels = cls(array.shape[1], array.shape[0])
+        pixels.array()[...] = numpy.clip(array, 0, 255)
+        return pixels
+
+    @classmethod
+    def open(cls, image: typing.Any) -> "PixelBuffer":
+        """
+        Get the pixels of whatever PythoShop handed a manipulation function
+
+        :param image: A Pillow image (GUI) or an open BMP file (tests)
+        :returns: The pixel buffer
+        """
+        if isinstance(image, Image.Image):
+            return cls.from_image(image)
+        return cls.from_bmp(image)
+
+    def store(self, image: typing.Any) -> None:
+        """
+        Write the pixels back into the image they came from (which must be the same size)
+
+        :param image: A Pillow image (GUI) or an open BMP file (tests)
+        :returns: None
+        """
+        if isinstance(image, Image.Image):
+            if image.size != (self.width, self.height) or image.mode != "RGB":
+                raise ValueError("can only store pixels back into an RGB image of the same size")
+            image.frombytes(bytes(self.data), "raw", "BGR", self.row_size, -1)
+        else:
+            header = read_bmp_header(image)
+            if header.width != self.width or header.height != self.height:
+                raise ValueError("can only store pixels back into a BMP file of the same size")
+            image.seek(header.first_pixel_offset)
+            image.write(self.data)
+
+    def array(self) -> typing.Any:
+        """
+        A writable height × width × 3 numpy view of the pixels in (red, green, blue) order with row 0
+        at the top. Nothing is copied: changing the array changes the pixels (and the other way around).
+        """
+        import numpy  # optional: only array filters need it
+
+        rows = numpy.frombuffer(self.data, dtype=numpy.uint8).reshape(self.height, self.row_size)
+        return rows[::-1, : 3 * self.width].reshape(self.height, self.width, 3)[:, :, ::-1]
+
+    def to_image(self) -> Image.Image:
+        return Image.frombuffer("RGB", (self.width, self.height), bytes(self.data), "raw", "BGR", self.row_size, -1)
+
+    def to_bmp(self) -> BytesIO:
+        """
+        Build a complete BMP file out of the pixels
+
+        :returns: The BMP file (positioned at the start)
+        """
+        if self.header and len(self.header) >= 54:
+            header = bytearray(self.header)
+            header[2:6] = (len(header) + len(self.data)).to_bytes(4, "little")
+            header[34:38] = len(self.data).to_bytes(4, "little")
+        else:
+            header = make_bmp_header(self.width, self.height)
+        bmp = BytesIO()
+        bmp.write(header)
+        bmp.write(self.data)
+        bmp.seek(0)
+        return bmp
+
+    def like(self, width: typing.Optional[int] = None, height: typing.Optional[int] = None) -> "PixelBuffer":
+        """
+        Make a new (black) buffer, by default the same size as this one
+
+        :returns: The new pixel buffer
+        """
+        return PixelBuffer(self.width if width is None else width, self.height if height is None else height)
+
+    def copy(self) -> "PixelBuffer":
+        return PixelBuffer(self.width, self.height, bytearray(self.data), self.header)
+
+    def row_offset(self, y: int) -> int:
+        """Index of the first byte of row y (measured from the top)"""
+        return (self.height - 1 - y) * self.row_size
+
+    def offset(self, x: int, y: int) -> int:
+        """Index of the blue byte of pixel (x, y) (measured from the top-left)"""
+        return (self.height - 1 - y) * self.row_size + 3 * x
+
+    def row(self, y: int) -> memoryview:
+        """A writable view of the pixels (without padding) of row y (measured from the top)"""
+        start = (self.height - 1 - y) * self.row_size
+        return memoryview(self.data)[start : start + 3 * self.width]
+
+    def get_pixel(self, x: int, y: int) -> tuple[int, int, int]:
+        """The (r, g, b) color of pixel (x, y)"""
+        i = self.offset(x, y)
+        return self.data[i + 2], self.data[i + 1], self.data[i]
+
+    def set_pixel(self, x: int, y: int, color: tuple[int, int, int]) -> None:
+        i = self.offset(x, y)
+        self.data[i] = color[2]
+        self.data[i + 1] = color[1]
+        self.data[i + 2] = color[0]
+
+    def packed(self, top: int = 0, bottom: typing.Optional[int] = None) -> bytes:
+        """
+        The pixels without the row padding (bottom-up, BGR), e.g. for uploading into a texture
+
+        :param top: The first row to include (measured from the top)
+        :param bottom: The row after the last one to include (the bottom of the image if None)
+        :returns: The bytes
+        """
+        bottom = self.height if bottom is None else bottom
+        first, last = (self.height - bottom) * self.row_size, (self.height - top) * self.row_size
+        if self.row_padding == 0:
+            return bytes(self.data[first:last])
+        view = memoryview(self.data)
+        width_bytes = 3 * self.width
+        return b"".join(view[start : start + width_bytes] for start in range(first, last, self.row_size))
+
+    def content_hash(self) -> str:
+        return hashlib.blake2b(self.data, digest_size=16, person=self.width.to_bytes(4, "little") + self.height.to_bytes(4, "little")).hexdigest()
@@ -0,0 +1,219 @@
+"""PythoShop Raster
+
+Engine for the line drawing lessons (lines, thick lines, borders, X's,
+diagonals) and the marker tool. Shapes are turned into horizontal spans
+(row, first column, column after the last) instead of single pixels. The
+spans are merged and clipped to the image once, then each one is written
+with a single slice assignment of the color's bytes.
+
+While the mouse is held down PythoShop draws the marker with draw_live,
+straight into the pixels and texture it's showing, and only saves the
+image (and recounts its statistics) once when the mouse is let go.
+"""
+
+import typing
+
+from PythoShopExports import export_tool
+from PythoShopPixels import PixelBuffer
+
+Span = tuple[int, int, int]  # (y, x start, x stop) measured from the top-left, stop not included
+DEFAULT_MARKER_RADIUS = 3
+
+
+def hline(y: int, x_start: int, x_stop: int, thickness: int = 1, centered: bool = False) -> list[Span]:
+    """
+    A horizontal line
+
+    :param y: The row of the line (its top row, or middle row if centered)
+    :param x_start: First column of the line
+    :param x_stop: Column after the last one
+    :param thickness: How many rows thick the line is
+    :param centered: Whether y is the middle of the line (extra rows go below for even thicknesses) rather than its top
+    :returns: The spans
+    """
+    top = y - (thickness - 1) // 2 if centered else y
+    return rectangle(x_start, top, x_stop, top + thickness)
+
+
+def vline(x: int, y_start: int, y_stop: int, thickness: int = 1, centered: bool = False) -> list[Span]:
+    """
+    A vertical line (see hline): x is its left column, or middle column if centered
+    """
+    left = x - (thickness - 1) // 2 if centered else x
+    return rectangle(left, y_start, left + thickness, y_stop)
+
+
+def rectangle(left: int, top: int, right: int, bottom: int) -> list[Span]:
+    """A filled rectangle from (left, top) up to (but not including) (right, bottom)"""
+    return [(y, left, right) for y in range(top, bottom)]
+
+
+def border(width: int, height: int, thickness: int = 1) -> list[Span]:
+    """
+    A frame around the inside edges of a width x height image
+
+    :param thickness: How many pixels thick the frame is
+    :returns: The spans
+    """
+    spans = rectangle(0, 0, width, thickness) + rectangle(0, height - thickness, width, height)
+    for y in range(thickness, height - thickness):
+        spans.append((y, 0, thickness))
+        spans.append((y, width - thickness, width))
+    return spans
+
+
+def line(start: tuple[int, int], stop: tuple[int, int], thickness: int = 1) -> list[Span]:
+    """
+    A straight line between two pixels (both included) using Bresenham's algorithm. Pixels
+    next to each other in a row become one span. Thick lines use a square pen centered on the line.
+
+    :param start: The (x, y) pixel where the line begins
+    :param stop: The (x, y) pixel where the line ends
+    :param thickness: Width of the pen
+    :returns: The spans
+    """
+    (x0, y0), (x1, y1) = start, stop
+    dx, dy = abs(x1 - x0), -abs(y1 - y0)
+    step_x = 1 if x0 < x1 else -1
+    step_y = 1 if y0 < y1 else -1
+    error = dx + dy
+    spans = []
+    run_start = x0
+    while True:
+        if x0 == x1 and y0 == y1:
+            spans.append((y0, min(run_start, x0), max(run_start, x0) + 1))
+            break
+        doubled = 2 * error
+        if doubled <= dx:  # moving to the next row so the current run is done
+            spans.append((y0, min(run_start, x0), max(run_start, x0) + 1))
+        if doubled >= dy:
+            error += dy
+            x0 += step_x
+        if doubled <= dx:
+            error += dx
+            y0 += step_y
+            run_start = x0
+    if thickness > 1:
+        before, after = (thickness - 1) // 2, thickness // 2 + 1
+        spans = [(y + offset, x_start - before, x_stop + after - 1) for y, x_start, x_stop in spans for offset in range(-before, after)]
+    return spans
+
+
+def disc(center: tuple[int, int], radius: int) -> list[Span]:
+    """A filled circle of all the pixels within radius of center"""
+    x, y = center
+    spans = []
+    for offset in range(-radius, radius + 1):
+        half = int((radius * radius - offset * offset) ** 0.5)
+        spans.append((y + offset, x - half, x + half + 1))
+    return spans
+
+
+def stroke(start: tuple[int, int], stop: tuple[int, int], radius: int) -> list[Span]:
+    """
+    Everything a round pen of the given radius touches going from start to stop, i.e. a disc
+    at every pixel of the line between them
+    """
+    spans = []
+    for y, x_start, x_stop in line(start, stop):
+        for row, left, right in disc((0, y), radius):
+            spans.append((row, x_start + left, x_stop - 1 + right))
+    return spans
+
+
+def merge(spans: typing.Iterable[Span], width: int, height: int) -> dict[int, list[tuple[int, int]]]:
+    """
+    Clip spans to a width x height image and combine the ones that overlap or touch
+
+    :returns: For each row with something in it, its sorted (start, stop) spans
+    """
+    rows: dict[int, list[tuple[int, int]]] = {}
+    for y, x_start, x_stop in spans:
+        if 0 <= y < height:
+            x_start, x_stop = max(0, x_start), min(width, x_stop)
+            if x_start < x_stop:
+                rows.setdefault(y, []).append((x_start, x_stop))
+    for y, row_spans in rows.items():
+        row_spans.sort()
+        merged = [row_spans[0]]
+        for x_start, x_stop in row_spans[1:]:
+            if x_start <= merged[-1][1]:
+                merged[-1] = (merged[-1][0], max(merged[-1][1], x_stop))
+            else:
+                merged.append((x_start, x_stop))
+        rows[y] = merged
+    return rows
+
+
+def draw(image: typing.Any, spans: typing.Iterable[Span], color: tuple[int, int, int]) -> int:
+    """
+    Color the pixels of some spans (in place); the parts outside the image are ignored
+
+    :param image: A Pillow image (GUI), an open BMP file (tests) or a PixelBuffer
+    :param spans: The shape to draw, e.g. from line or border
+    :param color: The (r, g, b) color to draw with
+    :returns: The number of pixels colored
+    """
+    pixels = image if isinstance(image, PixelBuffer) else PixelBuffer.open(image)
+    color_bytes = bytes((color[2], color[1], color[0]))
+    drawn = 0
+    for y, row_spans in merge(spans, pixels.width, pixels.height).items():
+        row = pixels.row(y)
+        for x_start, x_stop in row_spans:
+            row[3 * x_start : 3 * x_stop] = color_bytes * (x_stop - x_start)
+            drawn += x_stop - x_start
+    if pixels is not image:
+        pixels.store(image)
+    return drawn
+
+
+class _Stroke:
+    """Where the marker was last drawn, so that dragging quickly still makes a solid line"""
+
+    def __init__(self) -> None:
+        self.last: typing.Optional[tuple[int, int]] = None
+
+    def reset(self) -> None:
+        self.last = None
+
+
+_marker_stroke = _Stroke()
+
+
+def parse_radius(extra: str) -> int:
+    """The marker radius typed into the extra parameters (DEFAULT_MARKER_RADIUS if it isn't a number)"""
+    try:
+        return max(0, int(extra.strip()))
+    except ValueError:
+        return DEFAULT_MARKER_RADIUS
+
+
+def _marker_spans(clicked_coordinate: tuple[int, int], extra: str) -> list[Span]:
+    """The marker's spans from where it was last drawn to clicked_coordinate"""
+    start = _marker_stroke.last if _marker_stroke.last is not None else clicked_coordinate
+    _marker_stroke.last = clicked_coordinate
+    return stroke(start, clicked_coordinate, parse_radius(extra))
+
+
+@export_tool
+def marker(image: typing.Any, clicked_coordinate: tuple[int, int], color: tuple[int, int, int] = (0, 0, 0), extra: str = "", **kwargs) -> None:
+    """
+    Draw with a round marker in the chosen color. Type a number into the extra parameters to change its radius.
+    """
+    draw(image, _marker_spans(clicked_coordinate, extra), color)
+
+
+def _draw_marker_live(pixels: PixelBuffer, clicked_coordinate: tuple[int, int], color: tuple[int, int, int], extra: str) -> tuple[int, int]:
+    """
+    The marker while the mouse is held down: draws straight into the pixels on the screen
+
+    :returns: The rows that changed (top, and bottom not included) so only they have to be shown again
+    """
+    spans = _marker_spans(clicked_coordinate, extra)
+    draw(pixels, spans, color)
+    rows = [y for y, x_start, x_stop in spans]
+    return max(0, min(rows)), min(pixels.height, max(rows) + 1)
+
+
+marker.start_stroke = _marker_stroke.reset
+marker.draw_live = _draw_marker_live
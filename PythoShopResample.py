@@ -0,0 +1,227 @@
+"""PythoShop Resample
+
+Engine for changing the size of an image (shrink, enlarge, resize).
+Which source pixels (and how much of each) make up every output row and
+column is worked out once per (input size, output size, method) and
+cached, then applied a whole row at a time. Output rows are written as
+soon as they are ready and only the source rows they need are kept, so
+enlarging a big image never holds two full copies of it in memory.
+"""
+
+import collections
+import functools
+import typing
+from io import BytesIO
+
+from PIL import Image
+
+from PythoShopExports import export_filter
+from PythoShopNeighborhood import BufferRows, FileRows
+from PythoShopPixels import PixelBuffer, make_bmp_header
+
+METHODS = ("nearest", "box", "bilinear")
+FRACTION_BITS = 16  # precision of the bilinear weights
+ONE = 1 << FRACTION_BITS
+
+
+class ResampleMap:
+    """For each output index along one axis: the source indexes it is made from and their integer weights"""
+
+    def __init__(self, sources: tuple, weights: tuple) -> None:
+        self.sources = sources
+        self.weights = weights
+        self.totals = tuple(sum(index_weights) for index_weights in weights)
+        self.is_nearest = all(len(index_sources) == 1 for index_sources in sources)
+
+    def __len__(self) -> int:
+        return len(self.sources)
+
+
+@functools.lru_cache(maxsize=64)
+def resample_map(in_size: int, out_size: int, method: str) -> ResampleMap:
+    """
+    Work out which source pixels make up each output pixel along one axis
+
+    :param in_size: Number of pixels in the source
+    :param out_size: Number of pixels in the output
+    :param method: "nearest" picks one pixel, "box" averages all the pixels an output pixel covers,
+        "bilinear" blends the two nearest pixels (measured from the pixel centers)
+    :returns: The map (cached, so don't change it)
+    """
+    if method not in METHODS:
+        raise ValueError("method should be one of: " + ", ".join(METHODS))
+    sources = []
+    weights = []
+    for i in range(out_size):
+        if method == "nearest":
+            sources.append((i * in_size // out_size,))
+            weights.append((1,))
+        elif method == "box":
+            start = i * in_size // out_size
+            stop = max(start + 1, -(-(i + 1) * in_size // out_size))  # ceiling division
+            sources.append(tuple(range(start, stop)))
+            weights.append((1,) * (stop - start))
+        else:
+            # position of the output pixel's center in source pixels, in fixed point
+            center = ((2 * i + 1) * in_size * ONE // out_size - ONE) // 2
+            center = max(0, min((in_size - 1) * ONE, center))
+            left = center >> FRACTION_BITS
+            fraction = center & (ONE - 1)
+            if fraction == 0 or left + 1 >= in_size:
+                sources.append((left,))
+                weights.append((1,))
+            else:
+                sources.append((left, left + 1))
+                weights.append((ONE - fraction, fraction))
+    return ResampleMap(tuple(sources), tuple(weights))
+
+
+@functools.lru_cache(maxsize=64)
+def _byte_map(in_width: int, out_width: int) -> list[int]:
+    """Byte index in a source row of every byte of a nearest-neighbor output row"""
+    columns = resample_map(in_width, out_width, "nearest").sources
+    return [3 * column[0] + channel for column in columns for channel in range(3)]
+
+
+class _Rows:
+    """Horizontally resampled source rows, kept only while some output row still needs them"""
+
+    def __init__(self, rows: typing.Union[FileRows, BufferRows], columns: ResampleMap, out_width: int) -> None:
+        self.rows = rows
+        self.columns = columns
+        self.out_width = out_width
+        self._resident: collections.OrderedDict = collections.OrderedDict()
+
+    def get(self, sy: int) -> typing.Any:
+        resampled = self._resident.get(sy)
+        if resampled is None:
+            row = self.rows.get(sy)
+            if self.columns.is_nearest:
+                resampled = bytes(map(row.__getitem__, _byte_map(self.rows.width, self.out_width)))
+            else:
+                # un-divided channel totals so rounding only happens once (after the vertical pass)
+                resampled = []
+                for channel in range(3):
+                    resampled.append(
+                        [
+                            sum(weight * row[3 * source + channel] for source, weight in zip(sources, weights))
+                            for sources, weights in zip(self.columns.sources, self.columns.weights)
+                        ]
+                    )
+            self._resident[sy] = resampled
+        return resampled
+
+    def forget_before(self, sy: int) -> None:
+        while self._resident and next(iter(self._resident)) < sy:
+            self._resident.popitem(last=False)
+
+
+def _resample_rows(rows: typing.Union[FileRows, BufferRows], out_width: int, out_height: int, method: str) -> typing.Iterator[tuple[int, bytes]]:
+    columns = resample_map(rows.width, out_width, method)
+    lines = resample_map(rows.height, out_height, method)
+    resampled_rows = _Rows(rows, columns, out_width)
+    previous = None
+    for y in range(out_height):
+        sources = lines.sources[y]
+        resampled_rows.forget_before(sources[0])
+        if previous and previous[0] == sources and previous[1] == lines.weights[y]:
+            yield y, previous[2]  # e.g. enlarging: the same as the row above
+            continue
+        if columns.is_nearest and len(sources) == 1:
+            out = resampled_rows.get(sources[0])
+        else:
+            out = bytearray(3 * out_width)
+            divisors = [column_total * lines.totals[y] for column_total in columns.totals]
+            parts = []
+            for sy, weight in zip(sources, lines.weights[y]):
+                resampled = resampled_rows.get(sy)
+                if columns.is_nearest:
+                    # turn the gathered bytes into per-channel values with a weight of 1
+                    resampled = [list(resampled[channel::3]) for channel in range(3)]
+                parts.append((weight, resampled))
+            for channel in range(3):
+                totals = [0] * out_width
+                for weight, resampled in parts:
+                    totals = [total + weight * value for total, value in zip(totals, resampled[channel])]
+                out[channel::3] = bytes((total + divisor // 2) // divisor for total, divisor in zip(totals, divisors))
+            out = bytes(out)
+        previous = (sources, lines.weights[y], out)
+        yield y, out
+
+
+def resample(image: typing.Any, width: int, height: int, method: str = "nearest", out: typing.Optional[typing.BinaryIO] = None) -> typing.Any:
+    """
+    Make a resized copy of an image
+
+    :param image: A Pillow image (GUI), an open BMP file (tests) or a PixelBuffer
+    :param width: Width of the result
+    :param height: Height of the result
+    :param method: One of METHODS
+    :param out: For BMP files, an open file to write the result into (e.g. a temporary file) rather than a new BytesIO
+    :returns: The same kind of thing as image, but resized
+    """
+    if width < 1 or height < 1:
+        raise ValueError("the result must be at least 1x1 pixels")
+    if isinstance(image, (PixelBuffer, Image.Image)):
+        pixels = image if isinstance(image, PixelBuffer) else PixelBuffer.from_image(image)
+        result = PixelBuffer(width, height)
+        for y, row in _resample_rows(BufferRows(pixels), width, height, method):
+            result.row(y)[:] = row
+        return result if isinstance(image, PixelBuffer) else result.to_image()
+
+    # stream the rows straight into the new file
+    if out is None:
+        out = BytesIO()
+    header = make_bmp_header(width, height)
+    row_size = -(-3 * width // 4) * 4
+    padding = bytes(row_size - 3 * width)
+    out.seek(0)
+    out.truncate()
+    out.write(header)
+    for y, row in _resample_rows(FileRows(image), width, height, method):
+        out.seek(len(header) + (height - 1 - y) * row_size)
+        out.write(row)
+        out.write(padding)
+    out.seek(0)
+    return out
+
+
+def _size_of(image: typing.Any) -> tuple[int, int]:
+    if isinstance(image, (PixelBuffer, Image.Image)):
+        return image.width, image.height
+    rows = FileRows(image)
+    return rows.width, rows.height
+
+
+def shrink(image: typing.Any, factor: int = 2, method: str = "nearest") -> typing.Any:
+    """Make an image `factor` times smaller in both directions (see resample)"""
+    width, height = _size_of(image)
+    return resample(image, max(1, width // factor), max(1, height // factor), method)
+
+
+def enlarge(image: typing.Any, factor: int = 2, method: str = "nearest") -> typing.Any:
+    """Make an image `factor` times bigger in both directions (see resample)"""
+    width, height = _size_of(image)
+    return resample(image, width * factor, height * factor, method)
+
+
+def resize(image: typing.Any, scale: float, method: str = "nearest") -> typing.Any:
+    """
+    Scale an image by any (positive) amount, e.g. the number typed into the extra parameters box
+
+    :param scale: e.g. 3 for three times bigger or 0.25 for a quarter of the size
+    """
+    width, height = _size_of(image)
+    return resample(image, max(1, int(width * scale)), max(1, int(height * scale)), method)
+
+
+@export_filter
+def half_size(image: typing.Any, **kwargs) -> typing.Any:
+    """Make the image half as wide and half as tall (averaging each 2x2 block of pixels)"""
+    return shrink(image, 2, "box")
+
+
+@export_filter
+def double_size(image: typing.Any, **kwargs) -> typing.Any:
+    """Make the image twice as wide and twice as tall (smoothly, rather than with 2x2 blocks)"""
+    return enlarge(image, 2, "bilinear")
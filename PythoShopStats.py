@@ -0,0 +1,159 @@
+"""PythoShop Stats
+
+Index of the statistics that filters like make_better_two_tone,
+make_n_tone, intensify_partial and saturate need about a whole image:
+histograms of red, green, blue and luma (brightness) and the means,
+minimums, maximums and percentiles that come from them. Histograms are
+counted in bulk by Pillow, cached against the image contents, and after a
+small edit (e.g. a tool click) only the rows that changed are recounted.
+
+A manipulation function that has a stats parameter is handed the
+statistics of its image, by PythoShop and by the tests alike.
+"""
+
+import collections
+import inspect
+import typing
+
+from PIL import Image
+
+from PythoShopPixels import PixelBuffer
+
+CHANNELS = ("red", "green", "blue", "luma")
+STATS_CACHE_SIZE = 32
+INCREMENTAL_LIMIT = 0.25  # recount everything when more than this fraction of the rows changed
+_stats_cache: collections.OrderedDict = collections.OrderedDict()
+
+
+class ImageStats:
+    def __init__(self, width: int, height: int, histograms: dict[str, list[int]]) -> None:
+        """
+        :param histograms: For each of CHANNELS, how many pixels have each value from 0 to 255
+        """
+        self.width = width
+        self.height = height
+        self.histograms = histograms
+
+    @property
+    def pixel_count(self) -> int:
+        return self.width * self.height
+
+    def mean(self, channel: str = "luma") -> float:
+        return sum(value * count for value, count in enumerate(self.histograms[channel])) / self.pixel_count
+
+    def minimum(self, channel: str = "luma") -> int:
+        return next(value for value, count in enumerate(self.histograms[channel]) if count)
+
+    def maximum(self, channel: str = "luma") -> int:
+        return 255 - next(value for value, count in enumerate(reversed(self.histograms[channel])) if count)
+
+    def percentile(self, fraction: float, channel: str = "luma") -> int:
+        """
+        The smallest value that at least `fraction` of the pixels are at or below
+
+        :param fraction: Between 0 and 1, e.g. 0.5 for the median
+        :param channel: One of CHANNELS
+        :returns: The value
+        """
+        target = max(1, fraction * self.pixel_count)
+        seen = 0
+        for value, count in enumerate(self.histograms[channel]):
+            seen += count
+            if seen >= target:
+                return value
+        return 255
+
+    def median(self, channel: str = "luma") -> int:
+        return self.percentile(0.5, channel)
+
+    def copy(self) -> "ImageStats":
+        return ImageStats(self.width, self.height, {channel: histogram.copy() for channel, histogram in self.histograms.items()})
+
+
+def _histograms(pixels: PixelBuffer) -> dict[str, list[int]]:
+    img = pixels.to_image()
+    counts = img.histogram()
+    histograms = {channel: counts[256 * i : 256 * (i + 1)] for i, channel in enumerate(CHANNELS[:3])}
+    histograms["luma"] = img.convert("L").histogram()  # ITU-R 601-2: L = R * 299/1000 + G * 587/1000 + B * 114/1000
+    return histograms
+
+
+def compute_stats(pixels: PixelBuffer) -> ImageStats:
+    """Count the histograms of an image (without using the cache)"""
+    return ImageStats(pixels.width, pixels.height, _histograms(pixels))
+
+
+def _remember(key: str, stats: ImageStats) -> None:
+    _stats_cache[key] = stats
+    _stats_cache.move_to_end(key)
+    if len(_stats_cache) > STATS_CACHE_SIZE:
+        _stats_cache.popitem(last=False)
+
+
+def get_stats(image: typing.Any) -> ImageStats:
+    """
+    The statistics of an image, counted only if these exact contents haven't been seen recently
+
+    :param image: A Pillow image (GUI), an open BMP file (tests) or a PixelBuffer
+    :returns: The (shared, so don't change it) statistics
+    """
+    if isinstance(image, (PixelBuffer, Image.Image)):
+        pixels = PixelBuffer.open(image) if isinstance(image, Image.Image) else image
+    else:
+        position = image.tell()
+        pixels = PixelBuffer.from_bmp(image)
+        image.seek(position)
+    key = pixels.content_hash()
+    stats = _stats_cache.get(key)
+    if stats is None:
+        stats = compute_stats(pixels)
+    _remember(key, stats)
+    return stats
+
+
+def wants_stats(func: typing.Callable) -> bool:
+    """Whether a manipulation function has a stats parameter for the statistics of its image"""
+    return "stats" in inspect.signature(inspect.unwrap(func)).parameters
+
+
+def _changed_rows(before: PixelBuffer, after: PixelBuffer) -> typing.Optional[range]:
+    """The rows (from the top) between the first and last one that differ, or None if none do"""
+    if before.data == after.data:
+        return None
+
+    def differs(y: int) -> bool:
+        start = before.row_offset(y)
+        return before.data[start : start + before.row_size] != after.data[start : start + before.row_size]
+
+    first = next(y for y in range(before.height) if differs(y))
+    last = next(y for y in reversed(range(before.height)) if differs(y))
+    return range(first, last + 1)
+
+
+def _band(pixels: PixelBuffer, rows: range) -> PixelBuffer:
+    """Just some rows of an image (they are next to each other in the data, bottom-up)"""
+    return PixelBuffer(pixels.width, len(rows), pixels.data[pixels.row_offset(rows.stop - 1) : pixels.row_offset(rows.start) + pixels.row_size])
+
+
+def update_stats(stats: ImageStats, before: PixelBuffer, after: PixelBuffer) -> ImageStats:
+    """
+    The statistics of an image after an edit, recounting only the rows that changed (if there aren't too many)
+
+    :param stats: The statistics of before
+    :param before: The image before the edit
+    :param after: The image after the edit
+    :returns: The (shared, so don't change it) statistics of after
+    """
+    if (before.width, before.height) != (after.width, after.height):
+        return get_stats(after)
+    rows = _changed_rows(before, after)
+    if rows is None:
+        return stats
+    if len(rows) > INCREMENTAL_LIMIT * after.height:
+        return get_stats(after)
+    updated = stats.copy()
+    removed, added = _histograms(_band(before, rows)), _histograms(_band(after, rows))
+    for channel in CHANNELS:
+        updated.histograms[channel] = [count - old + new for count, old, new in zip(updated.histograms[channel], removed[channel], added[channel])]
+    _remember(after.content_hash(), updated)
+    return updated
@@ -0,0 +1,152 @@
+"""PythoShop Thumbnails
+
+Keeps small previews of the images shown in the file chooser in an
+on-disk cache so that re-opening a folder doesn't decode every photo again.
+"""
+
+import concurrent.futures
+import hashlib
+import os
+import threading
+import typing
+
+from PIL import Image
+
+THUMBNAIL_SIZE = (96, 96)
+DEFAULT_CACHE_FOLDER = os.path.join(os.path.expanduser("~"), ".pythoshop", "thumbnails")
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".bmp", ".tiff", ".webp")
+
+
+class ThumbnailCache:
+    """
+    Thumbnails are stored as small PNG files named after a hash of the source
+    path, modification time and size, so an edited file automatically gets a
+    new thumbnail and an unchanged one is never decoded twice.
+    """
+
+    def __init__(self, cache_folder: str = DEFAULT_CACHE_FOLDER, size: tuple[int, int] = THUMBNAIL_SIZE, max_workers: typing.Optional[int] = None) -> None:
+        self.cache_folder = cache_folder
+        self.size = size
+        self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=max_workers or min(4, os.cpu_count() or 1), thread_name_prefix="thumbnail")
+        self._lock = threading.Lock()
+        self._pending: dict[str, concurrent.futures.Future] = {}
+        self._known: dict[str, tuple[int, int, str]] = {}  # path -> (mtime, size, thumbnail path) as of the last scan
+
+    def _thumbnail_path(self, path: str, mtime: int, size: int) -> str:
+        key = f"{os.path.abspath(path)}|{mtime}|{size}|{self.size[0]}x{self.size[1]}"
+        return os.path.join(self.cache_folder, hashlib.sha1(key.encode("utf-8")).hexdigest() + ".png")
+
+    def _stat(self, path: str, stat: typing.Optional[os.stat_result] = None) -> typing.Optional[tuple[int, int, str]]:
+        """
+        Work out which thumbnail file belongs to the current version of a file
+
+        :param path: Path of the source image
+        :param stat: Result of a previous stat of `path` (e.g. from os.scandir) to avoid another system call
+        :returns: Tuple of (mtime, size, thumbnail path) or None if the file can't be read
+        """
+        try:
+            if stat is None:
+                stat = os.stat(path)
+        except OSError:
+            return None
+        known = self._known.get(path)
+        if known and known[0] == stat.st_mtime_ns and known[1] == stat.st_size:
+            return known
+        return (stat.st_mtime_ns, stat.st_size, self._thumbnail_path(path, stat.st_mtime_ns, stat.st_size))
+
+    def _generate(self, path: str, thumbnail: str) -> str:
+        os.makedirs(self.cache_folder, exist_ok=True)
+        with Image.open(path) as img:
+            img.draft("RGB", self.size)  # lets JPEG decode at a reduced scale which is much faster for big photos
+            img.thumbnail(self.size)
+            if img.mode not in ("RGB", "RGBA"):
+                img = img.convert("RGBA")
+            # write to a temporary name first so a half-written thumbnail is never picked up
+            temporary = thumbnail + "." + str(threading.get_ident()) + ".tmp"
+            img.save(temporary, format="png")
+        os.replace(temporary, thumbnail)
+        return thumbnail
+
+    def _submit(self, path: str, entry: tuple[int, int, str]) -> concurrent.futures.Future:
+        with self._lock:
+            future = self._pending.get(entry[2])
+            if future is None:
+                future = self._executor.submit(self._generate, path, entry[2])
+                self._pending[entry[2]] = future
+
+                def finished(done: concurrent.futures.Future) -> None:
+                    with self._lock:
+                        self._pending.pop(entry[2], None)
+                    if done.exception() is None:
+                        self._known[path] = entry
+
+                future.add_done_callback(finished)
+        return future
+
+    def lookup(self, path: str) -> typing.Optional[str]:
+        """
+        Get the cached thumbnail for a file without generating anything
+
+        :param path: Path of the source image
+        :returns: Path of the thumbnail or None if it hasn't been made yet
+        """
+        entry = self._stat(path)
+        if entry and (self._known.get(path) == entry or os.path.exists(entry[2])):
+            self._known[path] = entry
+            return entry[2]
+        return None
+
+    def request(self, path: str, callback: typing.Callable[[str, str], None]) -> typing.Optional[str]:
+        """
+        Get the thumbnail for a file, making it in the background if needed
+
+        :param path: Path of the source image
+        :param callback: Called as callback(path, thumbnail path) from a worker thread once a missing thumbnail is ready
+        :returns: Path of the thumbnail if it is already cached, otherwise None
+        """
+        thumbnail = self.lookup(path)
+        if thumbnail or os.path.splitext(path)[-1].lower() not in IMAGE_EXTENSIONS:
+            return thumbnail
+        entry = self._stat(path)
+        if entry is None:
+            return None
+
+        def notify(done: concurrent.futures.Future) -> None:
+            if done.exception() is None:
+                callback(path, done.result())
+
+        self._submit(path, entry).add_done_callback(notify)
+        return None
+
+    def scan(self, folder: str) -> int:
+        """
+        Queue thumbnails for the images in a folder that are new or have changed since the last scan
+
+        :param folder: Folder to look through (not recursively)
+        :returns: The number of thumbnails that were queued
+        """
+        queued = 0
+        try:
+            entries = list(os.scandir(folder))
+        except OSError:
+            return 0
+        for dir_entry in entries:
+            if os.path.splitext(dir_entry.name)[-1].lower() not in IMAGE_EXTENSIONS:
+                continue
+            try:
+                if not dir_entry.is_file():
+                    continue
+                entry = self._stat(dir_entry.path, dir_entry.stat())
+            except OSError:
+                continue
+            if entry is None or self._known.get(dir_entry.path) == entry:
+                continue
+            if os.path.exists(entry[2]):
+                self._known[dir_entry.path] = entry
+            else:
+                self._submit(dir_entry.path, entry)
+                queued += 1
+        return queued
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=False, cancel_futures=True)
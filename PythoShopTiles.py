@@ -0,0 +1,160 @@
+"""PythoShop Tiles
+
+Runs filters exported with @export_filter(tile_safe=True) on horizontal
+bands of an image in several processes at once. Each worker gets its band's
+pixels, turns them into a Pillow image, runs the filter on it and sends the
+pixels back (array filters get their band as a PixelBuffer rather than an
+image). Filters that aren't marked tile safe (e.g. make_static, whose random
+numbers have to come out in the same order every time) always run in one
+piece.
+
+The workers are started as `python -m PythoShopTiles` rather than with
+multiprocessing: they're used from inside the running Kivy app, where a
+spawned multiprocessing child would import PythoShop.py (and open a window)
+all over again and a forked one would start off holding the app's threads
+and OpenGL context. A worker only ever imports this module and the one the
+filter is in.
+"""
+
+import importlib.util
+import inspect
+import os
+import pickle
+import subprocess
+import sys
+import typing
+
+from PIL import Image
+
+from PythoShopPixels import PixelBuffer
+
+MIN_TILED_PIXELS = 1_000_000  # smaller images are done before the work could be handed out
+MIN_BAND_ROWS = 16
+_modules: dict[str, typing.Any] = {}  # manipulation modules already loaded in this (worker) process
+
+
+def _load_function(module_path: str, name: str) -> typing.Callable:
+    """Load a function the same way PythoShop loads ImageManip.py (so it doesn't have to be picklable)"""
+    module = _modules.get(module_path)
+    if module is None:
+        spec = importlib.util.spec_from_file_location("ImageManip", module_path)
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        _modules[module_path] = module
+    return getattr(module, name)
+
+
+def _run_band(module_path: str, name: str, width: int, data: bytes, kwargs: dict) -> bytes:
+    """Run a filter on a band of rows (stored bottom-up like a PixelBuffer's) and return the band's new pixels (in a worker process)"""
+    func = _load_function(module_path, name)
+    row_size = -(-3 * width // 4) * 4
+    height = len(data) // row_size
+    if getattr(func, "__array_filter__", False):
+        band = PixelBuffer(width, height, bytearray(data))
+        result = func(band, **kwargs)
+        if result is None:
+            result = band
+        if (result.width, result.height) != (band.width, band.height):
+            raise ValueError(name + "() changed the size of the image so it can't be tile_safe")
+        return bytes(result.data)
+    band = Image.frombytes("RGB", (width, height), data, "raw", "BGR", row_size, -1)
+    result = func(band, **kwargs)
+    if result is None:
+        result = band
+    if result.size != band.size:
+        raise ValueError(name + "() changed the size of the image so it can't be tile_safe")
+    return result.convert("RGB").tobytes("raw", "BGR", row_size, -1)
+
+
+def _serve(requests: typing.BinaryIO, replies: typing.BinaryIO) -> None:
+    """Run the bands sent down requests until it's closed, sending back (True, pixels) or (False, exception) for each"""
+    while True:
+        try:
+            request = pickle.load(requests)
+        except EOFError:
+            return
+        try:
+            reply = pickle.dumps((True, _run_band(*request)))
+        except Exception as e:
+            try:
+                reply = pickle.dumps((False, e))
+            except Exception:  # not every exception can be pickled
+                reply = pickle.dumps((False, RuntimeError(repr(e))))
+        replies.write(reply)
+        replies.flush()
+
+
+class TileRunner:
+    def __init__(self, max_workers: typing.Optional[int] = None) -> None:
+        """
+        :param max_workers: How many processes to split images between (one per core if None)
+        """
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self._workers: list[subprocess.Popen] = []
+
+    def should_tile(self, func: typing.Callable, img: typing.Union[Image.Image, PixelBuffer]) -> bool:
+        """Whether running func on img in bands is safe and worth it"""
+        return getattr(func, "__tile_safe__", False) and self.max_workers > 1 and img.width * img.height >= MIN_TILED_PIXELS
+
+    def _start(self) -> None:
+        folder = os.path.dirname(os.path.abspath(__file__))  # -m finds this module (and the ones it imports) there
+        self._workers = [
+            subprocess.Popen([sys.executable, "-m", "PythoShopTiles"], stdin=subprocess.PIPE, stdout=subprocess.PIPE, cwd=folder)
+            for _ in range(self.max_workers)
+        ]
+
+    def run(self, func: typing.Callable, img: typing.Union[Image.Image, PixelBuffer], **kwargs) -> None:
+        """
+        Run a tile safe filter on an image in bands (changing the image in place)
+
+        :param func: The exported filter
+        :param img: The image (or the pixels of one) to filter
+        :param kwargs: The rest of the filter's parameters (color, extra...)
+        :returns: None
+        """
+        if "other_image" in kwargs:
+            kwargs["other_image"] = None  # tile safe filters only look at their own pixels
+        module_path = inspect.getfile(getattr(func, "__wrapped__", func))
+        pixels = img if isinstance(img, PixelBuffer) else PixelBuffer.from_image(img)
+        if not self._workers:
+            self._start()
+        band_height = max(MIN_BAND_ROWS, -(-pixels.height // self.max_workers))  # so there's never more bands than workers
+        bands = []
+        try:
+            for worker, start in zip(self._workers, range(0, pixels.height, band_height)):
+                stop = min(pixels.height, start + band_height)
+                band = slice((pixels.height - stop) * pixels.row_size, (pixels.height - start) * pixels.row_size)  # rows are stored bottom-up
+                pickle.dump((module_path, func.__name__, pixels.width, bytes(pixels.data[band]), kwargs), worker.stdin)
+                worker.stdin.flush()
+                bands.append((worker, band))
+            replies = [pickle.load(worker.stdout) for worker, _ in bands]
+        except (OSError, EOFError, pickle.UnpicklingError):
+            self.shutdown()  # the next run starts new workers
+            raise RuntimeError(func.__name__ + "() stopped the process it was running in")
+        for (_, band), (succeeded, result) in zip(bands, replies):
+            if not succeeded:
+                raise result  # whatever went wrong in the worker
+            pixels.data[band] = result
+        if pixels is not img:
+            pixels.store(img)
+
+    def shutdown(self) -> None:
+        for worker in self._workers:
+            try:
+                worker.stdin.close()  # the worker stops when it runs out of bands
+            except OSError:
+                pass
+            try:
+                worker.wait(timeout=1)
+            except subprocess.TimeoutExpired:
+                worker.kill()
+                worker.wait()
+            worker.stdout.close()
+        self._workers = []
+
+
+if __name__ == "__main__":
+    # anything the filters print goes to the console rather than into the replies
+    _replies = os.fdopen(os.dup(sys.stdout.fileno()), "wb")
+    os.dup2(sys.stderr.fileno(), sys.stdout.fileno())
+    _serve(sys.stdin.buffer, _replies)
@@ -0,0 +1,85 @@
+"""PythoShop Timing
+
+Lightweight timing of the stages of each GUI operation (decode, running
+the manipulation function, encode, texture upload) kept in a rolling
+in-memory history that can be shown on screen or dumped as JSON.
+"""
+
+import collections
+import contextlib
+import json
+import time
+import typing
+
+HISTORY: collections.deque = collections.deque(maxlen=200)
+
+
+class OperationTiming:
+    def __init__(self, name: str, pixels: int = 0) -> None:
+        self.name = name
+        self.pixels = pixels  # how many pixels the operation worked on (for the megapixels/s rate)
+        self.started = time.time()
+        self.stages: dict[str, float] = {}  # stage name -> seconds, in the order the stages ran
+
+    @contextlib.contextmanager
+    def stage(self, name: str) -> typing.Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - start)
+
+    def add(self, name: str, seconds: float) -> None:
+        self.stages[name] = self.stages.get(name, 0.0) + seconds
+
+    def total(self) -> float:
+        return sum(self.stages.values())
+
+    def megapixels_per_second(self) -> float:
+        total = self.total()
+        if total <= 0:
+            return 0.0
+        return self.pixels / 1_000_000 / total
+
+    def as_dict(self) -> dict:
+        return {
+            "name": self.name,
+            "started": self.started,
+            "pixels": self.pixels,
+            "stages_ms": {name: seconds * 1000 for name, seconds in self.stages.items()},
+            "total_ms": self.total() * 1000,
+            "megapixels_per_second": self.megapixels_per_second(),
+        }
+
+    def summary(self) -> str:
+        """One line describing the operation, e.g. for the on-screen display"""
+        stages = " | ".join(name + " " + format(seconds * 1000, ".1f") + " ms" for name, seconds in self.stages.items())
+        return self.name + ": " + stages + " | total " + format(self.total() * 1000, ".1f") + " ms | " + format(self.megapixels_per_second(), ".2f") + " MP/s"
+
+
+def start_operation(name: str, pixels: int = 0) -> OperationTiming:
+    """
+    Start timing an operation and add it to the history
+
+    :param name: What is being done (e.g. the name of the filter)
+    :param pixels: How many pixels it works on
+    :returns: The timing to add stages to
+    """
+    operation = OperationTiming(name, pixels)
+    HISTORY.append(operation)
+    return operation
+
+
+def last_operation() -> typing.Optional[OperationTiming]:
+    return HISTORY[-1] if HISTORY else None
+
+
+def dump_json(file_name: str) -> None:
+    """
+    Write the whole history to a JSON file for offline analysis
+
+    :param file_name: Where to write it
+    :returns: None
+    """
+    with open(file_name, "w") as json_file:
+        json.dump([operation.as_dict() for operation in HISTORY], json_file, indent=2)
@@ -0,0 +1,166 @@
+"""PythoShop Transform
+
+Engine for filters that move pixels around without changing them:
+mirrors, flips, rotations and transposes. Rows are copied whole and
+reversed with 3-byte strided slices instead of one pixel at a time;
+rotations and transposes work through the image in square tiles so the
+rows being read stay small. Row padding is never touched.
+"""
+
+import typing
+
+from PIL import Image
+
+from PythoShopExports import export_filter
+from PythoShopPixels import PixelBuffer
+
+TILE_SIZE = 64
+
+
+def reverse_pixels(row: typing.Union[bytes, bytearray, memoryview]) -> bytearray:
+    """
+    Reverse the order of the pixels in a row (keeping each pixel's blue, green, red order)
+
+    :param row: The bytes of a row without padding
+    :returns: The reversed row
+    """
+    row = bytes(row)
+    reversed_row = bytearray(len(row))
+    reversed_row[0::3] = row[-3::-3]
+    reversed_row[1::3] = row[-2::-3]
+    reversed_row[2::3] = row[-1::-3]
+    return reversed_row
+
+
+def _open(image: typing.Any) -> PixelBuffer:
+    return image if isinstance(image, PixelBuffer) else PixelBuffer.open(image)
+
+
+def _finish(pixels: PixelBuffer, image: typing.Any) -> None:
+    if pixels is not image:
+        pixels.store(image)
+
+
+def _result(pixels: PixelBuffer, image: typing.Any) -> typing.Any:
+    """Give back a new image of the same kind as the one that was passed in"""
+    if isinstance(image, PixelBuffer):
+        return pixels
+    if isinstance(image, Image.Image):
+        return pixels.to_image()
+    return pixels.to_bmp()
+
+
+def mirror_horizontal(image: typing.Any, keep: str = "left") -> None:
+    """
+    Replace one half of each row with the mirror image of the other half (in place)
+
+    :param image: A Pillow image (GUI), an open BMP file (tests) or a PixelBuffer
+    :param keep: "left" to copy the left half onto the right, "right" for the opposite
+    :returns: None
+    """
+    pixels = _open(image)
+    half = 3 * (pixels.width // 2)
+    width_bytes = 3 * pixels.width
+    for y in range(pixels.height):
+        row = pixels.row(y)
+        if keep == "left":
+            row[width_bytes - half :] = reverse_pixels(row[:half])
+        else:
+            row[:half] = reverse_pixels(row[width_bytes - half :])
+    _finish(pixels, image)
+
+
+def mirror_vertical(image: typing.Any, keep: str = "top") -> None:
+    """
+    Replace one half of the rows with the mirror image of the other half (in place)
+
+    :param keep: "top" to copy the top half onto the bottom, "bottom" for the opposite
+    :returns: None
+    """
+    pixels = _open(image)
+    for y in range(pixels.height // 2):
+        source, destination = (y, pixels.height - 1 - y) if keep == "top" else (pixels.height - 1 - y, y)
+        start = pixels.row_offset(source)
+        pixels.data[pixels.row_offset(destination) : pixels.row_offset(destination) + pixels.row_size] = pixels.data[start : start + pixels.row_size]
+    _finish(pixels, image)
+
+
+def flip_horizontal(image: typing.Any) -> None:
+    """Flip an image left to right (in place)"""
+    pixels = _open(image)
+    for y in range(pixels.height):
+        row = pixels.row(y)
+        row[:] = reverse_pixels(row)
+    _finish(pixels, image)
+
+
+def flip_vertical(image: typing.Any) -> None:
+    """Flip an image upside down (in place)"""
+    pixels = _open(image)
+    row_size = pixels.row_size
+    rows = [pixels.data[start : start + row_size] for start in range(0, len(pixels.data), row_size)]
+    pixels.data[:] = b"".join(reversed(rows))
+    _finish(pixels, image)
+
+
+def rotate_180(image: typing.Any) -> None:
+    """Turn an image upside down and left to right (in place)"""
+    pixels = _open(image)
+    width_bytes = 3 * pixels.width
+    rows = [reverse_pixels(pixels.row(y)) for y in range(pixels.height)]
+    for y, row in enumerate(reversed(rows)):
+        pixels.row(y)[:width_bytes] = row
+    _finish(pixels, image)
+
+
+def _swap_axes(pixels: PixelBuffer, reverse_rows: bool, reverse_columns: bool) -> PixelBuffer:
+    """
+    Make a copy where column x of the source becomes row x of the result, one
+    TILE_SIZE x TILE_SIZE tile at a time. With reverse_rows the source rows are
+    taken bottom to top and with reverse_columns the source columns right to left.
+    """
+    result = PixelBuffer(pixels.height, pixels.width)
+    source_rows = [bytes(pixels.row(y)) for y in range(pixels.height)]
+    if reverse_rows:
+        source_rows.reverse()
+    for tile_x in range(0, pixels.width, TILE_SIZE):
+        tile_columns = range(tile_x, min(pixels.width, tile_x + TILE_SIZE))
+        for tile_y in range(0, pixels.height, TILE_SIZE):
+            # the part of each source row inside this tile
+            segments = [row[3 * tile_x : 3 * tile_columns.stop] for row in source_rows[tile_y : tile_y + TILE_SIZE]]
+            for column in tile_columns:
+                i = 3 * (column - tile_x)
+                out_y = pixels.width - 1 - column if reverse_columns else column
+                result.row(out_y)[3 * tile_y : 3 * (tile_y + len(segments))] = b"".join(segment[i : i + 3] for segment in segments)
+    return result
+
+
+def transpose(image: typing.Any) -> typing.Any:
+    """
+    Swap rows and columns (mirror across the top-left to bottom-right diagonal)
+
+    :returns: A new image of the same kind as image
+    """
+    return _result(_swap_axes(_open(image), False, False), image)
+
+
+def rotate_90(image: typing.Any, clockwise: bool = True) -> typing.Any:
+    """
+    Turn an image a quarter turn
+
+    :param clockwise: False to turn counterclockwise
+    :returns: A new image of the same kind as image
+    """
+    return _result(_swap_axes(_open(image), clockwise, not clockwise), image)
+
+
+@export_filter
+def flip_left_right(image: typing.Any, **kwargs) -> None:
+    """Flip the image so its left side is on the right"""
+    flip_horizontal(image)
+
+
+@export_filter
+def rotate_clockwise(image: typing.Any, **kwargs) -> typing.Any:
+    """Turn the image a quarter turn to the right"""
+    return rotate_90(image)
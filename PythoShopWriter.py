@@ -0,0 +1,131 @@
+"""PythoShop Writer
+
+Saves images on a background thread so that slow encoders (e.g. PNG at
+the highest compression level) don't freeze the editor.
+"""
+
+import concurrent.futures
+import os
+import tempfile
+import time
+import typing
+from io import BytesIO
+
+from PIL import Image
+
+# format name -> (file extension, smallest level, largest level, default level)
+# PNG levels are zlib compression levels, JPEG/WebP levels are quality
+SAVE_FORMATS = {
+    "bmp": (".bmp", 0, 0, 0),
+    "png": (".png", 0, 9, 6),
+    "jpeg": (".jpg", 1, 100, 90),
+    "webp": (".webp", 1, 100, 90),
+}
+
+
+def default_file_name(format: str) -> str:
+    """
+    Build the name of the file an image gets saved to when the user doesn't choose one
+
+    :param format: One of the keys in SAVE_FORMATS
+    :returns: A path on the user's desktop named after the current time
+    """
+    extension = SAVE_FORMATS[format][0]
+    return os.path.join(os.path.expanduser("~"), "Desktop", "PythoShop " + time.strftime("%Y-%m-%d at %H.%M.%S") + extension)
+
+
+def encode_image(image_bytes: bytes, format: str, level: typing.Optional[int] = None) -> bytes:
+    """
+    Convert an image (in any format Pillow can read) into the requested format
+
+    :param image_bytes: The encoded source image
+    :param format: One of the keys in SAVE_FORMATS
+    :param level: Compression level (PNG) or quality (JPEG/WebP), the format's default if None
+    :returns: The encoded image
+    """
+    extension, lowest, highest, default = SAVE_FORMATS[format]
+    if level is None:
+        level = default
+    level = max(lowest, min(highest, int(level)))
+    if format == "bmp" and image_bytes[:2] == b"\x42\x4D":
+        return image_bytes  # already a raw bitmap so there is nothing to do
+    encoded = BytesIO()
+    with Image.open(BytesIO(image_bytes)) as img:
+        if format in ("bmp", "jpeg") and img.mode != "RGB":
+            img = img.convert("RGB")
+        if format == "png":
+            img.save(encoded, format="png", compress_level=level)
+        elif format in ("jpeg", "webp"):
+            img.save(encoded, format=format, quality=level)
+        else:
+            img.save(encoded, format=format)
+    return encoded.getvalue()
+
+
+def write_atomically(data: bytes, file_name: str) -> None:
+    """
+    Write a file so that it either has all of the new contents or doesn't change at all
+
+    :param data: The bytes to write
+    :param file_name: Where to write them
+    :returns: None
+    """
+    folder = os.path.dirname(os.path.abspath(file_name))
+    descriptor, temporary = tempfile.mkstemp(dir=folder, prefix=".pythoshop-", suffix=".tmp")
+    try:
+        with os.fdopen(descriptor, "wb") as temporary_file:
+            temporary_file.write(data)
+            temporary_file.flush()
+            os.fsync(temporary_file.fileno())
+        os.replace(temporary, file_name)
+    except BaseException:
+        try:
+            os.remove(temporary)
+        except OSError:
+            pass
+        raise
+
+
+class ImageWriter:
+    """
+    Encodes and writes images one at a time on a background thread.
+    Saves happen in the order they were requested.
+    """
+
+    def __init__(self) -> None:
+        self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=1, thread_name_prefix="writer")
+
+    def _save(self, image_bytes: bytes, file_name: str, format: str, level: typing.Optional[int]) -> str:
+        write_atomically(encode_image(image_bytes, format, level), file_name)
+        return file_name
+
+    def save(
+        self,
+        image: BytesIO,
+        format: str = "png",
+        level: typing.Optional[int] = None,
+        file_name: typing.Optional[str] = None,
+        callback: typing.Optional[typing.Callable[[str, typing.Optional[BaseException]], None]] = None,
+    ) -> concurrent.futures.Future:
+        """
+        Queue an image to be saved
+
+        :param image: The encoded image (a snapshot is taken so it is safe to keep editing it)
+        :param format: One of the keys in SAVE_FORMATS
+        :param level: Compression level (PNG) or quality (JPEG/WebP)
+        :param file_name: Where to save it, a time-stamped file on the desktop if None
+        :param callback: Called as callback(file name, exception or None) from the writer thread when done
+        :returns: Future for the file name that was written
+        """
+        if format not in SAVE_FORMATS:
+            raise ValueError("Unsupported format " + format + ", should be one of: " + ", ".join(SAVE_FORMATS))
+        if file_name is None:
+            file_name = default_file_name(format)
+        future = self._executor.submit(self._save, image.getvalue(), file_name, format, level)
+        if callback:
+            future.add_done_callback(lambda done: callback(file_name, done.exception()))
+        return future
+
+    def shutdown(self) -> None:
+        # let pending saves finish so nothing the user asked to save is lost
+        self._executor.shutdown(wait=True)
@@ -1,13 +1,20 @@
+import argparse
+import functools
 import glob
 import importlib.util
 import io
 import os
-import subprocess
 import sys
+import time
 import unittest
 
+import gradeCache
+import gradeLog
 import students
 
+sys.path.insert(0, os.getcwd())  # this is run from the tests folder (see the globs below)
+import testRunner  # replaces input and subprocess.run so the manipulation functions can't call them
+
 test_files = glob.glob("test_0*.py")
 test_files += glob.glob("test_1*.py")
 test_files += glob.glob("test_2*.py")
@@ -18,24 +25,16 @@ test_files += glob.glob("test_6*.py")
 test_files.sort()
 
 
-def dummyInput(prompt=None):
-    raise RuntimeError("You should not be calling the input function within your manipulation functions (only in __main__)")
-
-
-def dummyRun(args, **kwargs):
-    raise RuntimeError("You should not be calling the subprocess.run function within your manipulation functions (only in __main__)")
-
-
-sys.modules["subprocess"].run = dummyRun
-sys.modules["builtins"].input = dummyInput
-
-
 class TestResult(unittest.TextTestResult):
-    def __init__(self, stream, descriptions, verbosity):
+    def __init__(self, stream, descriptions, verbosity, on_test=None):
         super().__init__(stream, descriptions, verbosity)
         self.separator1 = "\n" + self.separator1
         self.points_total = 0
         self.tests = []
+        # called with (module name, percentage, seconds, sub tests, sub failures, skipped) as each test finishes
+        self.on_test = on_test
+        self.test_started = None
+        self.timed_out = False
 
     def addPoints(self, test):
         # assert not hasattr(test, 'test_weight'), "Test " + str(test) + " doesn't have a weight"
@@ -47,8 +46,22 @@ class TestResult(unittest.TextTestResult):
     def startTest(self, test):
         self.addPoints(test)
         self.tests.append(test)
+        self.test_started = time.perf_counter()
         super().startTest(test)
 
+    def stopTest(self, test):
+        super().stopTest(test)
+        if self.on_test is not None:
+            num_sub_tests = len(test.image_sets)
+            num_sub_failures = len([x for x in self.failures if getattr(x[0], "test_case", x[0]) == test])
+            percentage = round(testRunner.sub_test_percentage(num_sub_tests, num_sub_failures), 1)
+            self.on_test(test.__module__, percentage, time.perf_counter() - self.test_started, num_sub_tests, num_sub_failures, False)
+
+    def addSubTest(self, test, subtest, err):
+        super().addSubTest(test, subtest, err)
+        if err is not None and testRunner.is_timeout(err[1]):
+            self.timed_out = True
+
     def addSkip(self, test, reason):
         super().addSkip(test, reason)
         # What a hack but I can't see any other way to get this
@@ -59,9 +72,22 @@ class TestResult(unittest.TextTestResult):
             if skipped_class_name in dir(skipped_module):
                 skipped_class = getattr(skipped_module, skipped_class_name)
                 self.points_total += skipped_class.test_weight
+                if self.on_test is not None:
+                    self.on_test(skipped_module_name, 0.0, 0.0, 0, 0, True)
 
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Grade every student's ImageManip.py")
+    parser.add_argument("--all", action="store_true", help="regrade every student even if nothing changed since the last run")
+    parser.add_argument("--resume", action="store_true", help="carry on with the last run (e.g. after a crash) instead of starting a new one")
+    args = parser.parse_args()
+    grade_cache = gradeCache.GradeCache()
+    tests_digest = grade_cache.tests_digest(".")
+    grade_log = gradeLog.GradeLog()
+    run = grade_log.last_run() if args.resume else None
+    finished = grade_log.finished_students(run) if run is not None else {}
+    grade_log.start_run([test_file[: test_file.find(".")] for test_file in test_files], run)
+
     print("\tTotal\t", end="")
     for test_file in test_files:
         test_package = test_file[: test_file.find(".")]
@@ -71,12 +97,31 @@ if __name__ == "__main__":
         orig_stdout = sys.stdout
         print("Testing: " + student_folder, file=sys.stderr)
         student = student_folder.split("/")[-1]
+        if student in finished:
+            print("  already graded in this run", file=sys.stderr)
+            print(student + "\t" + finished[student]["grade"], end="\t")
+            for percentage in finished[student]["percentages"]:
+                print(percentage, end="\t")
+            print("")
+            continue
+        student_started = time.perf_counter()
+        cache_key = grade_cache.key(student_folder + "/PythoShop", tests_digest)
+        cached = None if args.all else grade_cache.get(student, cache_key)
+        if cached is not None:
+            # nothing this student's grade depends on has changed since it was last worked out
+            print("  unchanged since the last run", file=sys.stderr)
+            print(student + "\t" + cached["grade"], end="\t")
+            for percentage in cached["percentages"]:
+                print(percentage, end="\t")
+            print("")
+            grade_log.add_student(student, cached["grade"], cached["percentages"], time.perf_counter() - student_started, cached=True)
+            continue
         sys.stdout = io.StringIO()
         os.environ["IMAGE_MANIP"] = student_folder + "/PythoShop"
         os.environ["PYTEST_TIMEOUT"] = "2"
         testSuite = unittest.defaultTestLoader.discover(".")
         testProgram = unittest.TextTestRunner(stream=sys.stdout, verbosity=2)
-        testProgram.resultclass = TestResult
+        testProgram.resultclass = functools.partial(TestResult, on_test=lambda *result: grade_log.add_test(student, *result))
         testResults = testProgram.run(testSuite)
         points_total = 0
         points_earned = 0
@@ -87,18 +132,13 @@ if __name__ == "__main__":
             num_sub_tests = len(test.image_sets)
             sub_failures = [x for x in testResults.failures if x[0].test_case == test]
             num_sub_failures = len(sub_failures)
-            num_sub_success = num_sub_tests - num_sub_failures
-            percentage = 0
             if num_sub_failures == 0:
                 tests_passed.append(test.__module__)
-                percentage = 1.0
-            elif num_sub_success > 0:
+            elif num_sub_failures < num_sub_tests:
                 tests_partial.append(test.__module__)
-                # Get ~80% if passed at least one
-                percentage = 0.75 + 0.25 * num_sub_success / num_sub_tests
             else:
                 tests_failed.append(test.__module__)
-                percentage = 0
+            percentage = testRunner.sub_test_percentage(num_sub_tests, num_sub_failures)
             points = percentage * test.test_weight
             points_earned += points
         points_total = int(1.15 * testResults.points_total)
@@ -118,6 +158,7 @@ if __name__ == "__main__":
             grade = 0
         grade_str = str(grade)
         sys.stdout = orig_stdout
+        percentages = []
         for test_file in test_files:
             test_package = test_file[: test_file.find(".")]
             test_module = __import__(test_package)
@@ -137,20 +178,16 @@ if __name__ == "__main__":
                 num_sub_tests = len(test.image_sets)
                 sub_failures = [x for x in testResults.failures if x[0].test_case == test]
                 num_sub_failures = len(sub_failures)
-                num_sub_success = num_sub_tests - num_sub_failures
-                percentage = 0.0
                 if num_sub_failures == 0:
                     tests_passed.append(test.__module__)
-                    percentage = 1.0
-                elif num_sub_success > 0:
+                elif num_sub_failures < num_sub_tests:
                     tests_partial.append(test.__module__)
-                    # Get ~80% if passed at least one
-                    percentage = 0.75 + 0.25 * num_sub_success / num_sub_tests
                 else:
                     tests_failed.append(test.__module__)
-                    percentage = 0.0
+                percentage = testRunner.sub_test_percentage(num_sub_tests, num_sub_failures)
             else:
                 percentage = 0.0
+            percentages.append(round(percentage, 1))
             print(round(percentage, 1), end="\t")
         #     test = test_file[:-3]
         #     if test in testResults.testsPassed:
@@ -162,3 +199,8 @@ if __name__ == "__main__":
         #     else:
         #         print(0.0, end="\t")
         print("")
+        grade_log.add_student(student, grade_str, percentages, time.perf_counter() - student_started)
+        if not testResults.errors and not testResults.timed_out:
+            # errors and timeouts (e.g. on a busy machine) might not happen next time so those grades aren't kept
+            grade_cache.put(student, cache_key, {"grade": grade_str, "percentages": percentages})
+        grade_cache.save()  # after every student so stopping part way through doesn't lose anything
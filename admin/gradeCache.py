@@ -0,0 +1,77 @@
+import glob
+import hashlib
+import json
+import os
+
+CACHE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "gradeCache.json")
+CACHE_VERSION = 1
+
+
+class GradeCache:
+    """
+    Grades from earlier runs of gradeAll.py, each stored against a hash of everything it depended on:
+    the student's code (ImageManip.py and anything next to it), the test modules, harness and PythoShop
+    modules, and the fixture pickles. A student whose hash hasn't changed doesn't need to be regraded.
+    """
+
+    def __init__(self, path=CACHE_FILE):
+        self.path = path
+        self.data = {"version": CACHE_VERSION, "files": {}, "grades": {}}
+        try:
+            with open(path, encoding="utf-8") as cache_file:
+                data = json.load(cache_file)
+            if data.get("version") == CACHE_VERSION:
+                self.data = data
+        except (OSError, ValueError):
+            pass  # nothing cached yet: everyone gets graded
+
+    def file_digest(self, path):
+        """Hash of a file's contents, only re-read when its size or modification time changes (the pickles are big)"""
+        path = os.path.abspath(path)
+        stat = os.stat(path)
+        known = self.data["files"].get(path)
+        if known and known[0] == stat.st_size and known[1] == stat.st_mtime_ns:
+            return known[2]
+        with open(path, "rb") as hashed_file:
+            digest = hashlib.sha1(hashed_file.read()).hexdigest()
+        self.data["files"][path] = [stat.st_size, stat.st_mtime_ns, digest]
+        return digest
+
+    def tests_digest(self, test_folder):
+        """
+        Hash of the tests: every module, harness file and pickle in the test folder and the
+        PythoShop modules above it that the harness and ImageManip.py import (e.g. PythoShopPixels.py)
+        """
+        hasher = hashlib.sha1()
+        paths = glob.glob(os.path.join(test_folder, "*.py")) + glob.glob(os.path.join(test_folder, "*.pickle"))
+        paths += glob.glob(os.path.join(test_folder, "..", "PythoShop*.py"))
+        for path in sorted(paths):
+            hasher.update((os.path.relpath(path, test_folder) + ":" + self.file_digest(path) + "\n").encode())
+        return hasher.hexdigest()
+
+    def key(self, manip_folder, tests_digest):
+        """
+        :param manip_folder: The student's folder with ImageManip.py in it
+        :param tests_digest: From tests_digest
+        :returns: The hash to store the student's grade against
+        """
+        hasher = hashlib.sha1(tests_digest.encode())
+        for path in sorted(glob.glob(os.path.join(manip_folder, "*.py"))):
+            with open(path, "rb") as student_file:  # always read: student files are small and their times can't be trusted after syncing
+                hasher.update((os.path.basename(path) + ":" + hashlib.sha1(student_file.read()).hexdigest() + "\n").encode())
+        return hasher.hexdigest()
+
+    def get(self, student, key):
+        grade = self.data["grades"].get(student)
+        if grade and grade["key"] == key:
+            return grade["result"]
+        return None
+
+    def put(self, student, key, result):
+        self.data["grades"][student] = {"key": key, "result": result}
+
+    def save(self):
+        temporary_path = self.path + ".tmp"
+        with open(temporary_path, "w", encoding="utf-8") as cache_file:
+            json.dump(self.data, cache_file)
+        os.replace(temporary_path, self.path)
@@ -0,0 +1,130 @@
+import csv
+import json
+import os
+import sys
+import time
+
+LOG_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "gradeResults.jsonl")
+CSV_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "gradeResults.csv")
+CSV_COLUMNS = ["run", "student", "test", "percentage", "seconds", "cached"]
+
+
+class GradeLog:
+    """
+    Every result gradeAll.py works out, appended to a JSON Lines file (and a CSV copy for spreadsheets)
+    the moment it's known: a "run" line when grading starts, a "test" line as each test module finishes
+    (with how long it took) and a "student" line once a student's grade is complete. Nothing is ever
+    rewritten, so stopping part way through loses at most the student being graded, and a run can be
+    resumed from the students it already finished.
+    """
+
+    def __init__(self, path=LOG_FILE, csv_path=CSV_FILE):
+        self.path = path
+        self.csv_path = csv_path
+        self.run = None
+
+    def records(self):
+        """Everything logged so far (skipping a last line cut short by a crash)"""
+        try:
+            with open(self.path, encoding="utf-8") as log_file:
+                for line in log_file:
+                    try:
+                        yield json.loads(line)
+                    except ValueError:
+                        pass
+        except FileNotFoundError:
+            return
+
+    def last_run(self):
+        """The id of the most recent run (or None)"""
+        run = None
+        for record in self.records():
+            if record["type"] == "run":
+                run = record["run"]
+        return run
+
+    def finished_students(self, run):
+        """{student: their "student" record} for everyone run finished grading"""
+        return {record["student"]: record for record in self.records() if record["type"] == "student" and record["run"] == run}
+
+    def start_run(self, tests, run=None):
+        """
+        :param tests: The names of the test modules the grades are made of
+        :param run: The id of a run to carry on with (a new one is started if None)
+        """
+        self._end_torn_line()
+        if run is not None:
+            self.run = run
+            return
+        self.run = time.strftime("%Y-%m-%dT%H:%M:%S")
+        self._append({"type": "run", "run": self.run, "tests": tests})
+
+    def add_test(self, student, test, percentage, seconds, sub_tests=0, sub_failures=0, skipped=False):
+        self._append(
+            {
+                "type": "test",
+                "run": self.run,
+                "student": student,
+                "test": test,
+                "percentage": percentage,
+                "seconds": round(seconds, 3),
+                "sub_tests": sub_tests,
+                "sub_failures": sub_failures,
+                "skipped": skipped,
+            }
+        )
+        self._append_csv([self.run, student, test, percentage, round(seconds, 3), False])
+
+    def add_student(self, student, grade, percentages, seconds, cached=False):
+        self._append(
+            {"type": "student", "run": self.run, "student": student, "grade": grade, "percentages": percentages, "seconds": round(seconds, 3), "cached": cached}
+        )
+        self._append_csv([self.run, student, "Total", grade, round(seconds, 3), cached])
+
+    def slowest(self, run, count=10):
+        """The count slowest tests in a run, slowest first"""
+        return sorted(self.test_records(run).values(), key=lambda record: -record["seconds"])[:count]
+
+    def test_records(self, run):
+        """
+        {(student, test): its "test" record} for a run. A resumed run grades the student it was in
+        the middle of again, so only the last record of each test counts.
+        """
+        return {(record["student"], record["test"]): record for record in self.records() if record["type"] == "test" and record["run"] == run}
+
+    def _end_torn_line(self):
+        """Finish off a last line cut short by a crash so the next record doesn't get stuck onto it"""
+        try:
+            with open(self.path, "rb+") as log_file:
+                if log_file.seek(0, os.SEEK_END) > 0:
+                    log_file.seek(-1, os.SEEK_END)
+                    if log_file.read(1) != b"\n":
+                        log_file.write(b"\n")
+        except FileNotFoundError:
+            pass
+
+    def _append(self, record):
+        with open(self.path, "a", encoding="utf-8") as log_file:
+            log_file.write(json.dumps(record) + "\n")
+            log_file.flush()
+            os.fsync(log_file.fileno())  # make sure it's really there if the next student crashes the machine
+
+    def _append_csv(self, row):
+        new_file = not os.path.exists(self.csv_path)
+        with open(self.csv_path, "a", newline="", encoding="utf-8") as csv_file:
+            writer = csv.writer(csv_file)
+            if new_file:
+                writer.writerow(CSV_COLUMNS)
+            writer.writerow(row)
+
+
+if __name__ == "__main__":
+    # python gradeLog.py [how many]: the slowest tests of the most recent run
+    log = GradeLog()
+    run = log.last_run()
+    if run is None:
+        print("Nothing has been graded yet")
+        sys.exit()
+    print("Slowest tests in the run started " + run)
+    for record in log.slowest(run, int(sys.argv[1]) if len(sys.argv) > 1 else 10):
+        print("{:8.2f}s  {}  {}".format(record["seconds"], record["student"], record["test"]))
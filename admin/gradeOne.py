@@ -105,6 +105,10 @@ if __name__ == "__main__":
             if not manip_function_name == "get_info" and not manip_function_name == "create_bmp":
                 print("* " + manip_function_name)
 
+    import perfLint  # from the tests folder (which discover put on the path)
+
+    perfLint.print_warnings(perfLint.lint_file(student_folder + "/PythoShop/ImageManip.py"))
+
     print("")
     print("Grade Summary")
     print("======================================================================")
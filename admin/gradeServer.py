@@ -0,0 +1,204 @@
+import argparse
+import concurrent.futures
+import contextlib
+import glob
+import http.server
+import io
+import json
+import os
+import select
+import signal
+import sys
+import tempfile
+import threading
+import time
+import unittest
+
+MAX_UPLOAD = 1_000_000  # bytes: an ImageManip.py is nowhere near this
+GRADE_TIMEOUT = 120  # seconds before giving up on a submission (each test also has its own timeout)
+POLL_INTERVAL = 0.5  # seconds between looking in the drop folder
+
+
+def _warm_worker(tests_folder):
+    """Get a worker process ready to grade: import the tests and load every fixture before the first submission arrives"""
+    global testRunner
+    os.chdir(tests_folder)
+    sys.path[:0] = [tests_folder, os.path.dirname(tests_folder)]  # the tests import tests.config and the PythoShop modules
+    import testBase
+    import testRunner  # replaces input and subprocess.run in this process
+
+    for pickle_file in glob.glob("*.pickle"):
+        testBase.load_pickle(pickle_file)
+    unittest.TestLoader().discover(".")
+
+
+def _ready():
+    return os.getpid()
+
+
+def _grade(source):
+    """Grade the code of an ImageManip.py (in a worker process) and return the Grade Breakdown as a dictionary"""
+    started = time.perf_counter()
+    with tempfile.TemporaryDirectory() as manip_folder:
+        with open(os.path.join(manip_folder, "ImageManip.py"), "w", encoding="utf-8") as manip_file:
+            manip_file.write(source)
+        os.environ["IMAGE_MANIP"] = manip_folder
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):  # the progress dots
+            tests = list(testRunner.iter_tests(unittest.TestLoader().discover(".")))
+            records = testRunner.run_tests(tests, output)
+    result = testRunner.breakdown(records)
+    result["output"] = output.getvalue()
+    result["seconds"] = round(time.perf_counter() - started, 3)
+    return result
+
+
+def _grade_in_fork(source, timeout):
+    """
+    Grade a submission (in a worker process) in a copy of the worker made just for it, so nothing the submission
+    does (e.g. changing testBase or PIL) is still there for the next student, and stop the copy if it takes more
+    than timeout seconds. Only the copy ever gets stuck or killed, so the worker is always ready for the next one.
+    """
+    read_end, write_end = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        # the copy: its own process group so anything the submission starts is stopped with it
+        status = 1
+        try:
+            os.setpgid(0, 0)
+            os.close(read_end)
+            with os.fdopen(write_end, "w", encoding="utf-8") as result_file:
+                json.dump(_grade(source), result_file)
+            status = 0
+        finally:
+            os._exit(status)  # never carry on with the worker's code (e.g. after the submission calls exit())
+    os.setpgid(pid, pid)  # as well as in the copy, so it's done before either of them relies on it
+    os.close(write_end)
+    chunks = []
+    deadline = time.monotonic() + timeout
+    try:
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or not select.select([read_end], [], [], remaining)[0]:
+                os.killpg(pid, signal.SIGKILL)
+                os.waitpid(pid, 0)
+                return {"error": "Grading took more than " + str(timeout) + " seconds"}
+            chunk = os.read(read_end, 1 << 16)
+            if not chunk:
+                break
+            chunks.append(chunk)
+    finally:
+        os.close(read_end)
+    os.waitpid(pid, 0)
+    try:
+        return json.loads(b"".join(chunks))
+    except ValueError:
+        return {"error": "ImageManip.py crashed the grader"}  # e.g. it called exit() or os._exit()
+
+
+class Grader:
+    """
+    A pool of worker processes that already have the tests and fixtures loaded. Each submission is graded
+    in a fork of a worker (so this needs Linux or macOS) that starts out warm and is thrown away afterwards.
+    """
+
+    def __init__(self, tests_folder, jobs, timeout=GRADE_TIMEOUT):
+        self.tests_folder = os.path.abspath(tests_folder)
+        self.jobs = jobs
+        self.timeout = timeout
+        self.lock = threading.Lock()
+        self.executor = None
+        self._start()
+
+    def _start(self):
+        self.executor = concurrent.futures.ProcessPoolExecutor(max_workers=self.jobs, initializer=_warm_worker, initargs=(self.tests_folder,))
+        # start (and warm up) every worker now rather than when the first students are waiting
+        for future in [self.executor.submit(_ready) for i in range(self.jobs)]:
+            future.result()
+
+    def grade(self, source):
+        for attempt in range(2):
+            with self.lock:
+                executor = self.executor
+            try:
+                return executor.submit(_grade_in_fork, source, self.timeout).result()
+            except concurrent.futures.process.BrokenProcessPool:
+                # a worker died (e.g. a submission killed the process it was forked from): start over with fresh
+                # ones and try once more, since it was probably another submission that did it
+                with self.lock:
+                    if self.executor is executor:
+                        executor.shutdown(wait=False, cancel_futures=True)
+                        self._start()
+        return {"error": "ImageManip.py crashed the grader"}
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+
+class GradeHandler(http.server.BaseHTTPRequestHandler):
+    grader = None
+
+    def do_POST(self):
+        """POST the contents of ImageManip.py to /grade, e.g. curl --data-binary @ImageManip.py http://localhost:8000/grade"""
+        if self.path.rstrip("/") != "/grade":
+            self.send_json(404, {"error": "POST ImageManip.py to /grade"})
+            return
+        length = int(self.headers.get("Content-Length", 0))
+        if length <= 0 or length > MAX_UPLOAD:
+            self.send_json(413 if length > MAX_UPLOAD else 400, {"error": "Send the contents of ImageManip.py (up to " + str(MAX_UPLOAD) + " bytes)"})
+            return
+        source = self.rfile.read(length).decode("utf-8", errors="replace")
+        result = self.grader.grade(source)
+        self.send_json(500 if "error" in result else 200, result)
+
+    def send_json(self, status, result):
+        body = json.dumps(result).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def watch_drop_folder(grader, drop_folder):
+    """Grade every .py file put in (or changed in) drop_folder, writing the result next to it as a .json file with the same name"""
+    graded = {}
+    while True:
+        for path in glob.glob(os.path.join(drop_folder, "*.py")):
+            try:
+                modified = os.stat(path).st_mtime_ns
+                if graded.get(path) == modified:
+                    continue
+                with open(path, encoding="utf-8", errors="replace") as manip_file:
+                    source = manip_file.read()
+            except OSError:
+                continue  # e.g. removed while we were looking
+            graded[path] = modified
+            print("Grading " + path)
+            result = grader.grade(source)
+            temporary_path = path[:-3] + ".json.tmp"
+            with open(temporary_path, "w", encoding="utf-8") as result_file:
+                json.dump(result, result_file, indent=2)
+            os.replace(temporary_path, path[:-3] + ".json")
+        time.sleep(POLL_INTERVAL)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Grade ImageManip.py files sent to this computer (only from this computer) using the tests")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--tests", default=".", help="the folder with the tests and their fixtures")
+    parser.add_argument("--jobs", "-j", type=int, default=0, help="how many submissions to grade at once (0 for one per core)")
+    parser.add_argument("--drop-folder", help="also grade the .py files put in this folder")
+    args = parser.parse_args()
+    grader = Grader(args.tests, args.jobs or os.cpu_count() or 1)
+    if args.drop_folder:
+        threading.Thread(target=watch_drop_folder, args=(grader, args.drop_folder), daemon=True).start()
+    GradeHandler.grader = grader
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", args.port), GradeHandler)
+    print("Grading at http://127.0.0.1:" + str(args.port) + "/grade (press Ctrl+C to stop)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    server.server_close()
+    grader.shutdown()
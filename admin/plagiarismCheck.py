@@ -1,12 +1,56 @@
-import students
-import glob
-import shutil
+import argparse
 import os
 
-files = []
-for student_folder in students.student_folders:
-    student_file = '"' + student_folder + '/PythoShop/ImageManip.py"'
-    files.append(student_file)
+import similarityIndex
+import students
+
+# everyone starts from this, so code that's still the same as it doesn't count as shared
+STARTER_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "ImageManipBlank.py")
+
+
+def line_ranges(lines):
+    """e.g. [3, 4, 5, 9] -> 3-5, 9"""
+    ranges = []
+    for line in lines:
+        if ranges and line == ranges[-1][1] + 1:
+            ranges[-1][1] = line
+        else:
+            ranges.append([line, line])
+    return ", ".join(str(first) if first == last else str(first) + "-" + str(last) for first, last in ranges)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Find students whose ImageManip.py is suspiciously similar to someone else's (this semester or an earlier one)"
+    )
+    parser.add_argument(
+        "--semester",
+        default="current",
+        help="what to file this semester's submissions under in the index (e.g. fall2024) so later semesters are compared to them",
+    )
+    parser.add_argument("--threshold", type=float, default=0.3, help="the fraction of the smaller submission that has to be shared to be reported")
+    args = parser.parse_args()
+    index = similarityIndex.SimilarityIndex()
+    ignore = set()
+    if os.path.exists(STARTER_FILE):
+        with open(STARTER_FILE, encoding="utf-8") as starter_file:
+            ignore = set(similarityIndex.winnow(similarityIndex.tokenize(starter_file.read())))
+
+    names = []
+    for student_folder in students.student_folders:
+        name = args.semester + "/" + student_folder.rstrip("/").split("/")[-1]
+        try:
+            with open(student_folder + "/PythoShop/ImageManip.py", encoding="utf-8", errors="replace") as manip_file:
+                source = manip_file.read()
+        except OSError:
+            print("Missing: " + student_folder + "/PythoShop/ImageManip.py")
+            continue
+        names.append(name)
+        if index.add(name, source, ignore):
+            index.save()  # after every student so an interrupted run doesn't have to start over
+    print("Compared " + str(len(names)) + " submissions against " + str(len(index.submissions)) + " in the index")
 
-# Have to have compare50 installed: pip install compare50
-os.system('compare50 ' + " ".join(files))
\ No newline at end of file
+    for fraction, name, other, lines, other_lines in index.similar_pairs(names, args.threshold):
+        print("{:4.0%}  {} <-> {}".format(fraction, name, other))
+        print("      " + name + " lines " + line_ranges(lines))
+        print("      " + other + " lines " + line_ranges(other_lines))
@@ -0,0 +1,167 @@
+import ast
+import collections
+import hashlib
+import json
+import os
+
+INDEX_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "similarityIndex.json")
+INDEX_VERSION = 1
+K = 12  # tokens per k-gram: shorter matches than this are never reported
+WINDOW = 8  # every run of WINDOW + K - 1 matching tokens is guaranteed to share a fingerprint
+# fingerprints in more than this share of all the submissions (every semester's) are idioms any solution has and are ignored;
+# the starter code is left out when submissions are added, so a solution shared around (even for years) stays well under it
+BOILERPLATE_SHARE = 0.5
+MIN_BOILERPLATE = 20  # so a small index doesn't ignore something only a handful of submissions share
+
+
+def tokenize(source):
+    """
+    Turn Python code into a stream of syntax tokens that ignores formatting, comments,
+    docstrings, names and literal values, so renaming variables doesn't hide copying
+
+    :param source: The code
+    :returns: A list of (token, line number) pairs
+    """
+    tokens = []
+
+    def visit(node, line):
+        if isinstance(node, ast.expr_context):
+            return
+        line = getattr(node, "lineno", line)  # operators etc. don't have a line of their own
+        if isinstance(node, ast.Constant):
+            tokens.append((type(node.value).__name__, line))  # just "int", "str"...
+        else:
+            tokens.append((type(node).__name__, line))  # e.g. "Name" without what it's called
+        body = getattr(node, "body", None)
+        docstring = None
+        if (
+            isinstance(body, list)
+            and body
+            and isinstance(body[0], ast.Expr)
+            and isinstance(body[0].value, ast.Constant)
+            and isinstance(body[0].value.value, str)
+        ):
+            docstring = body[0]
+        for child in ast.iter_child_nodes(node):
+            if child is not docstring:
+                visit(child, line)
+
+    visit(ast.parse(source), 1)
+    return tokens
+
+
+def _hash(tokens):
+    return int.from_bytes(hashlib.blake2b(" ".join(tokens).encode(), digest_size=8).digest(), "big")
+
+
+def winnow(tokens):
+    """
+    Pick the fingerprints of a token stream: hash every K tokens in a row and keep the smallest
+    hash in each window of WINDOW hashes (so there are far fewer fingerprints than tokens)
+
+    :param tokens: From tokenize
+    :returns: {fingerprint: line number where it starts}
+    """
+    names = [token for token, line in tokens]
+    hashes = [_hash(names[i : i + K]) for i in range(len(names) - K + 1)]
+    fingerprints = {}
+    last_chosen = -1
+    for start in range(max(1, len(hashes) - WINDOW + 1)):
+        window = hashes[start : start + WINDOW]
+        if not window:
+            break
+        # the rightmost smallest hash, so a hash that stays the smallest is only chosen once
+        smallest = min(range(len(window)), key=lambda i: (window[i], -i)) + start
+        if smallest != last_chosen:
+            fingerprints.setdefault(hashes[smallest], tokens[smallest][1])
+            last_chosen = smallest
+    return fingerprints
+
+
+class SimilarityIndex:
+    """
+    Winnowed fingerprints of every submission seen so far (this semester and past ones) plus an
+    inverted index from each fingerprint to the submissions that have it. Adding a submission only
+    touches its own fingerprints, and finding similar pairs only looks at submissions that share one.
+    """
+
+    def __init__(self, path=INDEX_FILE):
+        self.path = path
+        self.submissions = {}
+        self.postings = collections.defaultdict(set)
+        try:
+            with open(path, encoding="utf-8") as index_file:
+                data = json.load(index_file)
+            if data.get("version") == INDEX_VERSION:
+                self.submissions = data["submissions"]
+        except (OSError, ValueError):
+            pass  # start a new index
+        for name, submission in self.submissions.items():
+            for fingerprint in submission["fingerprints"]:
+                self.postings[int(fingerprint)].add(name)
+
+    def add(self, name, source, ignore=()):
+        """
+        Add (or update) a submission
+
+        :param name: e.g. "fall2024/student1"
+        :param source: The code of their ImageManip.py
+        :param ignore: Fingerprints to leave out (e.g. the starter code's)
+        :returns: Whether anything changed
+        """
+        digest = hashlib.sha1(source.encode()).hexdigest()
+        if name in self.submissions and self.submissions[name]["digest"] == digest:
+            return False
+        self.remove(name)
+        try:
+            fingerprints = winnow(tokenize(source))
+        except SyntaxError:
+            fingerprints = {}
+        fingerprints = {str(fingerprint): line for fingerprint, line in fingerprints.items() if fingerprint not in ignore}
+        self.submissions[name] = {"digest": digest, "fingerprints": fingerprints}
+        for fingerprint in fingerprints:
+            self.postings[int(fingerprint)].add(name)
+        return True
+
+    def remove(self, name):
+        submission = self.submissions.pop(name, None)
+        if submission:
+            for fingerprint in submission["fingerprints"]:
+                self.postings[int(fingerprint)].discard(name)
+
+    def similar_pairs(self, names=None, threshold=0.3):
+        """
+        Pairs of submissions that share a lot of fingerprints
+
+        :param names: Only pairs including one of these submissions (all submissions if None)
+        :param threshold: The smallest fraction of the smaller submission's fingerprints that must be shared
+        :returns: A list of (fraction shared, name, other name, lines in name, lines in other name) with the most similar first
+        """
+        names = set(self.submissions) if names is None else set(names) & set(self.submissions)
+        max_posting = max(MIN_BOILERPLATE, BOILERPLATE_SHARE * len(self.submissions))
+        shared = collections.Counter()
+        for fingerprint, posting in self.postings.items():
+            if len(posting) < 2 or len(posting) > max_posting or not posting & names:
+                continue
+            ordered = sorted(posting)
+            for i, name in enumerate(ordered):
+                for other in ordered[i + 1 :]:
+                    if name in names or other in names:
+                        shared[name, other] += 1
+        pairs = []
+        for (name, other), count in shared.items():
+            smaller = min(len(self.submissions[name]["fingerprints"]), len(self.submissions[other]["fingerprints"]))
+            fraction = count / smaller
+            if fraction >= threshold:
+                common = set(self.submissions[name]["fingerprints"]) & set(self.submissions[other]["fingerprints"])
+                lines = sorted({self.submissions[name]["fingerprints"][fingerprint] for fingerprint in common})
+                other_lines = sorted({self.submissions[other]["fingerprints"][fingerprint] for fingerprint in common})
+                pairs.append((fraction, name, other, lines, other_lines))
+        pairs.sort(key=lambda pair: -pair[0])
+        return pairs
+
+    def save(self):
+        temporary_path = self.path + ".tmp"
+        with open(temporary_path, "w", encoding="utf-8") as index_file:
+            json.dump({"version": INDEX_VERSION, "submissions": self.submissions}, index_file)
+        os.replace(temporary_path, self.path)
@@ -1,32 +1,103 @@
 import students
+import argparse
+import concurrent.futures
 import glob
+import hashlib
+import json
 import shutil
 import os
 from stat import S_IREAD, S_IRGRP, S_IROTH, S_IWRITE, S_IWGRP, S_IWOTH
 
+MANIFEST_FILE_NAME = ".pythoshopManifest.json"  # what was last copied into a folder, so unchanged files aren't copied (and re-uploaded) again
+MAX_WORKERS = 8  # students synced at once: more just makes the shared drive throttle us
+_digests = {}  # source file -> hash, since the same files go to every student
 
-def copy_readonly_files(files, destination_folder):
-        # print("Verifying folder exists...")
+
+def file_digest(file):
+    if file not in _digests:
+        with open(file, "rb") as source_file:
+            _digests[file] = hashlib.sha1(source_file.read()).hexdigest()
+    return _digests[file]
+
+
+def copy_readonly_files(files, destination_folder, dry_run=False):
+    """
+    Copy files into a folder (read only) unless the copy there is already up to date, and remove
+    the ones copied there before that aren't in files any more
+
+    :param files: The files to copy
+    :param destination_folder: Where to copy them
+    :param dry_run: Only work out what would be copied
+    :returns: The names of the files that were (or would be) copied or removed
+    """
+    manifest_path = os.path.join(destination_folder, MANIFEST_FILE_NAME)
+    try:
+        with open(manifest_path, encoding="utf-8") as manifest_file:
+            manifest = json.load(manifest_file)
+    except (OSError, ValueError):
+        manifest = {}  # a new folder (or one from before manifests): check everything
+    copied = []
+    for file in files:
+        name = os.path.basename(file)
+        destination_file = os.path.join(destination_folder, name)
+        digest = file_digest(file)
+        try:
+            stat = os.stat(destination_file)
+            # if the destination still has the size and time it had after we copied it, it's still what we copied
+            if manifest.get(name) == [digest, stat.st_size, stat.st_mtime_ns]:
+                continue
+        except FileNotFoundError:
+            pass
+        copied.append(name)
+        if dry_run:
+            continue
+        os.makedirs(destination_folder, exist_ok=True)
         try:
-            os.makedirs(destination_folder)
-        except FileExistsError:
+            os.chmod(destination_file, S_IWRITE | S_IWGRP | S_IWOTH)
+        except OSError:
             pass
-        # print("Copying to " + destination_folder)
-        for file in files:
-            # print("    Copying " + str(file))
-            destination_file = os.path.join(destination_folder, os.path.basename(file))
-            try:
-                os.chmod(destination_file, S_IWRITE|S_IWGRP|S_IWOTH)
-            except:
-                 pass
-            shutil.copy(file, destination_file)
-            os.chmod(destination_file, S_IREAD|S_IRGRP|S_IROTH)
+        shutil.copy(file, destination_file)
+        os.chmod(destination_file, S_IREAD | S_IRGRP | S_IROTH)
+        stat = os.stat(destination_file)
+        manifest[name] = [digest, stat.st_size, stat.st_mtime_ns]
+    names = {os.path.basename(file) for file in files}
+    for name in [name for name in manifest if name not in names]:
+        copied.append(name)
+        if dry_run:
+            continue
+        destination_file = os.path.join(destination_folder, name)
+        try:
+            os.chmod(destination_file, S_IWRITE | S_IWGRP | S_IWOTH)
+            os.remove(destination_file)
+        except FileNotFoundError:
+            pass
+        del manifest[name]
+    if copied and not dry_run:
+        temporary_path = manifest_path + ".tmp"
+        with open(temporary_path, "w", encoding="utf-8") as manifest_file:
+            json.dump(manifest, manifest_file)
+        os.replace(temporary_path, manifest_path)
+    return copied
+
 
+# these engines do assignments so they stay with the instructor: PythoShopBlend.py (blend_other and the fades),
+# PythoShopChroma.py (chroma_overlay), PythoShopResample.py (shrink and enlarge) and PythoShopTransform.py (the mirrors)
+# (PythoShop leaves out the built-in filters of engines that aren't there)
 files = [
      '__init__.py',
      'PythoShop.kv',
      'PythoShop.py',
+     'PythoShopDecoders.py',
      'PythoShopExports.py',
+     'PythoShopFill.py',
+     'PythoShopNeighborhood.py',
+     'PythoShopPixels.py',
+     'PythoShopRaster.py',
+     'PythoShopStats.py',
+     'PythoShopThumbnails.py',
+     'PythoShopTiles.py',
+     'PythoShopTiming.py',
+     'PythoShopWriter.py',
 ]
 
 examples_images = glob.glob("images/*")
@@ -42,6 +113,10 @@ test_files += glob.glob("tests/testOrig*")
 test_files += glob.glob("tests/testRun*")
 test_files += glob.glob("tests/testTool*")
 test_files += glob.glob("tests/config.py")
+test_files += glob.glob("tests/countingFile.py")
+test_files += glob.glob("tests/verdictCache.py")
+test_files += glob.glob("tests/perfLint.py")
+test_files += glob.glob("tests/lineProfiler.py")
 # Initially only release the first tests and then add others as you get to them
 test_files += glob.glob("tests/test_0*")
 # test_files += glob.glob("tests/test_1*")
@@ -51,15 +126,37 @@ test_files += glob.glob("tests/test_0*")
 # test_files += glob.glob("tests/test_5*")
 # test_files += glob.glob("tests/test_6*")
 
-for student_folder in students.student_folders:
+
+def update_student(student_folder, dry_run=False):
+    """Bring one student's copy of the framework, tests and images up to date and return what changed"""
     student_folder = os.path.join(student_folder, "PythoShop")
     student_vscode_folder = os.path.join(student_folder, ".vscode")
     student_test_folder = os.path.join(student_folder, "tests")
     student_images_folder = os.path.join(student_folder, "images")
-    copy_readonly_files(files, student_folder)
-    copy_readonly_files(vscode_files, student_vscode_folder)
-    copy_readonly_files(test_files, student_test_folder)
-    copy_readonly_files(examples_images, student_images_folder)
+    changed = []
+    changed += copy_readonly_files(files, student_folder, dry_run)
+    changed += [os.path.join(".vscode", name) for name in copy_readonly_files(vscode_files, student_vscode_folder, dry_run)]
+    changed += [os.path.join("tests", name) for name in copy_readonly_files(test_files, student_test_folder, dry_run)]
+    changed += [os.path.join("images", name) for name in copy_readonly_files(examples_images, student_images_folder, dry_run)]
     image_manip = os.path.join(student_folder, "ImageManip.py")
     if not os.path.exists(image_manip):
-        shutil.copy('ImageManipBlank.py', image_manip)
+        changed.append("ImageManip.py")
+        if not dry_run:
+            shutil.copy("ImageManipBlank.py", image_manip)
+    return changed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Copy the framework, tests and example images to every student's folder")
+    parser.add_argument("--dry-run", action="store_true", help="only list the files that would be copied")
+    parser.add_argument("--jobs", "-j", type=int, default=MAX_WORKERS, help="how many students to update at once")
+    args = parser.parse_args()
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max(1, args.jobs)) as executor:
+        updates = executor.map(lambda student_folder: update_student(student_folder, args.dry_run), students.student_folders)
+        for student_folder, changed in zip(students.student_folders, updates):
+            if not changed:
+                print(student_folder + ": up to date")
+                continue
+            print(student_folder + ": " + str(len(changed)) + " file(s) " + ("would be updated" if args.dry_run else "updated"))
+            for name in changed:
+                print("    " + name)
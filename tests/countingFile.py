@@ -0,0 +1,102 @@
+import collections
+import time
+
+
+class IOStats:
+    """
+    Tallies of the file operations a manipulation function made:
+    number of calls, bytes moved and time spent for each kind of call
+    """
+
+    def __init__(self):
+        self.calls = collections.Counter()
+        self.bytes = collections.Counter()
+        self.seconds = collections.defaultdict(float)
+
+    def record(self, call, num_bytes, seconds):
+        self.calls[call] += 1
+        self.bytes[call] += num_bytes
+        self.seconds[call] += seconds
+
+    def total_calls(self):
+        return sum(self.calls.values())
+
+    def total_seconds(self):
+        return sum(self.seconds.values())
+
+    def summary(self, width=None, height=None):
+        """e.g. "1,228,800 seeks, 1,228,800 reads (3,686,400 bytes) ... for a 640x640 image" """
+        parts = []
+        for call in ("seek", "read", "write", "tell"):
+            if self.calls[call] == 0:
+                continue
+            part = format(self.calls[call], ",") + " " + call + "s"
+            if call in ("read", "write"):
+                part += " (" + format(self.bytes[call], ",") + " bytes)"
+            parts.append(part)
+        if not parts:
+            parts.append("no file operations")
+        summary = ", ".join(parts) + " taking " + format(self.total_seconds(), ".2f") + "s"
+        if width and height:
+            summary += " for a " + str(width) + "×" + str(height) + " image (" + format(self.total_calls() / (width * height), ".1f") + " calls per pixel)"
+        return summary
+
+
+class CountingFile:
+    """
+    Stands in for the file given to a manipulation function and counts
+    every seek/read/write/tell it makes (everything else is passed through)
+    """
+
+    def __init__(self, file, stats=None):
+        self.raw = file
+        self.stats = stats if stats is not None else IOStats()
+
+    def seek(self, *args):
+        start = time.perf_counter()
+        position = self.raw.seek(*args)
+        self.stats.record("seek", 0, time.perf_counter() - start)
+        return position
+
+    def tell(self):
+        start = time.perf_counter()
+        position = self.raw.tell()
+        self.stats.record("tell", 0, time.perf_counter() - start)
+        return position
+
+    def read(self, *args):
+        start = time.perf_counter()
+        data = self.raw.read(*args)
+        self.stats.record("read", len(data), time.perf_counter() - start)
+        return data
+
+    def readinto(self, buffer):
+        start = time.perf_counter()
+        num_bytes = self.raw.readinto(buffer)
+        self.stats.record("read", num_bytes or 0, time.perf_counter() - start)
+        return num_bytes
+
+    def write(self, data):
+        start = time.perf_counter()
+        num_bytes = self.raw.write(data)
+        self.stats.record("write", num_bytes or 0, time.perf_counter() - start)
+        return num_bytes
+
+    def __getattr__(self, name):
+        return getattr(self.raw, name)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        return self.raw.__exit__(exc_type, exc_val, exc_tb)
+
+    def __iter__(self):
+        return iter(self.raw)
+
+
+def unwrap(file):
+    """The real file behind a CountingFile (or the file itself if it isn't one)"""
+    if isinstance(file, CountingFile):
+        return file.raw
+    return file
@@ -0,0 +1,132 @@
+import ast
+import base64
+import collections
+import html
+import io
+import os
+import sys
+import time
+
+from PIL import Image
+
+HOT_LINE = 0.1  # lines taking more than this fraction of the time are highlighted
+
+
+class LineProfiler:
+    """
+    Counts how many times each line of one file (ImageManip.py) runs and how long it takes,
+    using sys.settrace. A line's time includes the functions it calls (so the loop around
+    the slow part is slow too) and the profiler's own overhead, which makes everything
+    several times slower than normal: compare lines with each other, not with untraced runs.
+    """
+
+    def __init__(self, path):
+        self.path = os.path.abspath(path)
+        self.hits = collections.Counter()  # line number -> times run
+        self.seconds = collections.defaultdict(float)  # line number -> time spent on it
+        self.total_seconds = 0
+        self._traced_files = {}  # code file name -> whether it's the file being profiled
+        self._frames = {}  # frame -> (line it's on, when it got there)
+
+    def _trace_calls(self, frame, event, arg):
+        file_name = frame.f_code.co_filename
+        if file_name not in self._traced_files:
+            self._traced_files[file_name] = os.path.abspath(file_name) == self.path
+        return self._trace_lines if self._traced_files[file_name] else None
+
+    def _trace_lines(self, frame, event, arg):
+        now = time.perf_counter()
+        line, since = self._frames.get(frame, (None, now))
+        if line is not None:
+            self.seconds[line] += now - since
+        if event == "return":
+            self._frames.pop(frame, None)
+        else:
+            if event == "line":
+                line = frame.f_lineno
+                self.hits[line] += 1
+            self._frames[frame] = (line, time.perf_counter())  # not counting the time spent in here
+        return self._trace_lines
+
+    def run(self, func, *args, **kwargs):
+        """Call func(*args, **kwargs) while profiling"""
+        started = time.perf_counter()
+        sys.settrace(self._trace_calls)
+        try:
+            return func(*args, **kwargs)
+        finally:
+            sys.settrace(None)
+            self.total_seconds += time.perf_counter() - started
+
+
+def _image_html(caption, bmp):
+    try:
+        png = io.BytesIO()
+        Image.open(io.BytesIO(bmp)).save(png, "PNG")
+        image = '<img src="data:image/png;base64,' + base64.b64encode(png.getvalue()).decode() + '">'
+    except Exception as e:
+        image = "<p>Can't be shown: " + html.escape(str(e)) + "</p>"
+    return "<figure>" + image + "<figcaption>" + html.escape(caption) + "</figcaption></figure>"
+
+
+def write_report(profiler, source, report_path, title, images, status):
+    """
+    Write a self-contained HTML page with the source of every function that ran, each line
+    with how many times it ran and how much of the time it took, next to the images
+
+    :param profiler: The LineProfiler the function ran under
+    :param source: The code of the file that was profiled
+    :param report_path: Where to write the page
+    :param title: e.g. "negate() on even"
+    :param images: A list of (caption, BMP file contents) to show
+    :param status: What the test said (e.g. "Passed")
+    """
+    lines = source.splitlines()
+    total = profiler.total_seconds or 1  # not the sum of the lines: a line calling a function includes the time of the lines in it
+    sections = []
+    for node in ast.parse(source).body:
+        if not isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+            continue
+        first = min([node.lineno] + [decorator.lineno for decorator in node.decorator_list])
+        if not any(profiler.hits[line] for line in range(first, node.end_lineno + 1)):
+            continue  # never ran
+        rows = []
+        for line in range(first, node.end_lineno + 1):
+            fraction = profiler.seconds.get(line, 0) / total
+            rows.append(
+                '<tr class="{}"><td>{}</td><td>{}</td><td>{}</td><td><div class="bar" style="width: {:.0f}px"></div>{}</td><td><pre>{}</pre></td></tr>'.format(
+                    "hot" if fraction > HOT_LINE else "",
+                    line,
+                    format(profiler.hits[line], ",") if profiler.hits[line] else "",
+                    format(profiler.seconds[line] * 1000, ",.2f") if line in profiler.seconds else "",
+                    fraction * 100,
+                    format(fraction, ".0%") if line in profiler.seconds else "",
+                    html.escape(lines[line - 1]),
+                )
+            )
+        sections.append(
+            "<table><tr><th>Line</th><th>Hits</th><th>Time (ms)</th><th>Share</th><th>" + html.escape(node.name) + "</th></tr>" + "".join(rows) + "</table>"
+        )
+    page = """<!DOCTYPE html>
+<html><head><meta charset="utf-8"><title>{title}</title><style>
+body {{ font-family: sans-serif; display: flex; gap: 2em; align-items: flex-start; }}
+table {{ border-collapse: collapse; margin-bottom: 2em; }}
+td, th {{ padding: 0 0.5em; text-align: right; white-space: nowrap; }}
+td:last-child, th:last-child {{ text-align: left; }}
+pre {{ margin: 0; }}
+tr.hot {{ background: #fdd; }}
+.bar {{ display: inline-block; height: 0.8em; background: #c33; margin-right: 0.3em; }}
+img {{ image-rendering: pixelated; min-width: 200px; border: 1px solid #ccc; }}
+</style></head><body>
+<div><h1>{title}</h1><p>{status}</p><p>{seconds:.2f}s with the profiler running (which makes it several times slower than normal)</p>{sections}</div>
+<div>{images}</div>
+</body></html>
+""".format(
+        title=html.escape(title),
+        status=html.escape(status),
+        seconds=profiler.total_seconds,
+        sections="".join(sections),
+        images="".join(_image_html(caption, bmp) for caption, bmp in images),
+    )
+    with open(report_path, "w", encoding="utf-8") as report_file:
+        report_file.write(page)
@@ -0,0 +1,226 @@
+import ast
+import collections
+
+import verdictCache
+
+IO_CALLS = ("seek", "read", "write", "tell")
+HEADER_SIZE = 54  # seeking before this is reading the header
+MAX_SMALL_RANGE = 16  # loops over a range of up to this many (e.g. the 3 colors) don't count as going over the image
+
+
+def _is_exported(node):
+    """Whether a function has an @export_filter/@export_tool/... decorator"""
+    for decorator in node.decorator_list:
+        if isinstance(decorator, ast.Call):
+            decorator = decorator.func
+        name = decorator.id if isinstance(decorator, ast.Name) else getattr(decorator, "attr", "")
+        if name.startswith("export_"):
+            return True
+    return False
+
+
+def _loop_kind(iterator):
+    """
+    How a loop over iterator adds to how many pixels deep we are
+
+    :returns: (how many levels deeper, how many times it repeats what's in it if that's a small constant)
+    """
+    if isinstance(iterator, ast.Call) and isinstance(iterator.func, ast.Name) and iterator.func.id == "range":
+        if all(isinstance(arg, (ast.Constant, ast.UnaryOp)) for arg in iterator.args):
+            try:
+                size = len(range(*(ast.literal_eval(arg) for arg in iterator.args)))
+            except (ValueError, TypeError):
+                size = None
+            if size is not None and size <= MAX_SMALL_RANGE:
+                return 0, max(size, 1)
+        if any(isinstance(node, ast.BinOp) and isinstance(node.op, ast.Mult) for arg in iterator.args for node in ast.walk(arg)):
+            return 2, 1  # e.g. range(width * height) goes over every pixel in one loop
+    return 1, 1
+
+
+class FunctionReport:
+    """What was found in one function: the file operations it makes for each pixel and what to do about them"""
+
+    def __init__(self, name):
+        self.name = name
+        self.per_pixel = collections.Counter()  # file operations made for every pixel
+        self.straight = collections.Counter()  # file operations made once (outside all loops)
+        self.max_depth = 0  # 2 or more means it goes over every pixel
+        self.io_line = None  # where the first file operation made for every pixel is
+        self.warnings = []  # (line number, message)
+
+    def calls_per_pixel(self):
+        return sum(self.per_pixel.values())
+
+    def warn(self, line, message):
+        if (line, message) not in self.warnings:
+            self.warnings.append((line, message))
+
+
+class _Analyzer(ast.NodeVisitor):
+    def __init__(self, report, helpers, reports):
+        self.report = report
+        self.helpers = helpers
+        self.reports = reports
+        self.depth = 0  # how many pixels deep (1 is every row, 2 is every pixel)
+        self.repeat = 1  # how many times small constant loops repeat the current statement
+        self.scan_names = set()  # names the loops over the image use (e.g. height, width)
+
+    def _loop(self, node, iterator, visit_body):
+        added, repeat = _loop_kind(iterator)
+        names = {name.id for name in ast.walk(iterator) if isinstance(name, ast.Name)}
+        if added and self.depth >= 2 and names & self.scan_names:
+            self.report.warn(
+                node.lineno,
+                "loops over the whole image again inside the pixel loop (so it takes width × height times longer): work out what you need in a separate pass first",
+            )
+        self.visit(iterator)
+        old = self.depth, self.repeat, self.scan_names
+        self.depth += added
+        self.repeat *= repeat
+        if added and self.depth <= 2:
+            self.scan_names = self.scan_names | names
+        self.report.max_depth = max(self.report.max_depth, self.depth)
+        visit_body()
+        self.depth, self.repeat, self.scan_names = old
+
+    def _visit_all(self, nodes):
+        for child in nodes:
+            self.visit(child)
+
+    def visit_For(self, node):
+        self._loop(node, node.iter, lambda: self._visit_all(node.body))
+        for child in node.orelse:
+            self.visit(child)
+
+    visit_AsyncFor = visit_For
+
+    def visit_While(self, node):
+        self._loop(node, node.test, lambda: self._visit_all(node.body))
+        for child in node.orelse:
+            self.visit(child)
+
+    def _comprehension(self, node):
+        # each "for" in a comprehension is another loop around the element
+        def visit_generators(generators):
+            if not generators:
+                for element in ("elt", "key", "value"):
+                    if hasattr(node, element):
+                        self.visit(getattr(node, element))
+                return
+            self._loop(node, generators[0].iter, lambda: (self._visit_all(generators[0].ifs), visit_generators(generators[1:])))
+
+        visit_generators(node.generators)
+
+    visit_ListComp = visit_SetComp = visit_DictComp = visit_GeneratorExp = _comprehension
+
+    def visit_FunctionDef(self, node):
+        pass  # nested functions are looked at if they're called
+
+    visit_AsyncFunctionDef = visit_Lambda = visit_FunctionDef
+
+    def visit_Call(self, node):
+        self.generic_visit(node)
+        if isinstance(node.func, ast.Attribute) and node.func.attr in IO_CALLS:
+            if self.depth == 0:
+                self.report.straight[node.func.attr] += self.repeat
+            elif self.depth >= 2:
+                self.report.per_pixel[node.func.attr] += self.repeat
+                self.report.io_line = self.report.io_line or node.lineno
+                if node.func.attr == "seek" and node.args and isinstance(node.args[0], ast.Constant) and isinstance(node.args[0].value, int):
+                    if node.args[0].value < HEADER_SIZE:
+                        self.report.warn(node.lineno, "reads the header for every pixel: read it once before the loops")
+        elif isinstance(node.func, ast.Name) and node.func.id in self.helpers:
+            helper = analyze(self.helpers[node.func.id], self.helpers, self.reports)
+            if self.depth == 0:
+                # the helper does the work for this function, so its problems are this function's problems
+                self.report.straight.update(helper.straight)
+                self.report.per_pixel.update(helper.per_pixel)
+                self.report.max_depth = max(self.report.max_depth, helper.max_depth)
+                self.report.io_line = self.report.io_line or helper.io_line
+                for line, message in helper.warnings:
+                    self.report.warn(line, message + " (in " + helper.name + "())")
+            elif helper.max_depth >= 2:
+                self.report.warn(
+                    node.lineno,
+                    "calls " + helper.name + "(), which goes over every pixel, inside a loop: call it once before the loop and keep what it returns",
+                )
+            elif self.depth >= 2 and helper.straight:
+                self.report.per_pixel.update({call: count * self.repeat for call, count in helper.straight.items()})
+                self.report.warn(
+                    node.lineno,
+                    "calls "
+                    + helper.name
+                    + "() ("
+                    + str(sum(helper.straight.values()))
+                    + " file operations) for every pixel: call it once before the loops and keep what it returns",
+                )
+
+
+def analyze(node, helpers, reports=None):
+    """
+    Look for slow patterns in a function
+
+    :param node: The function's ast.FunctionDef
+    :param helpers: {name: ast.FunctionDef} of the functions it might call
+    :param reports: Reports already worked out (so helpers are only analyzed once)
+    :returns: A FunctionReport
+    """
+    reports = {} if reports is None else reports
+    if node.name in reports:
+        return reports[node.name]
+    report = FunctionReport(node.name)
+    reports[node.name] = report  # in case it (indirectly) calls itself
+    analyzer = _Analyzer(report, helpers, reports)
+    for statement in node.body:
+        analyzer.visit(statement)
+    if report.max_depth >= 2 and report.calls_per_pixel() >= 1:
+        advice = "read each row with one read(row_size), change it in a bytearray and write it back with one write()"
+        if report.per_pixel["seek"]:
+            advice = "seeks before every pixel: " + advice
+        if not any(message.startswith(advice) for line, message in report.warnings):  # a helper it calls may have said so already
+            report.warn(report.io_line or node.lineno, advice)
+    return report
+
+
+def lint_source(source):
+    """
+    Estimate the file operations each exported function makes for every pixel and find the
+    patterns that make that number high (e.g. reading the header in the pixel loop)
+
+    :param source: The code of the module (e.g. ImageManip.py)
+    :returns: {function name: FunctionReport} for the exported functions
+    """
+    tree = ast.parse(source)
+    helpers = {node.name: node for node in tree.body if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef))}
+    reports = {}
+    return {name: analyze(node, helpers, reports) for name, node in helpers.items() if _is_exported(node)}
+
+
+def lint_file(path=None):
+    """lint_source of a file (the ImageManip.py being tested if path is None), or None if it can't be read or parsed"""
+    try:
+        with open(path or verdictCache.manip_path(), encoding="utf-8") as manip_file:
+            return lint_source(manip_file.read())
+    except (OSError, SyntaxError, ValueError):
+        return None
+
+
+def print_warnings(reports):
+    """Print the warnings from lint_source (nothing if there aren't any)"""
+    if not reports or not any(report.warnings for report in reports.values()):
+        return
+    print("")
+    print("Performance Warnings")
+    print("======================================================================")
+    for name, report in reports.items():
+        if not report.warnings:
+            continue
+        per_pixel = report.calls_per_pixel()
+        if report.max_depth >= 2 and per_pixel:
+            counts = ", ".join(str(count) + " " + call + ("s" if count != 1 else "") for call, count in report.per_pixel.most_common())
+            print(name + "() makes about " + str(per_pixel) + " file operations per pixel (" + counts + ")")
+        else:
+            print(name + "()")
+        for line, message in sorted(report.warnings):
+            print("    line " + str(line) + ": " + message)
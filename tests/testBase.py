@@ -9,8 +9,20 @@ import signal
 import tempfile
 import unittest
 
+import countingFile
+import PythoShopStats
 import tests.config as config
 
+_pickles = {}  # file name -> (modification time, contents) so fixtures are only unpickled once per process (e.g. testRunner.py --watch)
+
+
+def load_pickle(file_name):
+    modified = os.stat(file_name).st_mtime_ns
+    if file_name not in _pickles or _pickles[file_name][0] != modified:
+        with open(file_name, "rb") as pickled:
+            _pickles[file_name] = (modified, pickle.load(pickled))
+    return _pickles[file_name][1]
+
 
 class TestTimeoutException(Exception):
     pass
@@ -47,12 +59,41 @@ class TestBase:
     manip_module = None
     num_image_parameters = 1
     tolerance = 1  # may want to change this depending on how strict you want to be with rounding
+    time_limit = 10  # seconds for all the image sets
+    profiler = None  # a lineProfiler.LineProfiler to run the manipulation function under (testRunner.py --profile)
+    kept_results = None  # {image set name: the result file's bytes} if the results are wanted afterwards
 
     def __init__(self, test):
         super().__init__(test)
         self.__class__.test_parameters = self.__class__.test_parameters.copy()
         if self.image_sets is None:
             self.image_sets = list([file_name] for file_name in config.FILE_NAMES)
+        self.io_reports = []
+
+    def count_io(self):
+        """Whether to count the file operations the manipulation function makes (testRunner.py --count-io)"""
+        return "COUNT_IO" in os.environ
+
+    def call_manip_func(self, manip_func, *args, **kwargs):
+        """Run the manipulation function being tested (under the profiler if there is one)"""
+        if self.profiler is not None:
+            return self.profiler.run(manip_func, *args, **kwargs)
+        return manip_func(*args, **kwargs)
+
+    def add_stats(self, manip_func, kwargs, orig_file_name):
+        """Pass the statistics of the original image if the function takes them (only counted the first time one asks for them)"""
+        if PythoShopStats.wants_stats(manip_func):
+            kwargs["stats"] = PythoShopStats.get_stats(io.BytesIO(self.original_images[orig_file_name]))
+        return kwargs
+
+    def keep_result(self, name, result):
+        if self.kept_results is not None:
+            result.seek(0)
+            self.kept_results[name] = result.read()
+
+    def record_io(self, label, stats, original):
+        fpp, width, height, row_size, pad = self.get_info(io.BytesIO(original))
+        self.io_reports.append(label + ": " + stats.summary(width, height))
 
     def get_info(self, image):
         image.seek(10)
@@ -98,9 +139,7 @@ class TestBase:
 
     @classmethod
     def setUpClass(cls):
-        pickled_originals = open("testOriginals.pickle", "rb")
-        cls.original_images = pickle.load(pickled_originals)
-        pickled_originals.close()
+        cls.original_images = load_pickle("testOriginals.pickle")
         try:
             if "IMAGE_MANIP" in os.environ:
                 spec = importlib.util.spec_from_file_location("ImageManip", os.environ["IMAGE_MANIP"] + "/ImageManip.py")
@@ -116,7 +155,7 @@ class TestBase:
             raise unittest.SkipTest(cls.__module__ + ": ImageManip.py has a syntax error and can't be tested")
         positional_args = inspect.getfullargspec(cls.manip_func.__wrapped__).args.copy()
         # starting from the end, remove all the args that are handled by kwargs so we're left with just positional args
-        while positional_args[-1] in cls.test_parameters:
+        while positional_args[-1] in cls.test_parameters or positional_args[-1] == "stats":
             positional_args = positional_args[:-1]
         # what should be left is just the image parameters
         if len(positional_args) < cls.num_image_parameters:
@@ -128,13 +167,10 @@ class TestBase:
                 + str(len(cls.test_parameters) + cls.num_image_parameters)
                 + " parameters."
             )
-        pickled_solutions_file_name = cls.__module__ + ".pickle"
-        pickled_solutions = open(pickled_solutions_file_name, "rb")
-        cls.solution_images = pickle.load(pickled_solutions)
-        pickled_solutions.close()
+        cls.solution_images = load_pickle(cls.__module__ + ".pickle")
 
     def test_images(self):
-        with TestTimeout(10):
+        with TestTimeout(self.time_limit):
             for image_set in self.image_sets:
                 image = image_set[0]
                 with self.subTest(i=image_set):
@@ -144,13 +180,21 @@ class TestBase:
                     static_manip_func = getattr(self.manip_module, self.manip_func_name)
                     with tempfile.TemporaryFile() as image_file:
                         image_file.write(self.original_images[orig_file_name])
+                        manip_file = image_file
+                        if self.count_io():
+                            manip_file = countingFile.CountingFile(image_file)
                         try:
-                            result = static_manip_func(image_file, **self.test_parameters)
+                            kwargs = self.add_stats(static_manip_func, dict(self.test_parameters), orig_file_name)
+                            result = self.call_manip_func(static_manip_func, manip_file, **kwargs)
                         except Exception as e:
                             self.assertTrue(False, "Running on " + orig_file_name + " casused an exception: " + str(e))
+                        if manip_file is not image_file:
+                            self.record_io(image, manip_file.stats, self.original_images[orig_file_name])
                         if result == None:
                             result = image_file
+                        result = countingFile.unwrap(result)
                         self.assertTrue(type(result) == io.BytesIO or type(result) == io.BufferedRandom or type(result) == tempfile._TemporaryFileWrapper)
+                        self.keep_result(image, result)
                         solution_image = io.BytesIO(self.solution_images[test_file_name])
                         self.compare_headers(solution_image, result)
                         fpp1, width1, height1, row_size1, pad1 = self.get_info(solution_image)
@@ -2,6 +2,7 @@ import io
 import random
 import tempfile
 
+import countingFile
 import testBase
 
 
@@ -31,13 +32,23 @@ class TestBase2(testBase.TestBase):
                     with tempfile.TemporaryFile() as image1, tempfile.TemporaryFile() as image2:
                         image1.write(self.original_images[image1_file_name])
                         image2.write(self.original_images[image2_file_name])
+                        manip_file1, manip_file2 = image1, image2
+                        if self.count_io():
+                            # both images count towards the same tally
+                            manip_file1 = countingFile.CountingFile(image1)
+                            manip_file2 = countingFile.CountingFile(image2, manip_file1.stats)
                         try:
-                            result = static_manip_func(image1, other_image=image2, **self.test_parameters)
+                            kwargs = self.add_stats(static_manip_func, dict(self.test_parameters), image1_file_name)
+                            result = self.call_manip_func(static_manip_func, manip_file1, other_image=manip_file2, **kwargs)
                         except Exception as e:
                             self.assertTrue(False, "Running on " + image1_file_name + " and " + image2_file_name + " casused an exception: " + str(e))
+                        if manip_file1 is not image1:
+                            self.record_io(image1_name + "_&_" + image2_name, manip_file1.stats, self.original_images[image1_file_name])
                         if result == None:
                             result = image1
+                        result = countingFile.unwrap(result)
                         self.assertTrue(type(result) == io.BytesIO or type(result) == io.BufferedRandom or type(result) == tempfile._TemporaryFileWrapper)
+                        self.keep_result(image1_name, result)
                         solution_image = io.BytesIO(self.solution_images[test_file_name])
                         self.compare_headers(solution_image, result)
                         fpp1, width1, height1, row_size1, pad1 = self.get_info(solution_image)
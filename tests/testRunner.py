@@ -1,8 +1,22 @@
 #!/usr/bin/env python3
+import argparse
+import concurrent.futures
+import contextlib
+import glob
+import io
+import os
+import signal
 import subprocess
 import sys
+import time
 import unittest
 
+import lineProfiler
+import perfLint
+import verdictCache
+
+PROFILE_TIME_LIMIT = 600  # seconds: the profiler makes functions several times slower
+
 
 def dummyInput(prompt=None):
     raise RuntimeError("You should not be calling the input function within your manipulation functions (only in __main__)")
@@ -12,8 +26,21 @@ def dummyRun(args, **kwargs):
     raise RuntimeError("You should not be calling the subprocess.run function within your manipulation functions (only in __main__)")
 
 
-sys.modules["subprocess"].run = dummyRun
-sys.modules["builtins"].input = dummyInput
+def install_dummies():
+    sys.modules["subprocess"].run = dummyRun
+    sys.modules["builtins"].input = dummyInput
+
+
+install_dummies()
+
+
+def is_timeout(exception):
+    """Whether an exception is testBase's TestTimeoutException (or was raised while handling one, as the failure testBase reports is)"""
+    while exception is not None:
+        if type(exception).__name__ == "TestTimeoutException":
+            return True
+        exception = exception.__context__
+    return False
 
 
 class TestResult(unittest.TextTestResult):
@@ -22,6 +49,7 @@ class TestResult(unittest.TextTestResult):
         self.separator1 = "\n" + self.separator1
         self.points_total = 0
         self.tests = []
+        self.timed_out = []  # tests that ran out of time (which might not happen next time)
 
     def addPoints(self, test):
         assert test.test_weight != 0, "Test " + str(test) + " has zero weight"
@@ -35,6 +63,11 @@ class TestResult(unittest.TextTestResult):
         self.tests.append(test)
         super().startTest(test)
 
+    def addSubTest(self, test, subtest, err):
+        super().addSubTest(test, subtest, err)
+        if err is not None and is_timeout(err[1]):
+            self.timed_out.append(test)
+
     def addSkip(self, test, reason):
         super().addSkip(test, reason)
         # What a hack but I can't see any other way to get this
@@ -48,50 +81,366 @@ class TestResult(unittest.TextTestResult):
                 self.points_total += skipped_class.test_weight
 
 
-if __name__ == "__main__":
-    testSuite = unittest.defaultTestLoader.discover(".")
-    testProgram = unittest.TextTestRunner(stream=sys.stdout, verbosity=2)
-    testProgram.resultclass = TestResult
-    testResults = testProgram.run(testSuite)
+def iter_tests(suite):
+    """The test cases of a (discovered) suite in the order they would run"""
+    for item in suite:
+        if isinstance(item, unittest.TestSuite):
+            yield from iter_tests(item)
+        else:
+            yield item
+
+
+def make_records(testResults):
+    """
+    Everything the Grade Breakdown needs from a run, one record per test module (in the order they ran)
+
+    :param testResults: The TestResult of the run
+    :returns: A list of {"module", "class", "weight", ...} dictionaries that can be cached as JSON
+    """
+    records = []
+    for test in testResults.tests:
+        records.append(
+            {
+                "module": test.__module__,
+                "class": type(test).__name__,
+                "weight": test.test_weight,
+                "sub_tests": len(test.image_sets),
+                "sub_failures": len([x for x in testResults.failures if x[0].test_case == test]),
+                "errors": len([x for x in testResults.errors if getattr(x[0], "test_case", x[0]) == test]),
+                "timed_out": test in testResults.timed_out,
+                "io_reports": list(getattr(test, "io_reports", [])),
+            }
+        )
+    for test, reason in testResults.skipped:
+        skipped_module_name = test.description[test.description.find("(") + 1 : test.description.find(".")]
+        skipped_class_name = test.description[test.description.find(".") + 1 : test.description.find(")")]
+        skipped_class = getattr(__import__(skipped_module_name), skipped_class_name, None)
+        records.append({"module": skipped_module_name, "class": skipped_class_name, "weight": getattr(skipped_class, "test_weight", 0), "skipped": reason})
+    return records
+
+
+def sub_test_percentage(num_sub_tests, num_sub_failures):
+    """The fraction of a test's points earned when num_sub_failures of its num_sub_tests image sets failed"""
+    num_sub_success = num_sub_tests - num_sub_failures
+    if num_sub_failures == 0:
+        return 1.0
+    elif num_sub_success > 0:
+        # Get ~80% if passed at least one
+        return 0.75 + 0.25 * num_sub_success / num_sub_tests
+    else:
+        return 0.0
+
+
+def percentage_of(record):
+    """The fraction of a test's points that were earned (None if it was skipped)"""
+    if "skipped" in record:
+        return None
+    return sub_test_percentage(record["sub_tests"], record["sub_failures"])
+
+
+def total_points(records):
+    """The points the grade is out of (the weight of every required test plus 15%)"""
+    return int(1.15 * sum(record["weight"] for record in records if record["class"] == "Test"))
+
+
+def earned_points(records):
+    return sum(percentage_of(record) * record["weight"] for record in records if "skipped" not in record)
+
+
+def grade_str(records):
+    points_total = total_points(records)
+    if points_total > 0:  # otherwise get a divide by zero
+        return str(round(100 * earned_points(records) / points_total))
+    else:
+        return "0"
+
+
+def print_breakdown(records):
+    """Print the Grade Breakdown and Grade Summary of some records (see make_records)"""
     print("")
     print("Grade Breakdown")
     print("======================================================================")
-    points_total = 0
-    points_earned = 0
-    tests_passed = []
-    tests_partial = []
-    tests_failed = []
-    for test in testResults.tests:
-        num_sub_tests = len(test.image_sets)
-        sub_failures = [x for x in testResults.failures if x[0].test_case == test]
-        num_sub_failures = len(sub_failures)
-        num_sub_success = num_sub_tests - num_sub_failures
-        percentage = 0
-        if num_sub_failures == 0:
-            tests_passed.append(test.__module__)
-            percentage = 1.0
-        elif num_sub_success > 0:
-            tests_partial.append(test.__module__)
-            # Get ~80% if passed at least one
-            percentage = 0.75 + 0.25 * num_sub_success / num_sub_tests
-        else:
-            tests_failed.append(test.__module__)
-            percentage = 0
+    for record in records:
+        if "skipped" in record:
+            continue
+        percentage = percentage_of(record)
         percentage_str = str(round(percentage * 100))
-        points = percentage * test.test_weight
-        points_earned += points
-        print(" " * (3 - len(percentage_str)) + percentage_str + "% " + str(test.__module__) + " (" + str(round(points, 1)) + " points)")
+        points = percentage * record["weight"]
+        print(" " * (3 - len(percentage_str)) + percentage_str + "% " + record["module"] + " (" + str(round(points, 1)) + " points)")
+        for io_report in record["io_reports"]:
+            print("       " + io_report)
 
-    points_total = int(1.15 * testResults.points_total)
-    for skip in testResults.skipped:
-        print("Skipped " + skip[1])
+    for record in records:
+        if "skipped" in record:
+            print("Skipped " + record["skipped"])
 
     print("")
     print("Grade Summary")
     print("======================================================================")
-    print("  Total Points: " + str(points_total))
-    print(" Points Earned: " + str(round(points_earned)))
-    if points_total > 0:  # otherwise get a divide by zero
-        print("Grade (approx): " + str(round(100 * points_earned / points_total)))
+    print("  Total Points: " + str(total_points(records)))
+    print(" Points Earned: " + str(round(earned_points(records))))
+    print("Grade (approx): " + grade_str(records))
+
+
+def breakdown(records):
+    """The Grade Breakdown and Grade Summary of some records (see make_records) as a dictionary that can be sent as JSON"""
+    return {
+        "breakdown": [
+            {
+                "module": record["module"],
+                "percentage": round(percentage_of(record) * 100),
+                "points": round(percentage_of(record) * record["weight"], 1),
+                "io_reports": record["io_reports"],
+            }
+            for record in records
+            if "skipped" not in record
+        ],
+        "skipped": [record["skipped"] for record in records if "skipped" in record],
+        "summary": {"total_points": total_points(records), "points_earned": round(earned_points(records)), "grade": grade_str(records)},
+    }
+
+
+def print_changes(old_records, new_records):
+    """Print the tests whose result is different in new_records (e.g. "  0% -> 100% test_32_negate")"""
+
+    def describe(percentage):
+        return "skipped" if percentage is None else str(round(percentage * 100)) + "%"
+
+    old_percentages = {record["module"]: percentage_of(record) for record in old_records}
+    changed = False
+    for record in new_records:
+        if record["module"] not in old_percentages or old_percentages[record["module"]] != percentage_of(record):
+            before = describe(old_percentages[record["module"]]) if record["module"] in old_percentages else "new"
+            print(before.rjust(7) + " -> " + describe(percentage_of(record)).ljust(7) + " " + record["module"])
+            changed = True
+    if not changed:
+        print("No test results changed")
+
+
+def run_tests(tests, stream=None):
+    """Run some test cases and return their records (see make_records)"""
+    testProgram = unittest.TextTestRunner(stream=stream or sys.stdout, verbosity=2)
+    testProgram.resultclass = TestResult
+    return make_records(testProgram.run(unittest.TestSuite(tests)))
+
+
+def _run_module(module_name):
+    """Run one test module (in a worker process) returning its records and what unittest printed"""
+    stream = io.StringIO()
+    records = run_tests(list(iter_tests(unittest.defaultTestLoader.loadTestsFromName(module_name))), stream)
+    return records, stream.getvalue()
+
+
+def _warm_worker():
+    """Get a worker process ready for a whole --watch session: input and subprocess.run replaced and the test modules and fixtures loaded"""
+    install_dummies()
+    signal.signal(signal.SIGINT, signal.SIG_IGN)  # Ctrl+C is for the main process, which shuts the workers down
+    import testBase
+
+    unittest.defaultTestLoader.discover(".")
+    for file_name in glob.glob("*.pickle"):
+        testBase.load_pickle(file_name)
+
+
+def start_workers(jobs):
+    """Worker processes that stay ready to run tests (e.g. for as long as --watch runs), or None for jobs <= 1"""
+    if jobs <= 1:
+        return None
+    return concurrent.futures.ProcessPoolExecutor(max_workers=jobs, initializer=_warm_worker)
+
+
+def run_tests_parallel(tests, jobs, stream=None, executor=None):
+    """
+    Like run_tests but with the test modules split between worker processes (each with input and
+    subprocess.run replaced like this one). What unittest printed comes out in the same order as tests.
+
+    :param jobs: How many worker processes to use
+    :param executor: Workers from start_workers to use (new ones that only last this long are started if None)
+    """
+    stream = stream or sys.stdout
+    module_names = list(dict.fromkeys(test.__module__ for test in tests if hasattr(test, "manip_func_name")))
+    others = [test for test in tests if not hasattr(test, "manip_func_name")]  # e.g. modules that failed to import
+    records = run_tests(others, stream) if others else []
+    if executor is None:
+        workers = concurrent.futures.ProcessPoolExecutor(max_workers=jobs, initializer=install_dummies)
+    else:
+        workers = contextlib.nullcontext(executor)  # someone else shuts it down
+    with workers as executor:
+        for module_records, output in executor.map(_run_module, module_names):
+            stream.write(output)
+            records += module_records
+    return records
+
+
+def select_tests(tests, cache, fingerprints):
+    """
+    Split test cases into the ones whose verdict is cached (because neither the function they test
+    nor their fixtures changed) and the ones that need to run
+
+    :returns: ({module name: cached record}, [tests to run], {module name: cache key})
+    """
+    cached = {}
+    to_run = []
+    keys = {}
+    for test in tests:
+        manip_func_name = getattr(test, "manip_func_name", None)
+        if cache is None or fingerprints is None or manip_func_name is None:
+            to_run.append(test)  # e.g. a test module that failed to import
+            continue
+        module_name = test.__module__
+        keys[module_name] = cache.key(module_name, fingerprints.get(manip_func_name, "missing"))
+        record = cache.get(module_name, keys[module_name])
+        if record is None:
+            to_run.append(test)
+        else:
+            cached[module_name] = record
+    return cached, to_run, keys
+
+
+def grade(tests, cache=None, stream=None, jobs=1, executor=None):
+    """
+    Get the records of all the tests, running only the ones that can't come from the cache
+
+    :param tests: The test cases (in the order their results should be printed)
+    :param cache: A verdictCache.VerdictCache (or None to run everything)
+    :param stream: Where the unittest output goes (the screen if None)
+    :param jobs: How many processes to run the tests in
+    :param executor: Workers from start_workers to run them in (if jobs > 1)
+    :returns: The records in the same order as tests
+    """
+    fingerprints = verdictCache.fingerprint_manip_module() if cache else None
+    cached, to_run, keys = select_tests(tests, cache, fingerprints)
+    if cached:
+        print("Reusing the results of " + str(len(cached)) + " unchanged tests (use --all to run everything)")
+    if not to_run:
+        ran_records = []
+    elif jobs > 1:
+        ran_records = run_tests_parallel(to_run, jobs, stream, executor)
+    else:
+        ran_records = run_tests(to_run, stream)
+    ran = {record["module"]: record for record in ran_records}
+    if cache is not None:
+        for module_name, record in ran.items():
+            # errors and timeouts might not happen next time so those results aren't kept
+            if module_name in keys and not record.get("errors") and not record.get("timed_out"):
+                cache.put(module_name, keys[module_name], record)
+        cache.save()
+    records = []
+    for test in tests:
+        record = cached.get(test.__module__) or ran.pop(test.__module__, None)
+        if record is not None:
+            records.append(record)
+    return records
+
+
+def watch(cache, everything=False, jobs=1, interval=0.25):
+    """
+    Re-test ImageManip.py every time it is saved (until Ctrl+C), printing only the tests whose results changed.
+    This process (and the worker processes if jobs > 1) stays running so the test modules and fixtures only get loaded once.
+
+    :param cache: The verdictCache.VerdictCache that decides which tests need to run again
+    :param everything: Whether the first run should ignore the cache
+    :param jobs: How many processes to run the tests in
+    :param interval: How often (in seconds) to check whether the file changed
+    """
+    path = verdictCache.manip_path()
+    records = None
+    last_modified = None
+    print("Watching " + os.path.abspath(path) + " (press Ctrl+C to stop)")
+    executor = start_workers(jobs)
+    try:
+        while True:
+            try:
+                modified = os.stat(path).st_mtime_ns
+            except OSError:
+                modified = None  # e.g. in the middle of an editor saving it
+            if modified is not None and modified != last_modified:
+                last_modified = modified
+                tests = list(iter_tests(unittest.defaultTestLoader.discover(".")))
+                if records is None:
+                    records = grade(tests, None if everything else cache, jobs=jobs, executor=executor)
+                    print_breakdown(records)
+                    perfLint.print_warnings(perfLint.lint_file())
+                else:
+                    print("")
+                    print(time.strftime("%H:%M:%S") + " ImageManip.py changed")
+                    new_records = grade(tests, cache, io.StringIO(), jobs, executor)
+                    print("")  # after the progress dots
+                    print_changes(records, new_records)
+                    records = new_records
+                    print("Grade (approx): " + grade_str(records))
+            time.sleep(interval)
+    except KeyboardInterrupt:
+        print("")
+    finally:
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+
+def profile(func_name, image=None):
+    """
+    Run the test of one function on one fixture under the line profiler and write an HTML
+    report (profile-<func_name>.html) of where the time went, next to the image it made
+
+    :param func_name: The function to profile (e.g. negate)
+    :param image: The name of the fixture to run it on (e.g. even) or None for the biggest one
+    """
+    tests = [test for test in iter_tests(unittest.defaultTestLoader.discover(".")) if getattr(test, "manip_func_name", None) == func_name]
+    if not tests:
+        print("There's no test for " + func_name + "()")
+        return
+    test = tests[0]
+    try:
+        type(test).setUpClass()
+    except unittest.SkipTest as e:
+        print("Can't profile " + func_name + "(): " + str(e))
+        return
+    image_sets = [image_set for image_set in test.image_sets if image is None or image_set[0] == image]
+    if not image_sets:
+        print("The test for " + func_name + "() doesn't use " + image + " (it uses " + ", ".join(image_set[0] for image_set in test.image_sets) + ")")
+        return
+    image_set = max(image_sets, key=lambda image_set: len(test.original_images[image_set[0] + ".png"]))
+    test.image_sets = [image_set]
+    test.profiler = lineProfiler.LineProfiler(verdictCache.manip_path())
+    test.kept_results = {}
+    test.time_limit = PROFILE_TIME_LIMIT
+    result = unittest.TestResult()
+    test.run(result)
+    problems = result.failures + result.errors
+    status = "Passed" if not problems else "Failed: " + problems[0][1].strip().splitlines()[-1]
+    images = [("Original " + name, test.original_images[name + ".png"]) for name in image_set]
+    if image_set[0] in test.kept_results:
+        images.append(("Result", test.kept_results[image_set[0]]))
+    with open(verdictCache.manip_path(), encoding="utf-8") as manip_file:
+        source = manip_file.read()
+    report_path = "profile-" + func_name + ".html"
+    title = func_name + "() on " + " & ".join(image_set)
+    lineProfiler.write_report(test.profiler, source, report_path, title, images, status)
+    print("Wrote " + os.path.abspath(report_path) + " (" + title + ": " + status + ")")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Test the functions in ImageManip.py")
+    parser.add_argument("--count-io", action="store_true", help="count the seeks/reads/writes each function makes on the test images")
+    parser.add_argument("--all", action="store_true", help="run every test even if the function it tests hasn't changed since the last run")
+    parser.add_argument("--jobs", "-j", type=int, default=1, help="how many test modules to run at once (0 for one per core)")
+    parser.add_argument("--watch", action="store_true", help="keep running and re-test ImageManip.py every time it is saved")
+    parser.add_argument("--profile", metavar="FUNCTION", help="time every line of FUNCTION on one test image and write an HTML report")
+    parser.add_argument("--image", help="the test image to use with --profile (the biggest one if not given)")
+    args = parser.parse_args()
+    if args.count_io:
+        os.environ["COUNT_IO"] = "1"
+    jobs = args.jobs or os.cpu_count() or 1
+
+    if args.profile:
+        profile(args.profile, args.image)
+    elif args.watch:
+        # counting file operations needs the functions to actually run
+        watch(None if args.count_io else verdictCache.VerdictCache(), args.all, jobs)
     else:
-        print("Grade (approx): 0")
+        testSuite = unittest.defaultTestLoader.discover(".")
+        # counting file operations needs the functions to actually run
+        cache = None if args.all or args.count_io else verdictCache.VerdictCache()
+        records = grade(list(iter_tests(testSuite)), cache, jobs=jobs)
+        print_breakdown(records)
+        perfLint.print_warnings(perfLint.lint_file())
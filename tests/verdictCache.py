@@ -0,0 +1,189 @@
+import ast
+import hashlib
+import json
+import os
+
+CACHE_FILE_NAME = ".testCache.json"
+CACHE_VERSION = 1
+# the test harness itself: changing any of these (or a module they import, e.g. PythoShopPixels.py) re-runs everything
+HARNESS_FILES = ["testBase.py", "testBase2.py", "testTool.py", "testRunner.py", "countingFile.py", "config.py", "testOriginals.pickle"]
+
+
+def _digest(*parts):
+    hasher = hashlib.sha1()
+    for part in parts:
+        hasher.update(part.encode() if isinstance(part, str) else part)
+        hasher.update(b"\0")
+    return hasher.hexdigest()
+
+
+def manip_path():
+    """Where the ImageManip.py being tested is (the same place TestBase.setUpClass loads it from)"""
+    if "IMAGE_MANIP" in os.environ:
+        return os.path.join(os.environ["IMAGE_MANIP"], "ImageManip.py")
+    return os.path.join(os.getcwd(), "..", "ImageManip.py")
+
+
+def _is_main_block(node):
+    """Whether a module level statement is `if __name__ == "__main__":` (which tests never run)"""
+    return (
+        isinstance(node, ast.If)
+        and isinstance(node.test, ast.Compare)
+        and isinstance(node.test.left, ast.Name)
+        and node.test.left.id == "__name__"
+        and any(isinstance(value, ast.Constant) and value.value == "__main__" for value in node.test.comparators)
+    )
+
+
+def _imported_names(tree):
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            yield from (alias.name for alias in node.names)
+        elif isinstance(node, ast.ImportFrom) and node.module and not node.level:
+            yield node.module
+
+
+def local_modules(sources, folders):
+    """
+    The files of the modules some code imports from folders, the ones those import, and so on
+    (modules that aren't in folders, like the standard library, aren't followed)
+
+    :param sources: The code (str or bytes) of each module to start from
+    :param folders: Where modules are imported from, in the order Python looks
+    :returns: A sorted list of paths
+    """
+    found = set()
+    to_read = list(sources)
+    while to_read:
+        try:
+            tree = ast.parse(to_read.pop())
+        except (SyntaxError, ValueError):
+            continue  # its contents are still hashed, there's just nothing to follow
+        for name in _imported_names(tree):
+            for folder in folders:
+                path = os.path.normpath(os.path.join(folder, name.replace(".", os.sep) + ".py"))
+                if os.path.exists(path):
+                    if path not in found:
+                        found.add(path)
+                        with open(path, "rb") as module_file:
+                            to_read.append(module_file.read())
+                    break
+    return sorted(found)
+
+
+def fingerprint_functions(source, module_folder):
+    """
+    Fingerprint every function (and class) in a module. A fingerprint only changes when the
+    function's syntax tree changes (not comments, blank lines or moving it around), when a
+    function or class it uses (directly or not) changes, or when the module level code or a
+    module next to it that it imports (directly or not, e.g. PythoShopPixels.py through
+    PythoShopExports.py) changes.
+
+    :param source: The code of the module
+    :param module_folder: The folder the module is in
+    :returns: {name: fingerprint}
+    """
+    tree = ast.parse(source)
+    definitions = {}
+    shared = []
+    for node in tree.body:
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+            definitions[node.name] = node
+        elif not _is_main_block(node):
+            shared.append(ast.dump(node))
+    for path in local_modules([source], [module_folder]):
+        with open(path, "rb") as module_file:
+            shared.append(module_file.read())
+    shared_digest = _digest(*shared)
+    own = {name: _digest(ast.dump(node)) for name, node in definitions.items()}
+    uses = {name: {used.id for used in ast.walk(node) if isinstance(used, ast.Name) and used.id in definitions} for name, node in definitions.items()}
+    fingerprints = {}
+    for name in definitions:
+        # everything name can reach through the functions it calls
+        reached = {name}
+        to_visit = [name]
+        while to_visit:
+            for used in uses[to_visit.pop()] - reached:
+                reached.add(used)
+                to_visit.append(used)
+        fingerprints[name] = _digest(shared_digest, *(used + ":" + own[used] for used in sorted(reached)))
+    return fingerprints
+
+
+def fingerprint_manip_module():
+    """Fingerprints of the functions in the ImageManip.py being tested (or None if it can't be parsed)"""
+    path = manip_path()
+    try:
+        with open(path, encoding="utf-8") as manip_file:
+            return fingerprint_functions(manip_file.read(), os.path.dirname(os.path.abspath(path)))
+    except (OSError, SyntaxError, ValueError):
+        return None
+
+
+class VerdictCache:
+    """
+    Results of test modules from earlier runs, each stored against the fingerprint of the
+    function it tested and the fixtures (test code, solution images, harness) it ran with
+    """
+
+    def __init__(self, folder="."):
+        self.path = os.path.join(folder, CACHE_FILE_NAME)
+        self.folder = folder
+        self.data = {"version": CACHE_VERSION, "files": {}, "verdicts": {}}
+        self._harness = None  # (digests of HARNESS_FILES, the files they import) so they're only parsed when they change
+        try:
+            with open(self.path, encoding="utf-8") as cache_file:
+                data = json.load(cache_file)
+            if data.get("version") == CACHE_VERSION:
+                self.data = data
+        except (OSError, ValueError):
+            pass  # no cache yet (or a broken one): everything runs
+
+    def file_digest(self, file_name):
+        """Hash of a file's contents, only re-read when its size or modification time changes"""
+        path = os.path.join(self.folder, file_name)
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return "missing"
+        known = self.data["files"].get(file_name)
+        if known and known[0] == stat.st_size and known[1] == stat.st_mtime_ns:
+            return known[2]
+        with open(path, "rb") as fixture:
+            digest = hashlib.sha1(fixture.read()).hexdigest()
+        self.data["files"][file_name] = [stat.st_size, stat.st_mtime_ns, digest]
+        return digest
+
+    def harness_files(self):
+        """HARNESS_FILES and the local modules they import (relative to the tests folder)"""
+        digests = [self.file_digest(file_name) for file_name in HARNESS_FILES]
+        if self._harness is None or self._harness[0] != digests:
+            sources = []
+            for file_name in HARNESS_FILES:
+                if file_name.endswith(".py") and os.path.exists(os.path.join(self.folder, file_name)):
+                    with open(os.path.join(self.folder, file_name), "rb") as harness_file:
+                        sources.append(harness_file.read())
+            # the harness imports modules from the tests folder and the PythoShop folder above it
+            imported = local_modules(sources, [self.folder, os.path.join(self.folder, "..")])
+            files = HARNESS_FILES + [os.path.relpath(path, self.folder) for path in imported]
+            self._harness = (digests, list(dict.fromkeys(files)))  # without the harness files that import each other
+        return self._harness[1]
+
+    def key(self, module_name, fingerprint):
+        fixtures = [module_name + ".py", module_name + ".pickle"] + self.harness_files()
+        return _digest(fingerprint, *(self.file_digest(file_name) for file_name in fixtures))
+
+    def get(self, module_name, key):
+        verdict = self.data["verdicts"].get(module_name)
+        if verdict and verdict["key"] == key:
+            return verdict["record"]
+        return None
+
+    def put(self, module_name, key, record):
+        self.data["verdicts"][module_name] = {"key": key, "record": record}
+
+    def save(self):
+        temporary_path = self.path + ".tmp"
+        with open(temporary_path, "w", encoding="utf-8") as cache_file:
+            json.dump(self.data, cache_file)
+        os.replace(temporary_path, self.path)
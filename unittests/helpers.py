@@ -0,0 +1,3 @@
+def colors(img):
+    """The (r, g, b) of every pixel of a Pillow image, a row at a time from the top"""
+    return [img.getpixel((x, y)) for y in range(img.height) for x in range(img.width)]
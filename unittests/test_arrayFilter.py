@@ -0,0 +1,156 @@
+import os
+import tempfile
+import unittest
+
+import numpy
+from PIL import Image
+
+import PythoShopTiles
+from PythoShopExports import export_array_filter
+from PythoShopPixels import PixelBuffer
+from helpers import colors
+
+
+def _numbered(width, height):
+    """A buffer where every pixel has a different color"""
+    pixels = PixelBuffer(width, height)
+    for y in range(height):
+        for x in range(width):
+            pixels.set_pixel(x, y, (x, y, (x + 10 * y) % 256))
+    return pixels
+
+
+@export_array_filter
+def _invert(image, color, extra):
+    image[...] = 255 - image
+
+
+@export_array_filter
+def _crop(image, color, extra):
+    return image[1:, :2]
+
+
+@export_array_filter
+def _paint(image, color, extra):
+    image[...] = color
+    return image.astype(numpy.int16) + 300  # clipped back to 255
+
+
+@export_array_filter
+def _copy_other(image, color, extra, other_image):
+    image[...] = other_image[0, 0]
+    other_image[0, 0] = 0
+
+
+# what a tile safe array filter in ImageManip.py looks like (the tile runner loads it from the file)
+TILED_MODULE = """from PythoShopExports import export_array_filter
+
+
+@export_array_filter(tile_safe=True)
+def invert(image, color, extra):
+    image[...] = 255 - image
+"""
+
+
+class TestArray(unittest.TestCase):
+    def test_padding(self):
+        for width in range(1, 6):  # every amount of row padding (and none)
+            pixels = _numbered(width, 3)
+            array = pixels.array()
+            self.assertEqual(array.shape, (3, width, 3))
+            self.assertEqual(array.dtype, numpy.uint8)
+            self.assertEqual([tuple(int(value) for value in array[y, x]) for y in range(3) for x in range(width)], colors(pixels.to_image()))
+
+    def test_changes_the_pixels(self):
+        for width in range(1, 6):
+            pixels = _numbered(width, 3)
+            padding = [bytes(pixels.data[start + 3 * width : start + pixels.row_size]) for start in range(0, len(pixels.data), pixels.row_size)]
+            pixels.array()[1, width - 1] = (7, 8, 9)
+            self.assertEqual(pixels.get_pixel(width - 1, 1), (7, 8, 9))
+            self.assertEqual(pixels.get_pixel(0, 0), (0, 0, 0))
+            # the padding at the end of each row is left alone
+            self.assertEqual(
+                [bytes(pixels.data[start + 3 * width : start + pixels.row_size]) for start in range(0, len(pixels.data), pixels.row_size)], padding
+            )
+
+    def test_from_array(self):
+        for width in range(1, 6):
+            pixels = _numbered(width, 3)
+            copied = PixelBuffer.from_array(pixels.array())
+            self.assertEqual((copied.width, copied.height), (width, 3))
+            self.assertEqual(copied.data, pixels.data)
+
+    def test_from_array_gray_and_clipped(self):
+        pixels = PixelBuffer.from_array(numpy.array([[-5, 100, 400]]))
+        self.assertEqual([pixels.get_pixel(x, 0) for x in range(3)], [(0, 0, 0), (100, 100, 100), (255, 255, 255)])
+
+    def test_from_array_wrong_shape(self):
+        with self.assertRaises(ValueError):
+            PixelBuffer.from_array(numpy.zeros((2, 2, 4)))
+
+
+class TestExportArrayFilter(unittest.TestCase):
+    def test_in_place_pixel_buffer(self):
+        pixels = _numbered(3, 2)
+        self.assertIsNone(_invert(pixels, color=(0, 0, 0), extra=""))
+        self.assertEqual(pixels.get_pixel(2, 1), (253, 254, 243))
+
+    def test_in_place_image(self):
+        img = _numbered(3, 2).to_image()
+        self.assertIsNone(_invert(img, color=(0, 0, 0), extra=""))
+        self.assertEqual(img.getpixel((2, 1)), (253, 254, 243))
+
+    def test_in_place_bmp(self):
+        bmp = _numbered(3, 2).to_bmp()
+        self.assertIsNone(_invert(bmp, color=(0, 0, 0), extra=""))
+        self.assertEqual(PixelBuffer.from_bmp(bmp).get_pixel(2, 1), (253, 254, 243))
+
+    def test_returned_array_of_another_size(self):
+        result = _crop(_numbered(3, 3), color=(0, 0, 0), extra="")
+        self.assertIsInstance(result, PixelBuffer)
+        self.assertEqual((result.width, result.height), (2, 2))
+        self.assertEqual(result.get_pixel(1, 0), (1, 1, 11))
+
+        img = _numbered(3, 3).to_image()
+        result = _crop(img, color=(0, 0, 0), extra="")
+        self.assertIsInstance(result, Image.Image)
+        self.assertEqual(result.size, (2, 2))
+        self.assertEqual(img.size, (3, 3))
+
+        result = _crop(_numbered(3, 3).to_bmp(), color=(0, 0, 0), extra="")
+        self.assertEqual(PixelBuffer.from_bmp(result).get_pixel(1, 1), (1, 2, 21))
+
+    def test_color(self):
+        pixels = PixelBuffer(2, 2)
+        result = _paint(pixels, color=(10, 20, 30), extra="")
+        self.assertEqual(pixels.get_pixel(0, 0), (10, 20, 30))  # as a uint8 array that the color could be put into
+        self.assertEqual(result.get_pixel(1, 1), (255, 255, 255))
+
+    def test_other_image_is_read_only(self):
+        pixels = PixelBuffer(2, 2)
+        other = _numbered(2, 2)
+        other.set_pixel(0, 0, (1, 2, 3))
+        with self.assertRaises(ValueError):
+            _copy_other(pixels, color=(0, 0, 0), extra="", other_image=other)
+        self.assertEqual(pixels.get_pixel(1, 1), (1, 2, 3))
+        self.assertEqual(other.get_pixel(0, 0), (1, 2, 3))
+
+    def test_tiled(self):
+        with tempfile.TemporaryDirectory() as folder:
+            path = os.path.join(folder, "ImageManip.py")
+            with open(path, "w", encoding="utf-8") as manip_file:
+                manip_file.write(TILED_MODULE)
+            invert = PythoShopTiles._load_function(path, "invert")
+            runner = PythoShopTiles.TileRunner(max_workers=2)
+            try:
+                pixels = _numbered(5, 40)
+                expected = pixels.copy()
+                invert(expected, color=(0, 0, 0), extra="")
+                runner.run(invert, pixels, color=(0, 0, 0), extra="")
+                self.assertEqual(pixels.data, expected.data)
+            finally:
+                runner.shutdown()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,42 @@
+import unittest
+
+from PIL import Image
+
+import PythoShopBlend
+from PythoShopPixels import PixelBuffer
+from helpers import colors
+
+
+class TestBlend(unittest.TestCase):
+    def test_mix_other(self):
+        img = Image.new("RGB", (3, 3), (100, 0, 200))
+        other = Image.new("RGB", (2, 2), (0, 100, 0))
+        PythoShopBlend.mix_other(img, other_image=other, extra="25")
+        self.assertEqual(img.getpixel((1, 1)), (75, 25, 150))
+        self.assertEqual(img.getpixel((2, 2)), (100, 0, 200))  # outside the other image
+
+    def test_mix_other_without_other_image(self):
+        img = Image.new("RGB", (2, 1), (100, 0, 200))
+        PythoShopBlend.mix_other(img, extra="25")
+        self.assertEqual(set(colors(img)), {(100, 0, 200)})
+
+    def test_mix_other_defaults_to_half(self):
+        pixels = PixelBuffer(1, 1)
+        other = PixelBuffer(1, 1)
+        other.set_pixel(0, 0, (100, 51, 0))
+        PythoShopBlend.mix_other(pixels, other_image=other, extra="")
+        self.assertEqual(pixels.get_pixel(0, 0), (50, 26, 0))
+
+    def test_fade_to_color(self):
+        img = Image.new("RGB", (3, 1), (0, 0, 0))
+        PythoShopBlend.fade_to_color(img, color=(200, 100, 0))
+        self.assertEqual(colors(img), [(0, 0, 0), (100, 50, 0), (200, 100, 0)])
+
+    def test_parse_amount(self):
+        self.assertEqual(PythoShopBlend.parse_amount("25%"), 0.25)
+        self.assertEqual(PythoShopBlend.parse_amount("150"), 1.0)
+        self.assertEqual(PythoShopBlend.parse_amount("some"), 0.5)
+
+
+if __name__ == "__main__":
+    unittest.main()
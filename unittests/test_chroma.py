@@ -0,0 +1,33 @@
+import unittest
+
+from PIL import Image
+
+import PythoShopChroma
+from helpers import colors
+
+
+class TestChroma(unittest.TestCase):
+    def test_green_screen(self):
+        background = Image.new("RGB", (3, 2), (9, 9, 9))
+        foreground = Image.new("RGB", (3, 2), (0, 255, 0))
+        foreground.putpixel((1, 0), (200, 10, 10))
+        foreground.putpixel((2, 1), (5, 250, 5))  # close to the key color
+        PythoShopChroma.green_screen(background, other_image=foreground, color=(0, 255, 0), extra="")
+        self.assertEqual(background.getpixel((0, 0)), (9, 9, 9))
+        self.assertEqual(background.getpixel((1, 0)), (200, 10, 10))
+        self.assertEqual(background.getpixel((2, 1)), (5, 250, 5))
+
+    def test_green_screen_tolerance(self):
+        background = Image.new("RGB", (2, 1), (9, 9, 9))
+        foreground = Image.new("RGB", (2, 1), (5, 250, 5))
+        PythoShopChroma.green_screen(background, other_image=foreground, color=(0, 255, 0), extra="5")
+        self.assertEqual(set(colors(background)), {(9, 9, 9)})
+
+    def test_green_screen_without_other_image(self):
+        background = Image.new("RGB", (2, 1), (9, 9, 9))
+        PythoShopChroma.green_screen(background, color=(0, 255, 0), extra="")
+        self.assertEqual(set(colors(background)), {(9, 9, 9)})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,67 @@
+import unittest
+from unittest import mock
+
+from PIL import Image
+
+import PythoShopFill
+from PythoShopPixels import PixelBuffer
+from helpers import colors
+
+WHITE = (255, 255, 255)
+RED = (255, 0, 0)
+
+
+def _comb(width, height):
+    """Black one pixel wide teeth joined along the bottom row, with white between them"""
+    pixels = PixelBuffer(width, height)
+    for y in range(height - 1):
+        for x in range(1, width, 2):
+            pixels.set_pixel(x, y, WHITE)
+    return pixels
+
+
+class TestFill(unittest.TestCase):
+    def test_fills_a_comb(self):
+        pixels = _comb(41, 10)
+        filled = PythoShopFill.flood_fill(pixels, (0, 9), RED)
+        self.assertEqual(filled, 21 * 9 + 41)
+        self.assertEqual(pixels.get_pixel(40, 0), RED)
+        self.assertEqual(pixels.get_pixel(39, 0), WHITE)
+
+    def test_comb_work_does_not_depend_on_width(self):
+        # every tooth is a run in every row, so looking at whole rows for each run would be width x runs
+        pixels = _comb(2000, 50)
+        examined = []
+        fillable = PythoShopFill._FillRegion.fillable
+
+        def counting_fillable(region, y, start, stop):
+            examined.append(stop - start)
+            return fillable(region, y, start, stop)
+
+        with mock.patch.object(PythoShopFill._FillRegion, "fillable", counting_fillable):
+            filled = PythoShopFill.flood_fill(pixels, (0, 49), RED)
+        self.assertEqual(filled, 1000 * 49 + 2000)
+        self.assertLess(sum(examined), 10 * filled)
+
+    def test_checkerboard(self):
+        img = Image.new("RGB", (8, 8))
+        img.putdata([WHITE if (x + y) % 2 else (0, 0, 0) for y in range(8) for x in range(8)])
+        self.assertEqual(PythoShopFill.flood_fill(img, (3, 3), RED), 1)  # its neighbors are all white
+        self.assertEqual(img.getpixel((3, 3)), RED)
+        self.assertEqual(img.getpixel((5, 5)), (0, 0, 0))
+        self.assertEqual(PythoShopFill.flood_fill(img, (0, 1), RED, tolerance=255), 64)
+
+    def test_outside_the_image(self):
+        self.assertEqual(PythoShopFill.flood_fill(PixelBuffer(3, 3), (3, 0), RED), 0)
+
+    def test_paint_bucket_tolerance(self):
+        img = Image.new("RGB", (4, 1), (100, 100, 100))
+        img.putpixel((2, 0), (108, 100, 100))
+        PythoShopFill.paint_bucket(img, (0, 0), color=RED, extra="")
+        self.assertEqual(colors(img), [RED, RED, (108, 100, 100), (100, 100, 100)])
+        PythoShopFill.paint_bucket(img, (2, 0), color=(0, 0, 255), extra="160")
+        self.assertEqual(set(colors(img)), {(0, 0, 255)})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,44 @@
+import importlib.util
+import os
+import tempfile
+import unittest
+
+_spec = importlib.util.spec_from_file_location("gradeCache", os.path.join(os.path.dirname(__file__), "..", "admin", "gradeCache.py"))
+gradeCache = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(gradeCache)
+
+
+def _write(path, text):
+    with open(path, "w", encoding="utf-8") as written:
+        written.write(text)
+    # make sure the modification time changes even on file systems that only keep whole seconds
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9 + len(text)))
+
+
+class TestGradeCache(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.TemporaryDirectory()
+        self.tests = os.path.join(self.folder.name, "tests")
+        os.mkdir(self.tests)
+        _write(os.path.join(self.tests, "testBase.py"), "import PythoShopPixels\n")
+        _write(os.path.join(self.folder.name, "PythoShopPixels.py"), "ROW_ALIGNMENT = 4\n")
+        self.cache = gradeCache.GradeCache(os.path.join(self.folder.name, "gradeCache.json"))
+
+    def tearDown(self):
+        self.folder.cleanup()
+
+    def test_tests_digest_changes_with_the_framework(self):
+        before = self.cache.tests_digest(self.tests)
+        self.assertEqual(self.cache.tests_digest(self.tests), before)
+        _write(os.path.join(self.folder.name, "PythoShopPixels.py"), "ROW_ALIGNMENT = 8\n")
+        self.assertNotEqual(self.cache.tests_digest(self.tests), before)
+
+    def test_tests_digest_changes_with_the_harness(self):
+        before = self.cache.tests_digest(self.tests)
+        _write(os.path.join(self.tests, "testBase.py"), "import PythoShopStats\n")
+        self.assertNotEqual(self.cache.tests_digest(self.tests), before)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,49 @@
+import importlib.util
+import os
+import tempfile
+import unittest
+
+_spec = importlib.util.spec_from_file_location("gradeLog", os.path.join(os.path.dirname(__file__), "..", "admin", "gradeLog.py"))
+gradeLog = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(gradeLog)
+
+
+class TestGradeLog(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.TemporaryDirectory()
+        self.log = gradeLog.GradeLog(os.path.join(self.folder.name, "log.jsonl"), os.path.join(self.folder.name, "log.csv"))
+
+    def tearDown(self):
+        self.folder.cleanup()
+
+    def test_resumed_student_counted_once(self):
+        self.log.start_run(["testNegate", "testLighten"])
+        run = self.log.run
+        self.log.add_test("s1", "testNegate", 100, 5.0)
+        self.log.add_test("s1", "testLighten", 100, 1.0)
+        self.log.add_student("s1", "100%", [100, 100], 6.0)
+        self.log.add_test("s2", "testNegate", 0, 9.0)  # then the machine crashed
+
+        resumed = gradeLog.GradeLog(self.log.path, self.log.csv_path)
+        self.assertEqual(resumed.last_run(), run)
+        self.assertEqual(list(resumed.finished_students(run)), ["s1"])
+        resumed.start_run(["testNegate", "testLighten"], run)
+        resumed.add_test("s2", "testNegate", 100, 2.0)
+        resumed.add_test("s2", "testLighten", 100, 3.0)
+        resumed.add_student("s2", "100%", [100, 100], 5.0)
+
+        slowest = resumed.slowest(run)
+        self.assertEqual(
+            [(record["student"], record["test"], record["seconds"]) for record in slowest],
+            [
+                ("s1", "testNegate", 5.0),
+                ("s2", "testLighten", 3.0),
+                ("s2", "testNegate", 2.0),
+                ("s1", "testLighten", 1.0),
+            ],
+        )
+        self.assertEqual(resumed.test_records(run)["s2", "testNegate"]["percentage"], 100)
+
+
+if __name__ == "__main__":
+    unittest.main()
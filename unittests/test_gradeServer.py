@@ -0,0 +1,81 @@
+import concurrent.futures
+import os
+import sys
+import tempfile
+import time
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "admin"))  # so the worker processes can import it too
+import gradeServer
+
+# stands in for the real tests: grading just runs the submission
+TEST_RUNNER = """
+import os
+import runpy
+
+
+def iter_tests(suite):
+    return []
+
+
+def run_tests(tests, stream):
+    runpy.run_path(os.path.join(os.environ["IMAGE_MANIP"], "ImageManip.py"))
+    return []
+
+
+def breakdown(records):
+    return {"grade": "100%"}
+"""
+
+
+class TestGrader(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.TemporaryDirectory()
+        with open(os.path.join(self.folder.name, "testBase.py"), "w", encoding="utf-8") as test_base:
+            test_base.write("def load_pickle(path):\n    pass\n")
+        with open(os.path.join(self.folder.name, "testRunner.py"), "w", encoding="utf-8") as test_runner:
+            test_runner.write(TEST_RUNNER)
+        self.grader = gradeServer.Grader(self.folder.name, 2, timeout=1)
+
+    def tearDown(self):
+        self.grader.shutdown()
+        self.folder.cleanup()
+
+    def test_grade(self):
+        self.assertEqual(self.grader.grade("x = 1\n")["grade"], "100%")
+
+    def test_infinite_loops_dont_use_up_the_workers(self):
+        pid_file = os.path.join(self.folder.name, "pid")
+        for i in range(self.grader.jobs + 1):
+            result = self.grader.grade("import os\nwith open(" + repr(pid_file) + ", 'w') as pid:\n    pid.write(str(os.getpid()))\nwhile True:\n    pass\n")
+            self.assertIn("took more than", result["error"])
+            with open(pid_file) as pid:
+                with self.assertRaises(ProcessLookupError):  # stopped (and cleaned up)
+                    os.kill(int(pid.read()), 0)
+        self.assertEqual(self.grader.grade("x = 1\n")["grade"], "100%")
+
+    def test_timeout_leaves_other_submissions_alone(self):
+        with concurrent.futures.ThreadPoolExecutor(2) as threads:
+            stuck = threads.submit(self.grader.grade, "while True:\n    pass\n")
+            time.sleep(0.6)
+            # still being graded when the other one times out
+            slow = threads.submit(self.grader.grade, "import time\ntime.sleep(0.6)\n")
+            self.assertIn("error", stuck.result())
+            self.assertEqual(slow.result()["grade"], "100%")
+
+    def test_submissions_dont_see_each_other(self):
+        grader = gradeServer.Grader(self.folder.name, 1, timeout=5)  # so both go to the same worker
+        try:
+            self.assertEqual(grader.grade("import testBase\ntestBase.load_pickle = None\n")["grade"], "100%")
+            self.assertEqual(grader.grade("import testBase\nassert testBase.load_pickle is not None\n")["grade"], "100%")
+        finally:
+            grader.shutdown()
+
+    def test_crash(self):
+        self.assertIn("error", self.grader.grade("import os\nos._exit(1)\n"))
+        self.assertIn("error", self.grader.grade("exit()\n"))
+        self.assertEqual(self.grader.grade("x = 1\n")["grade"], "100%")
+
+
+if __name__ == "__main__":
+    unittest.main()
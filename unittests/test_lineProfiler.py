@@ -0,0 +1,65 @@
+import os
+import re
+import runpy
+import tempfile
+import unittest
+
+from tests import lineProfiler
+
+NESTED = """import time
+
+
+def inner():
+    time.sleep(0.05)
+
+
+def outer():
+    inner()
+"""
+
+
+class TestLineProfiler(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.folder.name, "ImageManip.py")
+        with open(self.path, "w", encoding="utf-8") as manip_file:
+            manip_file.write(NESTED)
+        self.outer = runpy.run_path(self.path)["outer"]
+
+    def tearDown(self):
+        self.folder.cleanup()
+
+    def test_counts(self):
+        profiler = lineProfiler.LineProfiler(self.path)
+        profiler.run(self.outer)
+        profiler.run(self.outer)
+        self.assertEqual(profiler.hits[5], 2)
+        self.assertEqual(profiler.hits[9], 2)
+        # the call to inner includes the time inside it
+        self.assertGreaterEqual(profiler.seconds[9], profiler.seconds[5])
+        self.assertGreaterEqual(profiler.seconds[5], 0.1)
+        self.assertLessEqual(profiler.seconds[9], profiler.total_seconds)
+
+    def test_report_shares(self):
+        profiler = lineProfiler.LineProfiler(self.path)
+        profiler.run(self.outer)
+        report_path = os.path.join(self.folder.name, "report.html")
+        lineProfiler.write_report(profiler, NESTED, report_path, "outer()", [], "Passed")
+        with open(report_path, encoding="utf-8") as report_file:
+            report = report_file.read()
+        shares = {}
+        for row in report.split("</tr>"):
+            match = re.search(r'<tr class="(\w*)"><td>(\d+)</td>.*</div>(\d+)%</td>', row)
+            if match:
+                shares[int(match[2])] = (match[1], int(match[3]))
+        # both the sleep and the line calling the function it's in take (nearly) all of the time
+        self.assertEqual(set(shares), {5, 9})
+        for line in (5, 9):
+            self.assertEqual(shares[line][0], "hot")
+            self.assertGreaterEqual(shares[line][1], 90)
+        self.assertIn("<th>inner</th>", report)
+        self.assertIn("<th>outer</th>", report)
+
+
+if __name__ == "__main__":
+    unittest.main()
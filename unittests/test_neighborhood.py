@@ -0,0 +1,57 @@
+import unittest
+from unittest import mock
+
+from PIL import Image
+
+import PythoShopNeighborhood
+from PythoShopPixels import PixelBuffer
+from helpers import colors
+
+
+class TestNeighborhood(unittest.TestCase):
+    def test_operation_is_abstract(self):
+        with self.assertRaises(TypeError):
+            PythoShopNeighborhood.Operation()
+
+    def test_blur_keeps_a_plain_image(self):
+        img = Image.new("RGB", (7, 5), (10, 120, 250))
+        PythoShopNeighborhood.blur(img)
+        self.assertEqual(set(colors(img)), {(10, 120, 250)})
+
+    def test_blur_spreads_a_dot(self):
+        pixels = PixelBuffer(5, 5)
+        pixels.set_pixel(2, 2, (160, 160, 160))
+        PythoShopNeighborhood.blur(pixels)
+        # the 1 2 1 kernel in both directions: the middle keeps 4/16 and its side neighbors get 2/16
+        self.assertEqual(pixels.get_pixel(2, 2), (40, 40, 40))
+        self.assertEqual(pixels.get_pixel(1, 2), (20, 20, 20))
+        self.assertEqual(pixels.get_pixel(1, 1), (10, 10, 10))
+        self.assertEqual(pixels.get_pixel(0, 0), (0, 0, 0))
+
+    def test_edge_detect(self):
+        img = Image.new("RGB", (6, 4), (200, 200, 200))
+        for y in range(4):
+            for x in range(3):
+                img.putpixel((x, y), (0, 0, 0))
+        PythoShopNeighborhood.edge_detect(img)
+        self.assertEqual(img.getpixel((0, 1)), (0, 0, 0))  # nothing changes around it
+        self.assertEqual(img.getpixel((5, 1)), (0, 0, 0))
+        self.assertEqual(img.getpixel((3, 1)), (255, 255, 255))  # next to the dark half
+
+    def test_sharpen_keeps_a_plain_image(self):
+        pixels = PixelBuffer(4, 4)
+        for y in range(4):
+            for x in range(4):
+                pixels.set_pixel(x, y, (90, 60, 30))
+        PythoShopNeighborhood.sharpen(pixels)
+        self.assertEqual({pixels.get_pixel(x, y) for y in range(4) for x in range(4)}, {(90, 60, 30)})
+
+    def test_built_ins_dont_start_processes(self):
+        # every click in the GUI would pay for starting them (and importing PythoShop again in each on Windows and macOS)
+        with mock.patch("os.cpu_count", return_value=4), mock.patch("concurrent.futures.ProcessPoolExecutor", side_effect=AssertionError):
+            for func in (PythoShopNeighborhood.blur, PythoShopNeighborhood.sharpen, PythoShopNeighborhood.edge_detect):
+                func(Image.new("RGB", (8, 40), (10, 120, 250)), color=(0, 0, 0), extra="")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,41 @@
+import unittest
+
+import PythoShopPixels
+
+
+class TestHelpers(unittest.TestCase):
+    def test_parse_tolerance(self):
+        self.assertEqual(PythoShopPixels.parse_tolerance(" 12 "), 12)
+        self.assertEqual(PythoShopPixels.parse_tolerance("300"), 255)
+        self.assertEqual(PythoShopPixels.parse_tolerance("lots"), 0)
+
+    def test_set_bits(self):
+        for start, stop in [(0, 1), (3, 5), (7, 9), (2, 30), (0, 32)]:
+            bits = bytearray(1) + bytearray(4)  # a row of 32 bits after one byte that isn't part of it
+            PythoShopPixels.set_bits(bits, 1, start, stop)
+            self.assertEqual(bits[0], 0)
+            self.assertEqual(format(int.from_bytes(bits[1:], "big"), "032b"), "0" * start + "1" * (stop - start) + "0" * (32 - stop))
+
+    def test_key_tables(self):
+        blue, green, red = PythoShopPixels.key_tables((10, 128, 250), 5)
+        self.assertEqual([value for value in range(256) if red[value]], list(range(5, 16)))
+        self.assertEqual([value for value in range(256) if green[value]], list(range(123, 134)))
+        self.assertEqual([value for value in range(256) if blue[value]], list(range(245, 256)))
+
+
+class TestPixelBuffer(unittest.TestCase):
+    def test_packed_rows(self):
+        for width in range(1, 6):  # every amount of row padding (and none)
+            pixels = PythoShopPixels.PixelBuffer(width, 5)
+            for y in range(5):
+                for x in range(width):
+                    pixels.set_pixel(x, y, (x, y, 7))
+            rows = [bytes(pixels.row(y)) for y in range(5)]
+            self.assertEqual(pixels.packed(), b"".join(reversed(rows)))
+            self.assertEqual(pixels.packed(1, 3), rows[2] + rows[1])  # bottom-up like a texture
+            self.assertEqual(pixels.packed(4), rows[4])
+            self.assertEqual(pixels.packed(2, 2), b"")
+
+
+if __name__ == "__main__":
+    unittest.main()
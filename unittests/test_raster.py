@@ -0,0 +1,160 @@
+import unittest
+
+import PythoShopRaster
+from PythoShopPixels import PixelBuffer
+
+
+def pixels_of(spans):
+    """Every (x, y) covered by some spans"""
+    return {(x, y) for y, x_start, x_stop in spans for x in range(x_start, x_stop)}
+
+
+def drawn(pixels):
+    """Every (x, y) that isn't black"""
+    return {(x, y) for y in range(pixels.height) for x in range(pixels.width) if pixels.get_pixel(x, y) != (0, 0, 0)}
+
+
+class TestLine(unittest.TestCase):
+    def test_horizontal_is_one_span(self):
+        self.assertEqual(PythoShopRaster.line((2, 3), (7, 3)), [(3, 2, 8)])
+        self.assertEqual(PythoShopRaster.line((7, 3), (2, 3)), [(3, 2, 8)])
+
+    def test_vertical(self):
+        self.assertEqual(PythoShopRaster.line((4, 1), (4, 4)), [(1, 4, 5), (2, 4, 5), (3, 4, 5), (4, 4, 5)])
+
+    def test_single_pixel(self):
+        self.assertEqual(PythoShopRaster.line((3, 3), (3, 3)), [(3, 3, 4)])
+
+    def test_diagonal(self):
+        self.assertEqual(pixels_of(PythoShopRaster.line((0, 0), (3, 3))), {(0, 0), (1, 1), (2, 2), (3, 3)})
+        self.assertEqual(pixels_of(PythoShopRaster.line((3, 0), (0, 3))), {(3, 0), (2, 1), (1, 2), (0, 3)})
+
+    def test_shallow_line_is_bresenham(self):
+        # one pixel per column, each the closest to the real line
+        self.assertEqual(pixels_of(PythoShopRaster.line((0, 0), (6, 2))), {(0, 0), (1, 0), (2, 1), (3, 1), (4, 1), (5, 2), (6, 2)})
+        self.assertEqual(PythoShopRaster.line((0, 0), (6, 2)), [(0, 0, 2), (1, 2, 5), (2, 5, 7)])
+
+    def test_steep_line_is_bresenham(self):
+        self.assertEqual(pixels_of(PythoShopRaster.line((0, 0), (2, 6))), {(0, 0), (0, 1), (1, 2), (1, 3), (1, 4), (2, 5), (2, 6)})
+
+    def test_one_pixel_per_step(self):
+        for start, stop in [((1, 2), (9, 4)), ((9, 4), (1, 2)), ((1, 2), (4, 9)), ((1, 2), (-5, 7)), ((1, 2), (8, -3))]:
+            line = pixels_of(PythoShopRaster.line(start, stop))
+            self.assertIn(start, line)
+            self.assertIn(stop, line)
+            if abs(stop[0] - start[0]) >= abs(stop[1] - start[1]):
+                self.assertEqual(sorted(x for x, y in line), list(range(min(start[0], stop[0]), max(start[0], stop[0]) + 1)))
+            else:
+                self.assertEqual(sorted(y for x, y in line), list(range(min(start[1], stop[1]), max(start[1], stop[1]) + 1)))
+
+    def test_thick(self):
+        # a square pen centered on the line
+        self.assertEqual(pixels_of(PythoShopRaster.line((5, 5), (5, 5), thickness=3)), {(x, y) for x in range(4, 7) for y in range(4, 7)})
+        self.assertEqual(pixels_of(PythoShopRaster.line((2, 5), (8, 5), thickness=3)), {(x, y) for x in range(1, 10) for y in range(4, 7)})
+        # even thicknesses put the extra row/column after the line
+        self.assertEqual(pixels_of(PythoShopRaster.line((5, 5), (5, 5), thickness=2)), {(5, 5), (6, 5), (5, 6), (6, 6)})
+
+
+class TestShapes(unittest.TestCase):
+    def test_hline_and_vline(self):
+        self.assertEqual(PythoShopRaster.hline(2, 1, 4), [(2, 1, 4)])
+        self.assertEqual(PythoShopRaster.hline(5, 0, 3, thickness=3, centered=True), [(4, 0, 3), (5, 0, 3), (6, 0, 3)])
+        self.assertEqual(PythoShopRaster.vline(5, 0, 2, thickness=2), [(0, 5, 7), (1, 5, 7)])
+
+    def test_border(self):
+        frame = pixels_of(PythoShopRaster.border(6, 5))
+        self.assertEqual(frame, {(x, y) for x in range(6) for y in range(5) if x in (0, 5) or y in (0, 4)})
+
+    def test_thick_border(self):
+        frame = pixels_of(PythoShopRaster.border(8, 7, thickness=2))
+        self.assertEqual(frame, {(x, y) for x in range(8) for y in range(7) if x < 2 or x >= 6 or y < 2 or y >= 5})
+
+    def test_border_spans_dont_overlap(self):
+        spans = PythoShopRaster.border(8, 7, thickness=2)
+        self.assertEqual(sum(x_stop - x_start for y, x_start, x_stop in spans), len(pixels_of(spans)))
+
+    def test_disc(self):
+        self.assertEqual(pixels_of(PythoShopRaster.disc((5, 5), 0)), {(5, 5)})
+        self.assertEqual(pixels_of(PythoShopRaster.disc((5, 5), 1)), {(5, 4), (4, 5), (5, 5), (6, 5), (5, 6)})
+        disc = pixels_of(PythoShopRaster.disc((10, 10), 4))
+        self.assertEqual(disc, {(x, y) for x in range(20) for y in range(20) if (x - 10) ** 2 + (y - 10) ** 2 <= 16})
+
+    def test_stroke_is_discs_along_the_line(self):
+        expected = set()
+        for x, y in pixels_of(PythoShopRaster.line((2, 3), (12, 7))):
+            expected |= pixels_of(PythoShopRaster.disc((x, y), 2))
+        self.assertEqual(pixels_of(PythoShopRaster.stroke((2, 3), (12, 7), 2)), expected)
+
+    def test_stroke_of_one_point_is_a_disc(self):
+        self.assertEqual(pixels_of(PythoShopRaster.stroke((4, 4), (4, 4), 3)), pixels_of(PythoShopRaster.disc((4, 4), 3)))
+
+
+class TestMerge(unittest.TestCase):
+    def test_overlapping_and_touching(self):
+        self.assertEqual(PythoShopRaster.merge([(0, 5, 8), (0, 1, 3), (0, 2, 6), (0, 8, 9), (1, 0, 1)], 20, 5), {0: [(1, 9)], 1: [(0, 1)]})
+
+    def test_separate(self):
+        self.assertEqual(PythoShopRaster.merge([(2, 6, 8), (2, 1, 3)], 20, 5), {2: [(1, 3), (6, 8)]})
+
+    def test_clipped(self):
+        self.assertEqual(PythoShopRaster.merge([(-1, 0, 3), (5, 0, 3), (1, -4, 2), (2, 8, 30), (3, 10, 12), (4, -3, 0)], 10, 5), {1: [(0, 2)], 2: [(8, 10)]})
+
+
+class TestDraw(unittest.TestCase):
+    def test_draw(self):
+        for width in range(3, 7):  # with every amount of row padding
+            pixels = PixelBuffer(width, 4)
+            count = PythoShopRaster.draw(pixels, [(1, 1, 3), (2, 2, 10), (2, 0, 1), (-1, 0, 2)], (10, 20, 30))
+            expected = {(1, 1), (2, 1), (0, 2)} | {(x, 2) for x in range(2, width)}
+            self.assertEqual(drawn(pixels), expected)
+            self.assertEqual(count, len(expected))
+            self.assertEqual(pixels.get_pixel(1, 1), (10, 20, 30))
+
+    def test_draw_on_an_image(self):
+        img = PixelBuffer(5, 5).to_image()
+        PythoShopRaster.draw(img, PythoShopRaster.border(5, 5), (255, 255, 255))
+        self.assertEqual(drawn(PixelBuffer.from_image(img)), pixels_of(PythoShopRaster.border(5, 5)))
+
+
+class TestMarker(unittest.TestCase):
+    def setUp(self):
+        PythoShopRaster.marker.start_stroke()
+        self.addCleanup(PythoShopRaster.marker.start_stroke)
+
+    def test_joins_the_points_of_a_stroke(self):
+        pixels = PixelBuffer(30, 30)
+        PythoShopRaster.marker(pixels, (2, 2), color=(255, 0, 0), extra="1")
+        PythoShopRaster.marker(pixels, (20, 10), color=(255, 0, 0), extra="1")
+        self.assertEqual(drawn(pixels), pixels_of(PythoShopRaster.stroke((2, 2), (20, 10), 1)))
+        PythoShopRaster.marker.start_stroke()
+        PythoShopRaster.marker(pixels, (25, 25), color=(255, 0, 0), extra="0")
+        self.assertEqual(len(drawn(pixels)), len(pixels_of(PythoShopRaster.stroke((2, 2), (20, 10), 1))) + 1)
+
+    def test_radius(self):
+        self.assertEqual(PythoShopRaster.parse_radius(" 5 "), 5)
+        self.assertEqual(PythoShopRaster.parse_radius("-2"), 0)
+        self.assertEqual(PythoShopRaster.parse_radius("thick"), PythoShopRaster.DEFAULT_MARKER_RADIUS)
+
+    def test_draw_live_is_the_same_as_the_marker(self):
+        live = PixelBuffer(31, 20)
+        for point in [(3, 3), (10, 12), (28, 15)]:
+            before = live.copy()
+            top, bottom = PythoShopRaster.marker.draw_live(live, point, (0, 255, 0), "2")
+            changed = [y for y in range(live.height) if live.row(y) != before.row(y)]
+            self.assertTrue(top <= min(changed) and max(changed) < bottom)
+        PythoShopRaster.marker.start_stroke()
+        expected = PixelBuffer(31, 20)
+        for point in [(3, 3), (10, 12), (28, 15)]:
+            PythoShopRaster.marker(expected, point, color=(0, 255, 0), extra="2")
+        self.assertEqual(live.data, expected.data)
+
+    def test_draw_live_rows(self):
+        pixels = PixelBuffer(20, 20)
+        self.assertEqual(PythoShopRaster.marker.draw_live(pixels, (5, 1), (0, 255, 0), "3"), (0, 5))
+        self.assertEqual(PythoShopRaster.marker.draw_live(pixels, (5, 18), (0, 255, 0), "3"), (0, 20))
+        PythoShopRaster.marker.start_stroke()
+        self.assertEqual(PythoShopRaster.marker.draw_live(pixels, (5, 10), (0, 255, 0), "1"), (9, 12))
+
+
+if __name__ == "__main__":
+    unittest.main()
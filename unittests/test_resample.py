@@ -0,0 +1,39 @@
+import unittest
+
+from PIL import Image
+
+import PythoShopResample
+from PythoShopPixels import PixelBuffer
+
+
+class TestResample(unittest.TestCase):
+    def test_half_size_averages_blocks(self):
+        img = Image.new("RGB", (4, 2), (0, 0, 0))
+        img.putpixel((0, 0), (100, 40, 200))
+        img.putpixel((3, 1), (80, 80, 80))
+        result = PythoShopResample.half_size(img)
+        self.assertIsInstance(result, Image.Image)
+        self.assertEqual(result.size, (2, 1))
+        self.assertEqual(result.getpixel((0, 0)), (25, 10, 50))
+        self.assertEqual(result.getpixel((1, 0)), (20, 20, 20))
+
+    def test_double_size(self):
+        pixels = PixelBuffer(2, 1)
+        pixels.set_pixel(1, 0, (200, 100, 0))
+        result = PythoShopResample.double_size(pixels)
+        self.assertEqual((result.width, result.height), (4, 2))
+        self.assertEqual(result.get_pixel(0, 0), (0, 0, 0))
+        self.assertEqual(result.get_pixel(3, 1), (200, 100, 0))
+        self.assertEqual(result.get_pixel(1, 0), (50, 25, 0))  # a quarter of the way to the right pixel
+
+    def test_half_size_of_a_bmp_file(self):
+        pixels = PixelBuffer(4, 4)
+        pixels.set_pixel(0, 0, (4, 8, 12))
+        result = PixelBuffer.from_bmp(PythoShopResample.half_size(pixels.to_bmp()))
+        self.assertEqual((result.width, result.height), (2, 2))
+        self.assertEqual(result.get_pixel(0, 0), (1, 2, 3))
+        self.assertEqual(result.get_pixel(1, 1), (0, 0, 0))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,124 @@
+import os
+import random
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "admin"))
+import similarityIndex
+
+OPERATORS = ["+", "-", "*", "//", "%", "<<", "&", "|"]
+
+
+def expression(generator, depth):
+    """A random bit of arithmetic, so no two submissions have the same structure"""
+    choice = generator.randrange(5 if depth else 2)
+    if choice == 0:
+        return "total"
+    if choice == 1:
+        return str(generator.randrange(100))
+    if choice == 2:
+        return "image.getpixel(({}, {}))[0]".format(expression(generator, depth - 1), expression(generator, depth - 1))
+    if choice == 3:
+        return "abs({})".format(expression(generator, depth - 1))
+    return "({} {} {})".format(expression(generator, depth - 1), generator.choice(OPERATORS), expression(generator, depth - 1))
+
+
+LEAKED = """
+def make_line_drawing(image, color, extra):
+    for y in range(image.height - 1):
+        for x in range(image.width - 1):
+            r, g, b = image.getpixel((x, y))
+            right = image.getpixel((x + 1, y))
+            below = image.getpixel((x, y + 1))
+            if abs(r - right[0]) + abs(g - right[1]) > 30 or abs(b - below[2]) > 30:
+                image.putpixel((x, y), (0, 0, 0))
+            else:
+                image.putpixel((x, y), (255, 255, 255))
+"""
+
+RENAMED = """
+def make_line_drawing(img, c, e):  # my own version
+    for row in range(img.height - 2):
+        for col in range(img.width - 7):
+            red, green, blue = img.getpixel((col, row))
+            nxt = img.getpixel((col + 4, row))
+            under = img.getpixel((col, row + 9))
+            if abs(red - nxt[2]) + abs(green - nxt[0]) > 50 or abs(blue - under[1]) > 10:
+                img.putpixel((col, row), (1, 2, 3))
+            else:
+                img.putpixel((col, row), (4, 5, 6))
+"""
+
+
+def own_code(seed):
+    """A function nobody else wrote"""
+    generator = random.Random(seed)
+    return "\ndef own_{}(image, color, extra):\n    total = 0\n{}".format(seed, "".join("    total = " + expression(generator, 4) + "\n" for _ in range(5)))
+
+
+class TestSimilarityIndex(unittest.TestCase):
+    def setUp(self):
+        folder = tempfile.TemporaryDirectory()
+        self.addCleanup(folder.cleanup)
+        self.path = os.path.join(folder.name, "similarityIndex.json")
+        self.index = similarityIndex.SimilarityIndex(self.path)
+
+    def reported(self, names=None):
+        return {(name, other) for fraction, name, other, lines, other_lines in self.index.similar_pairs(names)}
+
+    def test_renaming_doesnt_hide_copying(self):
+        self.index.add("fall2024/a", LEAKED)
+        self.index.add("fall2024/b", RENAMED)
+        pairs = self.index.similar_pairs()
+        self.assertEqual(len(pairs), 1)
+        fraction, name, other, lines, other_lines = pairs[0]
+        self.assertEqual((fraction, name, other), (1.0, "fall2024/a", "fall2024/b"))
+        self.assertEqual(lines, other_lines)
+
+    def test_different_code_isnt_reported(self):
+        for seed in range(10):
+            self.index.add("fall2024/" + str(seed), own_code(seed))
+        self.assertEqual(self.reported(), set())
+
+    def test_widely_leaked_solution(self):
+        # passed around for years: far more copies than the old fixed cap of 20 let through
+        for seed in range(100):
+            self.index.add("year{}/{}".format(seed % 4, seed), own_code(seed) + (LEAKED if seed < 30 else ""))
+        reported = self.reported(["year0/0"])
+        self.assertEqual(reported, {("year0/0", "year{}/{}".format(seed % 4, seed)) for seed in range(1, 30)} - {("year0/0", "year0/0")})
+
+    def test_code_everyone_has_is_ignored(self):
+        for seed in range(100):
+            self.index.add("fall2024/" + str(seed), own_code(seed) + LEAKED)
+        self.assertEqual(self.reported(), set())
+
+    def test_starter_code_is_ignored(self):
+        ignore = set(similarityIndex.winnow(similarityIndex.tokenize(LEAKED)))
+        self.index.add("fall2024/a", own_code(1) + LEAKED)
+        self.index.add("fall2024/b", own_code(2) + LEAKED)
+        self.assertEqual(self.reported(), {("fall2024/a", "fall2024/b")})
+        self.index.remove("fall2024/a")
+        self.index.remove("fall2024/b")
+        self.index.add("fall2024/a", own_code(1) + LEAKED, ignore)
+        self.index.add("fall2024/b", own_code(2) + LEAKED, ignore)
+        self.assertEqual(self.reported(), set())
+
+    def test_only_pairs_with_the_names(self):
+        for name in ["fall2024/a", "fall2024/b", "spring2025/a"]:
+            self.index.add(name, LEAKED)
+        self.assertEqual(self.reported(["spring2025/a"]), {("fall2024/a", "spring2025/a"), ("fall2024/b", "spring2025/a")})
+
+    def test_update_and_save(self):
+        self.assertTrue(self.index.add("fall2024/a", LEAKED))
+        self.assertFalse(self.index.add("fall2024/a", LEAKED))
+        self.index.add("fall2024/b", LEAKED)
+        self.index.save()
+        loaded = similarityIndex.SimilarityIndex(self.path)
+        self.assertEqual(loaded.similar_pairs(), self.index.similar_pairs())
+        self.assertTrue(loaded.add("fall2024/b", own_code(1)))  # they changed it
+        self.assertEqual(loaded.similar_pairs(), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,58 @@
+import io
+import unittest
+
+import PythoShopStats
+from PythoShopExports import export_filter
+from PythoShopPixels import PixelBuffer
+
+
+@export_filter
+def _with_stats(image, color, extra, stats):
+    pass
+
+
+@export_filter
+def _without_stats(image, color, extra):
+    pass
+
+
+def _gradient(width, height):
+    pixels = PixelBuffer(width, height)
+    for y in range(height):
+        for x in range(width):
+            pixels.set_pixel(x, y, (10 * x, 5 * y, 200))
+    return pixels
+
+
+class TestStats(unittest.TestCase):
+    def test_wants_stats(self):
+        self.assertTrue(PythoShopStats.wants_stats(_with_stats))
+        self.assertFalse(PythoShopStats.wants_stats(_without_stats))
+
+    def test_histograms(self):
+        stats = PythoShopStats.get_stats(_gradient(3, 2))
+        self.assertEqual(stats.pixel_count, 6)
+        self.assertEqual((stats.minimum("red"), stats.maximum("red")), (0, 20))
+        self.assertEqual(stats.mean("green"), 2.5)
+        self.assertEqual(stats.histograms["blue"][200], 6)
+
+    def test_same_contents_are_looked_up(self):
+        pixels = _gradient(5, 4)
+        bmp = io.BytesIO(pixels.to_bmp().getvalue())
+        bmp.seek(7)
+        stats = PythoShopStats.get_stats(bmp)
+        self.assertEqual(bmp.tell(), 7)  # where the function being tested left it
+        self.assertIs(PythoShopStats.get_stats(pixels.copy()), stats)
+        self.assertIs(PythoShopStats.get_stats(pixels.to_image()), stats)
+
+    def test_update_after_a_small_edit(self):
+        before = _gradient(6, 40)
+        after = before.copy()
+        after.set_pixel(2, 3, (255, 255, 255))
+        updated = PythoShopStats.update_stats(PythoShopStats.get_stats(before), before, after)
+        self.assertEqual(updated.histograms, PythoShopStats.compute_stats(after).histograms)
+        self.assertNotEqual(updated.histograms, PythoShopStats.get_stats(before).histograms)
+
+
+if __name__ == "__main__":
+    unittest.main()
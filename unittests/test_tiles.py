@@ -0,0 +1,104 @@
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+
+from PIL import Image
+
+import PythoShopTiles
+
+PACKAGE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+MANIP_MODULE = """import os
+
+from PythoShopExports import export_filter
+
+
+@export_filter(tile_safe=True)
+def invert(image, color, extra):
+    print("printing doesn't get in the way")
+    for y in range(image.height):
+        for x in range(image.width):
+            r, g, b = image.getpixel((x, y))
+            image.putpixel((x, y), (255 - r, 255 - g, 255 - b))
+
+
+@export_filter(tile_safe=True)
+def fail(image, color, extra):
+    raise ZeroDivisionError(extra)
+
+
+@export_filter(tile_safe=True)
+def crash(image, color, extra):
+    os._exit(1)
+"""
+
+# stands in for PythoShop.py: its import has a side effect (opening the window) that mustn't happen again in the workers
+GUI_SCRIPT = """import multiprocessing
+import sys
+
+with open(sys.argv[1], "a") as log:
+    log.write("imported\\n")
+
+if __name__ == "__main__":
+    multiprocessing.set_start_method("spawn")  # what Windows and macOS use
+    sys.path.insert(0, sys.argv[2])
+    import PythoShopTiles
+    from PIL import Image
+
+    runner = PythoShopTiles.TileRunner(max_workers=2)
+    img = Image.new("RGB", (3, 40), (10, 20, 30))
+    runner.run(PythoShopTiles._load_function(sys.argv[3], "invert"), img, color=(0, 0, 0), extra="")
+    runner.shutdown()
+    print(img.getpixel((0, 0)), img.getpixel((2, 39)))
+"""
+
+
+class TestTileRunner(unittest.TestCase):
+    def setUp(self):
+        folder = tempfile.TemporaryDirectory()
+        self.addCleanup(folder.cleanup)
+        self.folder = folder.name
+        self.manip_path = os.path.join(self.folder, "ImageManip.py")
+        with open(self.manip_path, "w", encoding="utf-8") as manip_file:
+            manip_file.write(MANIP_MODULE)
+        self.runner = PythoShopTiles.TileRunner(max_workers=2)
+        self.addCleanup(self.runner.shutdown)
+
+    def test_bands(self):
+        img = Image.new("RGB", (5, 40), (10, 20, 30))
+        img.putpixel((4, 39), (0, 0, 0))
+        self.runner.run(PythoShopTiles._load_function(self.manip_path, "invert"), img, color=(0, 0, 0), extra="")
+        self.assertEqual(img.getpixel((0, 0)), (245, 235, 225))
+        self.assertEqual(img.getpixel((3, 39)), (245, 235, 225))
+        self.assertEqual(img.getpixel((4, 39)), (255, 255, 255))
+
+    def test_errors_come_back(self):
+        img = Image.new("RGB", (5, 40))
+        with self.assertRaisesRegex(ZeroDivisionError, "oops"):
+            self.runner.run(PythoShopTiles._load_function(self.manip_path, "fail"), img, color=(0, 0, 0), extra="oops")
+
+    def test_crash(self):
+        img = Image.new("RGB", (5, 40))
+        with self.assertRaises(RuntimeError):
+            self.runner.run(PythoShopTiles._load_function(self.manip_path, "crash"), img, color=(0, 0, 0), extra="")
+        # new workers are started for the next filter
+        self.runner.run(PythoShopTiles._load_function(self.manip_path, "invert"), img, color=(0, 0, 0), extra="")
+        self.assertEqual(img.getpixel((2, 20)), (255, 255, 255))
+
+    def test_gui_isnt_imported_again(self):
+        script_path = os.path.join(self.folder, "PythoShop.py")
+        with open(script_path, "w", encoding="utf-8") as script_file:
+            script_file.write(GUI_SCRIPT)
+        log_path = os.path.join(self.folder, "imports.log")
+        output = subprocess.run(
+            [sys.executable, script_path, log_path, os.path.abspath(PACKAGE), self.manip_path], capture_output=True, text=True, timeout=60, check=True
+        ).stdout
+        self.assertEqual(output.splitlines()[-1], "(245, 235, 225) (245, 235, 225)")
+        with open(log_path) as log:
+            self.assertEqual(log.read(), "imported\n")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,37 @@
+import unittest
+
+from PIL import Image
+
+import PythoShopTransform
+from PythoShopPixels import PixelBuffer
+from helpers import colors
+
+
+def _numbered(width, height):
+    """An image where every pixel is a different color"""
+    img = Image.new("RGB", (width, height))
+    img.putdata([(x, y, x + 10 * y) for y in range(height) for x in range(width)])
+    return img
+
+
+class TestTransform(unittest.TestCase):
+    def test_flip_left_right(self):
+        img = _numbered(5, 2)
+        PythoShopTransform.flip_left_right(img)
+        self.assertEqual(colors(img), colors(_numbered(5, 2).transpose(Image.Transpose.FLIP_LEFT_RIGHT)))
+
+    def test_rotate_clockwise(self):
+        result = PythoShopTransform.rotate_clockwise(_numbered(3, 2))
+        self.assertEqual(result.size, (2, 3))
+        self.assertEqual(colors(result), colors(_numbered(3, 2).transpose(Image.Transpose.ROTATE_270)))
+
+    def test_rotate_clockwise_of_a_bmp_file(self):
+        pixels = PixelBuffer.from_image(_numbered(70, 3))  # wider than a tile
+        result = PixelBuffer.from_bmp(PythoShopTransform.rotate_clockwise(pixels.to_bmp()))
+        self.assertEqual((result.width, result.height), (3, 70))
+        self.assertEqual(result.get_pixel(0, 0), pixels.get_pixel(0, 2))
+        self.assertEqual(result.get_pixel(2, 69), pixels.get_pixel(69, 0))
+
+
+if __name__ == "__main__":
+    unittest.main()
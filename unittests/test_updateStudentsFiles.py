@@ -0,0 +1,49 @@
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "admin"))  # it imports students.py
+import updateStudentsFiles
+
+
+class TestCopyReadonlyFiles(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.TemporaryDirectory()
+        self.source = os.path.join(self.folder.name, "source")
+        self.destination = os.path.join(self.folder.name, "student")
+        os.mkdir(self.source)
+        self.files = []
+        for name in ("PythoShop.py", "PythoShopResample.py"):
+            path = os.path.join(self.source, name)
+            with open(path, "w", encoding="utf-8") as source_file:
+                source_file.write("# " + name + "\n")
+            self.files.append(path)
+
+    def tearDown(self):
+        for name in os.listdir(self.destination):
+            os.chmod(os.path.join(self.destination, name), 0o666)
+        self.folder.cleanup()
+
+    def test_copies_once(self):
+        self.assertEqual(updateStudentsFiles.copy_readonly_files(self.files, self.destination), ["PythoShop.py", "PythoShopResample.py"])
+        self.assertEqual(updateStudentsFiles.copy_readonly_files(self.files, self.destination), [])
+
+    def test_removes_files_no_longer_distributed(self):
+        updateStudentsFiles.copy_readonly_files(self.files, self.destination)
+        self.assertEqual(updateStudentsFiles.copy_readonly_files(self.files[:1], self.destination, dry_run=True), ["PythoShopResample.py"])
+        self.assertTrue(os.path.exists(os.path.join(self.destination, "PythoShopResample.py")))
+        self.assertEqual(updateStudentsFiles.copy_readonly_files(self.files[:1], self.destination), ["PythoShopResample.py"])
+        self.assertEqual(sorted(os.listdir(self.destination)), [updateStudentsFiles.MANIFEST_FILE_NAME, "PythoShop.py"])
+        self.assertEqual(updateStudentsFiles.copy_readonly_files(self.files[:1], self.destination), [])
+
+    def test_leaves_other_files_alone(self):
+        updateStudentsFiles.copy_readonly_files(self.files, self.destination)
+        with open(os.path.join(self.destination, "ImageManip.py"), "w", encoding="utf-8") as manip_file:
+            manip_file.write("# the student's work\n")
+        updateStudentsFiles.copy_readonly_files(self.files[:1], self.destination)
+        self.assertTrue(os.path.exists(os.path.join(self.destination, "ImageManip.py")))
+
+
+if __name__ == "__main__":
+    unittest.main()
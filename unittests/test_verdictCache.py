@@ -0,0 +1,61 @@
+import os
+import tempfile
+import unittest
+
+from tests import verdictCache
+
+
+def _write(path, text):
+    with open(path, "w", encoding="utf-8") as code_file:
+        code_file.write(text)
+    # make sure the modification time changes even on file systems that only keep whole seconds
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9 + len(text)))
+
+
+class TestVerdictCache(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.TemporaryDirectory()
+        self.root = self.folder.name
+        self.tests = os.path.join(self.root, "tests")
+        os.mkdir(self.tests)
+        _write(os.path.join(self.root, "ImageManip.py"), "import Exports\n\ndef negate(image):\n    return image\n")
+        _write(os.path.join(self.root, "Exports.py"), "import Pixels\nimport os\n")
+        _write(os.path.join(self.root, "Pixels.py"), "WIDTH = 1\n")
+        _write(os.path.join(self.tests, "testBase.py"), "import tests.harnessHelper\n")
+        _write(os.path.join(self.tests, "harnessHelper.py"), "import Stats\n")
+        _write(os.path.join(self.root, "Stats.py"), "BINS = 256\n")
+
+    def tearDown(self):
+        self.folder.cleanup()
+
+    def _fingerprint(self):
+        with open(os.path.join(self.root, "ImageManip.py"), encoding="utf-8") as manip_file:
+            return verdictCache.fingerprint_functions(manip_file.read(), self.root)["negate"]
+
+    def test_local_modules_are_followed(self):
+        with open(os.path.join(self.root, "ImageManip.py"), encoding="utf-8") as manip_file:
+            found = verdictCache.local_modules([manip_file.read()], [self.root])
+        self.assertEqual([os.path.basename(path) for path in found], ["Exports.py", "Pixels.py"])
+
+    def test_fingerprint_changes_with_modules_imported_indirectly(self):
+        before = self._fingerprint()
+        _write(os.path.join(self.root, "Pixels.py"), "WIDTH = 2\n")
+        self.assertNotEqual(self._fingerprint(), before)
+
+    def test_key_changes_with_modules_the_harness_imports(self):
+        cache = verdictCache.VerdictCache(self.tests)
+        self.assertIn(os.path.join("..", "Stats.py"), cache.harness_files())
+        before = cache.key("test_32_negate", "fingerprint")
+        _write(os.path.join(self.root, "Stats.py"), "BINS = 128\n")
+        self.assertNotEqual(cache.key("test_32_negate", "fingerprint"), before)
+
+    def test_key_changes_with_the_test_runner(self):
+        cache = verdictCache.VerdictCache(self.tests)
+        before = cache.key("test_32_negate", "fingerprint")
+        _write(os.path.join(self.tests, "testRunner.py"), "import sys\n")
+        self.assertNotEqual(cache.key("test_32_negate", "fingerprint"), before)
+
+
+if __name__ == "__main__":
+    unittest.main()